@@ -0,0 +1,244 @@
+import pandas as pd
+import numpy as np
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from Supply import WindSupply
+from Supply import WindSupplyDummy
+from Demand import Households
+from Demand import HouseholdsDummy
+from Storage import TrainTrack
+from Controller import Controller
+from Policies import ReferencePolicy, LookAheadPolicy
+from Profiles import CompiledProfile
+
+NEDU_TYPES = ["E1A", "E1B", "E1C", "E2A", "E2B", "E3A", "E3B", "E3C", "E3D", "E4A"]# The types of households in the NEDU profiles.
+
+def write_synthetic_nedu(path, days = 365, seed = 0, year = 2019):
+    """
+    Writes a synthetic profile in the same format as the NEDU profiles ("profielen Elektriciteit 2019 versie 1.00.csv") so that Households can be used without the real file. Each type gets a daily pattern (shifted a bit per type), a yearly pattern and some noise, and each column adds up to 1 just like the real profiles.
+    
+    path is the name of the CSV file that is made.
+    days is the amount of days in the profile (with a data point every 15 minutes).
+    seed is the seed of the random noise, so the same seed always gives the same file.
+    year is the year of the dates in the file.
+    """
+    
+    amount_of_rows = days * 24 * 4
+    hours = np.arange(amount_of_rows) / 4
+    random = np.random.default_rng(seed)
+    
+    columns = []
+    for i in range(len(NEDU_TYPES)):
+        values = 1 + 0.5 * np.sin(2 * np.pi * (hours - 7 - i) / 24) + 0.2 * np.cos(2 * np.pi * hours / (24 * 365)) + 0.05 * random.random(amount_of_rows)
+        columns.append(values / np.sum(values))
+    
+    times = pd.date_range(datetime.datetime(year, 1, 1), periods = amount_of_rows + 1, freq = "15min").strftime("%d-%m-%Y %H:%M")
+    
+    data = pd.DataFrame({"": "", "Start": times[:-1], "End": times[1:]})
+    for name, values in zip(NEDU_TYPES, columns):
+        data[name] = values
+    
+    with open(path, "w") as file:
+        file.write("Profielen,,Versienr," + ",".join("1.00 " + name for name in NEDU_TYPES) + "\n")# The header and the 4 rows of meta data that Households skips.
+        for i in range(4):
+            file.write("meta,,," + "," * (len(NEDU_TYPES) - 1) + "\n")
+        data.to_csv(file, header = False, index = False, float_format = "%.12f")
+
+def time_function(function, repeats = 5, number = 1):
+    """
+    Times a function. Returns a list with for each repeat the time (in seconds) of a single call, averaged over number calls.
+    """
+    
+    times = []
+    for repeat in range(repeats):
+        start = time.perf_counter()
+        for i in range(number):
+            function()
+        times.append((time.perf_counter() - start) / number)
+    
+    return times
+
+def get_policy_state(size = None):
+    """
+    Gets a typical state (with carts moving down) and net demand for timing a policy (see Policies.py). If size is None they are numbers like in the Controller, otherwise arrays of that size like in the Ensemble.
+    """
+    
+    train_track = TrainTrack(carts = 15000)
+    train_track.carts_on_track = np.linspace(0, train_track.track_length, 100, endpoint = False)
+    train_track.velocity = -2.0
+    controller = Controller(train_track = train_track, delta_time = 10)
+    
+    state = controller.get_policy_state()
+    net_demand = -2.0 * 10**7
+    
+    if size is None:
+        return state, net_demand
+    
+    return {name : value if name == "time" else np.full(size, value, dtype = np.float64) for name, value in state.items()}, np.full(size, net_demand)
+
+def get_environment():
+    """
+    Gets the versions and the machine on which the benchmarks are run, so results of different machines are not mixed up by accident.
+    """
+    
+    return {"Date" : datetime.datetime.now().isoformat(timespec = "seconds"),
+            "Python" : platform.python_version(),
+            "Numpy" : np.__version__,
+            "Pandas" : pd.__version__,
+            "Platform" : platform.platform(),
+            "Processor" : platform.processor() or platform.machine()}
+
+def run_benchmarks(quick = False, repeats = 5, wind_profile = "wind_speed_ijmuiden.txt", progress = True):
+    """
+    Runs all benchmarks and returns a dictionary with the environment and for each benchmark the fastest, median and all times (in seconds per call). Everything runs offline, the household profile is a synthetic one (see write_synthetic_nedu) in a temporary directory.
+    
+    quick is a boolean which skips the slowest benchmarks (the simulation of 364 days and do_tick with a million carts). The policies (see Policies.py) are timed for a single track (like in the Controller) and for 1000 tracks at once (like in the Ensemble), that is their cost per tick (for the LookAheadPolicy without making a new plan).
+    repeats is the amount of times each benchmark is repeated.
+    wind_profile is the file with the wind speeds.
+    progress is a boolean which decides if each result is printed when it is done.
+    """
+    
+    results = {}
+    
+    def add(name, times):
+        results[name] = {"Best (s)" : min(times), "Median (s)" : float(np.median(times)), "Times (s)" : times}
+        if progress:
+            print(name.ljust(50), "%.6g s" % min(times), file = sys.stderr, flush = True)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        profile = os.path.join(directory, "synthetic_nedu.csv")
+        write_synthetic_nedu(profile)
+        households = [67000, 0, 0, 0, 0, 0, 0, 0, 0, 0]
+        
+        add("Load WindSupply", time_function(lambda: WindSupply(60, wind_profile), repeats))
+        add("Load Households", time_function(lambda: Households(households, profiel = profile), repeats))
+        
+        cache = os.path.join(directory, "cache")
+        WindSupply(60, wind_profile, cache_directory = cache)
+        Households(households, profiel = profile, cache_directory = cache)
+        add("Load WindSupply (cached)", time_function(lambda: WindSupply(60, wind_profile, cache_directory = cache), repeats))
+        add("Load Households (cached)", time_function(lambda: Households(households, profiel = profile, cache_directory = cache), repeats))
+        
+        supply = WindSupply(60, wind_profile)
+        demand = Households(households, profiel = profile)
+        times = np.arange(0, 364 * 24 * 3600, 10.0)
+        
+        for name, function in [("WindSupply.output", supply.output), ("Households.consumption", demand.consumption), ("WindSupplyDummy.output", WindSupplyDummy(1000).output), ("HouseholdsDummy.consumption", HouseholdsDummy(1000).consumption)]:
+            add(name + " single", time_function(lambda: function(123456.0), repeats, 1000))
+            add(name + " batch of " + str(len(times)), time_function(lambda: function(times), repeats))
+        
+        for power in range(2, 5 if quick else 7):
+            amount = 10**power
+            train_track = TrainTrack(carts = amount)
+            train_track.carts_on_track = np.linspace(0, train_track.track_length, amount, endpoint = False)
+            train_track.force_of_generator = -train_track.get_gravity()
+            add("TrainTrack.do_tick " + str(amount) + " carts", time_function(lambda: train_track.do_tick(10), repeats, 1000))
+        
+        for size in [None, 1000]:
+            state, net_demand = get_policy_state(size)
+            for name, policy in [("ReferencePolicy", ReferencePolicy()), ("LookAheadPolicy", LookAheadPolicy(CompiledProfile(supply, demand, 0, 24 * 3600, 10)))]:
+                def decide(policy = policy):
+                    policy.decide_carts(state, net_demand)
+                    policy.get_force(state, net_demand, 10)
+                
+                add(name + (" single track" if size is None else " " + str(size) + " tracks"), time_function(decide, repeats, 10000 if size is None else 1000))
+        
+        for days in [1, 30] if quick else [1, 30, 364]:
+            def simulate():
+                controller = Controller(train_track = TrainTrack(carts = 15000), supply = supply, demand = demand, delta_time = 10)
+                controller.simulate(end_time_seconds = 0, end_time_days = days, compiled = True)
+            
+            add("Controller.simulate " + str(days) + " days", time_function(simulate, 1 if days > 30 else min(repeats, 3)))
+    
+    return {"Environment" : get_environment(), "Quick" : quick, "Results" : results}
+
+def save_results(results, path):
+    """
+    Saves the results of run_benchmarks as a json file (for example as the baseline to compare against later).
+    """
+    
+    directory = os.path.dirname(path)
+    if directory != "":
+        os.makedirs(directory, exist_ok = True)
+    
+    with open(path, "w") as file:
+        json.dump(results, file, indent = 4)
+
+def load_results(path):
+    with open(path) as file:
+        return json.load(file)
+
+def compare_results(baseline, current, tolerance = 0.1):
+    """
+    Compares two sets of results (see run_benchmarks) and returns a dataframe with for each benchmark that is in both the best time of each, their ratio and the verdict. A benchmark is a regression if it is more than the tolerance (as a fraction) slower and an improvement if it is more than the tolerance faster.
+    """
+    
+    rows = []
+    
+    for name, result in current["Results"].items():
+        if name not in baseline["Results"]:
+            continue
+        
+        before = baseline["Results"][name]["Best (s)"]
+        after = result["Best (s)"]
+        ratio = after / before if before > 0 else np.nan
+        
+        if ratio > 1 + tolerance:
+            verdict = "regression"
+        elif ratio < 1 - tolerance:
+            verdict = "improvement"
+        else:
+            verdict = "same"
+        
+        rows.append({"Benchmark" : name, "Baseline (s)" : before, "Current (s)" : after, "Ratio" : ratio, "Verdict" : verdict})
+    
+    return pd.DataFrame(rows, columns = ["Benchmark", "Baseline (s)", "Current (s)", "Ratio", "Verdict"])
+
+def main(arguments = None):
+    """
+    The command line interface. "run" runs the benchmarks (and optionally saves them and compares them with a baseline), "compare" compares two saved results.
+    """
+    
+    parser = argparse.ArgumentParser(description = "Benchmarks of the gravity storage simulation.")
+    commands = parser.add_subparsers(dest = "command", required = True)
+    
+    run = commands.add_parser("run", help = "Run the benchmarks.")
+    run.add_argument("--quick", action = "store_true", help = "Skip the slowest benchmarks.")
+    run.add_argument("--repeats", type = int, default = 5, help = "Amount of times each benchmark is repeated.")
+    run.add_argument("--wind-profile", default = "wind_speed_ijmuiden.txt", help = "File with the wind speeds.")
+    run.add_argument("--output", default = None, help = "Json file in which the results are saved (for example benchmarks/baseline.json).")
+    run.add_argument("--baseline", default = None, help = "Json file with earlier results to compare with.")
+    run.add_argument("--tolerance", type = float, default = 0.1, help = "Fraction a benchmark may be slower before it counts as a regression.")
+    
+    compare = commands.add_parser("compare", help = "Compare two saved results.")
+    compare.add_argument("baseline", help = "Json file with the baseline results.")
+    compare.add_argument("current", help = "Json file with the new results.")
+    compare.add_argument("--tolerance", type = float, default = 0.1, help = "Fraction a benchmark may be slower before it counts as a regression.")
+    
+    arguments = parser.parse_args(arguments)
+    
+    if arguments.command == "run":
+        current = run_benchmarks(arguments.quick, arguments.repeats, arguments.wind_profile)
+        if arguments.output is not None:
+            save_results(current, arguments.output)
+    else:
+        current = load_results(arguments.current)
+    
+    if arguments.baseline is not None:
+        comparison = compare_results(load_results(arguments.baseline), current, arguments.tolerance)
+        with pd.option_context("display.max_rows", None, "display.width", 200):
+            print(comparison.to_string(index = False))
+        
+        return 1 if (comparison["Verdict"] == "regression").any() else 0# A non zero exit code so it can be used in scripts.
+    
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,22 +2,22 @@ import pandas as pd
 import numpy as np
 import datetime
 import math
+import time
+import copy
 
-from mpl_toolkits.mplot3d import axes3d
-from matplotlib import pyplot
-import matplotlib.pyplot as plt
-from matplotlib import cm
-
-from Helpers import make_3Dfunction_plot
+from Helpers import make_3Dfunction_plot# Only imports matplotlib when a plot is made.
 from Supply import WindSupply
 from Supply import WindSupplyDummy
 from Demand import Households
 from Demand import HouseholdsDummy
 from Storage import TrainTrack
+from Profiles import CompiledProfile, get_tick_times
+from Recorder import Recorder
+from Policies import ReferencePolicy, ADD_CART, ADD_BOTTOM, ADD_TOP
 
 
 class Controller:
-    def __init__(self, train_track = TrainTrack(), supply = WindSupplyDummy(1000), demand = HouseholdsDummy(1000), delta_time = 5):
+    def __init__(self, train_track = TrainTrack(), supply = WindSupplyDummy(1000), demand = HouseholdsDummy(1000), delta_time = 5, recorder = None, policy = None):
         
         self.time = 0
         self.delta_time = delta_time
@@ -26,87 +26,171 @@ class Controller:
         self.demand = demand
         self.train_track = train_track
         
-        self.data = {"Time" : [], "Velocity" : [], "Satisfaction" : [], "Amount carts on track" : [], "Supply" : [], "Demand" : [], "Storage" : [], "Difference" : [], "Losses": [], "Amount carts on top" : [], "Amount carts on bottom" : []}
+        if recorder is None:# The recorder stores the data of each tick (see Recorder for options like only recording every few ticks).
+            recorder = Recorder()
+        
+        self.recorder = recorder
+        
+        if policy is None:# The policy decides when carts are added and the force of the generator (see Policies.py).
+            policy = ReferencePolicy()
+        
+        self.policy = policy
         
         
         
         self.allow_new_carts = True
         self.max_acceleration = 1
         self.max_speed = 10
+        
+        self.profile = None# A compiled profile (see compile_profiles) from which the supply and demand are read by tick index.
+        self.profile_index = 0
+    
+    @property
+    def data(self):
+        """
+        The recorded data as a dictionary with an array for each column, so it can still be used like pd.DataFrame(controller.data). Use self.recorder.to_dataframe() to get a dataframe without copying.
+        """
+        
+        return self.recorder.get_data()
     
     
-    def check_carts(self):
+    def check_carts(self, delta_time = None):
         """
-        A function which checks if the carts are still on/near the track and if not removes them from circulation. If allowed it also tries to add a new cart.
+        A function which checks if the carts are still on/near the track and if not removes them from circulation. If allowed it also tries to add a new cart for each removed cart. All carts that are off the track are handled at once (see TrainTrack.remove_carts_off_track) and the amount of removed carts is returned.
+        
+        delta_time is the size of the coming time step, if None it is self.delta_time.
         """
         
-        train_track = self.train_track# So that we don't have to put self in front of it each time.
+        if delta_time is None:
+            delta_time = self.delta_time
         
-        did_thing = False
+        return self.train_track.remove_carts_off_track(delta_time, self.allow_new_carts)
+    
+    def snapshot(self):
+        """
+        Makes a snapshot of the entire state of the simulation: the time, the position in the compiled profile, the state of the train track (see TrainTrack.get_state) and the position of the recorder. With restore the simulation can later be set back to this moment. The snapshot is a small dictionary, the only large part is the array with the carts on the track.
+        """
         
-        for i in range(len(train_track.carts_on_track)):# Checks each cart.
-            if train_track.carts_on_track[i] > train_track.track_length:# If the cart is at the top of the track then remove (and replace) it
-                train_track.remove_cart(self.delta_time, i)
-                
-                if self.allow_new_carts:
-                    train_track.add_cart("Bottom")
-                
-                did_thing = True
-                return True
-                break
-            elif train_track.carts_on_track[i] < 0:# If the cart is at the bottom of the track then remove (and replace) it
-                train_track.remove_cart(self.delta_time, i)
-                
-                if self.allow_new_carts:
-                    train_track.add_cart("Top")
-                
-                did_thing = True
-                return True
-                break
-            else:# Otherwise continue
-                continue
+        return {"time" : self.time,
+                "profile_index" : self.profile_index,
+                "train_track" : self.train_track.get_state(),
+                "recorder" : self.recorder.get_state()}
+    
+    def restore(self, snapshot):
+        """
+        Sets the simulation back to a snapshot made with snapshot. The recorded rows after the snapshot are overwritten when simulating again. The snapshot itself is not changed so it can be restored as many times as needed.
+        """
         
-        if not did_thing:
-            return False
+        self.time = snapshot["time"]
+        self.profile_index = snapshot["profile_index"]
+        self.train_track.set_state(snapshot["train_track"])
+        self.recorder.set_state(snapshot["recorder"])
     
-    def controller(self):
-        """"
-        This is the actual part of the controller that controlls how and when carts are added and also determines the force the generator will use. Speciclicly this controller always tried to add a cart and does the controll for power purley based on (steady-state) speed by adjusting the generator force. See the report for more details.
+    def fork(self, keep_data = False):
         """
+        Returns a new controller which continues from the current state, so different what-if runs can start from the same (for example warmed up) state without simulating it again. The new controller has its own copy of the train track and its own recorder, the supply, demand and compiled profile are shared since they are never changed. The settings (like max_speed) are copied so they can be changed for each fork.
         
-        train_track = self.train_track# So that we don't have to put self. in front of it each time.
+        keep_data is a boolean which decides if the data recorded so far is copied to the new controller, if False its recorder starts empty (but with the same settings).
+        """
         
-        net_demand = self.supply.output(self.time) - self.demand.consumption(self.time)# Calculate the difference in supply and demand that the storage system should fill.
+        new_controller = copy.copy(self)
+        new_controller.train_track = self.train_track.copy()
+        new_controller.recorder = self.recorder.copy(keep_data)
+        new_controller.policy = self.policy.copy()
         
-        while self.check_carts():# Check the carts until no more changes are done.
-            continue
+        return new_controller
+    
+    def compile_profiles(self, end_time_seconds = 364 * 24 * 3600, end_time_days = 0):
+        """
+        Interpolates the supply and demand for all the ticks from the current time until the end time at once and stores them in a compiled profile. While the simulation is within that horizon the supply, demand and net demand are then read by tick index instead of being interpolated each tick.
+        """
         
-        if len(train_track.carts_on_track) > 0:# If there are other carts on the track let the track itself decide were (and if it is possible) to add a cart.
-            train_track.add_cart()
-        else:# If there are no other carts on the track the velocity will be zero and thus the controller will have to determine where to add the carts.
-            if net_demand > 0:
-                train_track.add_cart("Bottom")
-            elif net_demand < 0:
-                train_track.add_cart("Top")
+        end_time = end_time_seconds + 3600 * 24 * end_time_days
         
-        neutral_force = -(train_track.get_gravity() + train_track.get_friction())# Calculate the force the generator needs to have to maintain the current speed of the carts.
-        neutral_power = train_track.get_efficiency_generator() * abs(train_track.get_gravity() + train_track.get_friction()) * train_track.velocity# Calculate the assosiated power out/input.
+        self.profile = CompiledProfile(self.supply, self.demand, self.time, end_time, self.delta_time)
+        self.profile_index = 0
+    
+    def get_supply_demand(self):
+        """
+        Gets the supply, demand and net demand (supply minus demand) at the current time. If there is a compiled profile for the current tick it is read from that, otherwise the supply and demand objects are asked directly.
+        """
         
-        if neutral_force != 0:# Prevent a devide by zero error. Will only be zero if there are no carts (or if the carts are at terminal velocity which should never happen).
-            needed_change_in_speed = -(neutral_power - net_demand) / abs(neutral_force)# Calculate the change in speed needed to get to the desired power output. It ignores a potential increase in friction but that is not a problem since during the next tick it will take into account an increased friction and thus it will exponentially decrease any effect this has.
-        else:
-            needed_change_in_speed = 0
+        profile = self.profile
+        index = self.profile_index
+        
+        if profile is not None and index < len(profile.times) and profile.times[index] == self.time:
+            return profile.supply[index], profile.demand[index], profile.net_demand[index]
+        
+        supply = self.supply.output(self.time)
+        demand = self.demand.consumption(self.time)
+        
+        return supply, demand, supply - demand
+    
+    def get_policy_state(self, full = True):
+        """
+        Gets the state of the simulation that a policy uses (see Policies.Policy), as a dictionary of numbers.
+        
+        full is a boolean which decides if the forces (needed for Policy.get_force) are included, they are not needed for Policy.decide_carts.
+        """
+        
+        state = {"time" : self.time,
+                 "max_speed" : self.max_speed,
+                 "max_acceleration" : self.max_acceleration}
+        
+        self.update_policy_state(state, full)
+        
+        return state
+    
+    def update_policy_state(self, state, full = True):
+        """
+        Sets the parts of a policy state (see get_policy_state) that change when a cart is added: the velocity and the carts, and if full is True also the forces. The controller makes the state once per tick and only updates it after adding a cart, instead of making it again.
+        """
         
-        if train_track.velocity > self.max_speed:# If the speed is maximum then set the change in velocity to be zero.
-            needed_change_in_speed = 0#train_track.velocity - self.max_speed
-        elif train_track.velocity < -self.max_speed:
-            needed_change_in_speed = 0#self.max_speed + train_track.velocity
+        train_track = self.train_track
         
-        acceleration = min([max([needed_change_in_speed / self.delta_time, -self.max_acceleration]), self.max_acceleration])# Make sure the maximum acceleration also is not exeded.
-        train_track.force_of_generator = neutral_force + acceleration * train_track.mass_per_cart * len(train_track.carts_on_track)# The force is calculated based on the neutral force plus any acceleration needed.
+        state["velocity"] = train_track.velocity
+        state["amount_of_carts"] = train_track.get_amount_carts_on_track()
+        state["carts_on_top"] = train_track.carts_of_track["Top"]
+        state["carts_on_bottom"] = train_track.carts_of_track["Bottom"]
+        
+        if full:
+            state["gravity"] = train_track.get_gravity()
+            state["friction"] = train_track.get_friction()
+            state["efficiency"] = train_track.get_efficiency_generator()
+            state["efficiency_generating"] = train_track.efficiency_generator[0]
+            state["efficiency_storing"] = train_track.efficiency_generator[1]
+            state["mass_per_cart"] = train_track.mass_per_cart
+    
+    def controller(self, net_demand = None, delta_time = None):
+        """"
+        This is the actual part of the controller that controlls how and when carts are added and also determines the force the generator will use. What is done is decided by the policy (self.policy, see Policies.py), by default the ReferencePolicy: this controller always tried to add a cart and does the controll for power purley based on (steady-state) speed by adjusting the generator force. See the report for more details.
         
-        if train_track.force_of_generator <=0:# Make sure the force is not negative.
-            train_track.force_of_generator = 0
+        net_demand is the difference in supply and demand at the current time. If it is not given it is calculated.
+        delta_time is the size of the coming time step, if None it is self.delta_time.
+        """
+        
+        train_track = self.train_track# So that we don't have to put self. in front of it each time.
+        
+        if delta_time is None:
+            delta_time = self.delta_time
+        
+        if net_demand is None:
+            net_demand = self.supply.output(self.time) - self.demand.consumption(self.time)# Calculate the difference in supply and demand that the storage system should fill.
+        
+        self.check_carts(delta_time)# Remove (and replace) all the carts that have gone off the track.
+        
+        state = self.get_policy_state(False)
+        action = self.policy.decide_carts(state, net_demand)
+        
+        if action == ADD_CART:# Let the track itself decide were (and if it is possible) to add a cart.
+            train_track.add_cart()
+        elif action == ADD_BOTTOM:
+            train_track.add_cart("Bottom")
+        elif action == ADD_TOP:
+            train_track.add_cart("Top")
+        
+        self.update_policy_state(state)# With the cart that was added and the forces.
+        train_track.force_of_generator = float(self.policy.get_force(state, net_demand, delta_time))# A number again, calculating with numpy scalars is slower.
         
     def get_debug_print(self):
         """
@@ -120,43 +204,146 @@ class Controller:
         train_track = self.train_track
         
         print("Velocity:", np.round(train_track.velocity, 2))
-        print("Carts: ", len(train_track.carts_on_track), train_track.carts_of_track, "Position:", np.round(train_track.carts_on_track, 1))
+        print("Carts: ", train_track.get_amount_carts_on_track(), train_track.carts_of_track, "Position:", np.round(train_track.carts_on_track, 1))
         print("Forces (gravity, friction, generator):", [np.round(train_track.get_gravity()), np.round(train_track.get_friction()), np.round(train_track.force_of_generator)])
     
-    def do_tick(self):
+    def do_tick(self, delta_time = None):
         """
-        This sub-function does a time-step (tick as it is called). During each tick it saves the data to the data dictionairy and then exicutes the controller and lets the train traick also do a tick.
+        This sub-function does a time-step (tick as it is called). During each tick it saves the data with the recorder and then exicutes the controller and lets the train traick also do a tick.
+        
+        delta_time is the size of this time step, if None it is self.delta_time (simulate_adaptive uses a different size for each tick).
         """
         
-        self.data["Time"].append(self.time)
-        self.data["Velocity"].append(self.train_track.velocity)
-        self.data["Satisfaction"].append((self.supply.output(self.time) - self.train_track.get_power()) / self.demand.consumption(self.time))#data["Satisfaction"] =  ((data["Supply"] - data["Storage"]) / data["Demand"])
-        self.data["Amount carts on track"].append(len(self.train_track.carts_on_track))
-        self.data["Supply"].append(self.supply.output(self.time))# Inefficient that we call these functions 4 times (here twice and once in controller).
-        self.data["Demand"].append(self.demand.consumption(self.time))
-        self.data["Storage"].append(self.train_track.get_power())
-        self.data["Difference"].append(self.supply.output(self.time) - self.train_track.get_power() - self.demand.consumption(self.time))# Positive is energy left over, negative is energy shortage
-        self.data["Losses"].append(sum(self.train_track.losses.values()))
-        self.data["Amount carts on top"].append(self.train_track.carts_of_track["Top"])
-        self.data["Amount carts on bottom"].append(self.train_track.carts_of_track["Bottom"])
+        if delta_time is None:
+            delta_time = self.delta_time
+        
+        supply, demand, net_demand = self.get_supply_demand()# Get these only once per tick (from the compiled profile if there is one).
+        
+        self.recorder.record(self.time, supply, demand, self.train_track)
         
-        self.controller()# Let the controller do its thing.
-        self.train_track.do_tick(self.delta_time)# Do a tick for the train track (the actual physics).
+        self.controller(net_demand, delta_time)# Let the controller do its thing.
+        self.train_track.do_tick(delta_time)# Do a tick for the train track (the actual physics).
         
-        self.time = self.time + self.delta_time
+        self.time = self.time + delta_time
+        self.profile_index = self.profile_index + 1
     
-    def simulate(self, end_time_seconds = 364 * 24 * 3600, end_time_days = 0):
+    def simulate(self, end_time_seconds = 364 * 24 * 3600, end_time_days = 0, compiled = False, output_sink = None, instrumentation = None):
         """
         This sub-function does the simulation until a certain end time. It also returns some data so it can be used in the make_3Dfunction_plot.
+        
+        compiled is a boolean which decides if the supply and demand are first compiled for the entire horizon (see compile_profiles). If the current compiled profile already covers the horizon it is reused.
+        output_sink is an output sink (see Output.py) to which the recorded data is written in chunks during the simulation, so the memory use stays the same no matter how long the run is. The sink stays attached to the recorder and the remaining rows are written at the end of this call, the sink itself is not closed.
+        instrumentation is an Instrumentation object (see Instrumentation.py) which times the phases of each tick, if None nothing is timed.
         """
         
         end_time = end_time_seconds + 3600 * 24 * end_time_days
         
-        while self.time <= end_time:
-            self.do_tick()
-            #print(self.get_debug_print())
+        if output_sink is not None:
+            self.recorder.sink = output_sink
+        
+        try:
+            if instrumentation is not None:
+                instrumentation.start(self)# Times the phases of do_tick until stop.
+            
+            if compiled and not (self.profile is not None and self.profile.covers(self.profile_index, self.time, end_time)):
+                self.compile_profiles(end_time)
+            
+            self.recorder.reserve(int(max(end_time - self.time, 0) / self.delta_time) + 1)# Make room for all the ticks at once.
+            
+            while self.time <= end_time:
+                self.do_tick()
+                #print(self.get_debug_print())
+        finally:# Also if compiling fails the original functions have to be put back.
+            if instrumentation is not None:
+                instrumentation.stop(self)
         #print(self.get_debug_print())
-        return self.supply.output(self.time) - self.train_track.get_power() - self.demand.consumption(self.time)# Positive is energy left over, negative is energy shortage
+        if output_sink is not None:
+            self.recorder.flush()
+        
+        supply, demand, net_demand = self.get_supply_demand()
+        
+        return supply - self.train_track.get_power() - demand# Positive is energy left over, negative is energy shortage
+    
+    def get_adaptive_step(self, end_time, slope, velocity_tolerance, power_tolerance, min_step, max_step):
+        """
+        Chooses the size of the next time step for simulate_adaptive. Returns the step size and the reason for it (the limit that was the smallest).
+        
+        end_time is the time until which is simulated, the steps are made to end exactly at it.
+        slope is the change in net demand per second at the current time.
+        velocity_tolerance is the maximum change in velocity (in m/s) during a step, with the current acceleration.
+        power_tolerance is the maximum change (in watt) of the difference between the power of the storage and the net demand during a step.
+        min_step and max_step are the smallest and the largest step size.
+        """
+        
+        train_track = self.train_track
+        acceleration = train_track.get_acceleration()
+        power_change = abs(train_track.get_efficiency_generator() * train_track.force_of_generator * acceleration) + abs(slope)# How fast the storage power and the net demand change.
+        
+        limits = {"Maximum step" : max_step,
+                  "Velocity tolerance" : velocity_tolerance / abs(acceleration) if acceleration != 0 else np.inf,
+                  "Power tolerance" : power_tolerance / power_change if power_change != 0 else np.inf,
+                  "Cart event" : train_track.get_time_until_next_event(),
+                  "Profile breakpoint" : min(self.supply.get_next_breakpoint(self.time), self.demand.get_next_breakpoint(self.time)) - self.time}
+        
+        reason = min(limits, key = limits.get)
+        step = limits[reason]
+        
+        if step < min_step:# Events closer than the minimum step are simply stepped over, just like with fixed steps.
+            step = min_step
+            reason = "Minimum step"
+        
+        if 0 < end_time - self.time < step:
+            step = end_time - self.time
+            reason = "End time"
+        
+        return step, reason
+    
+    def simulate_adaptive(self, end_time_seconds = 364 * 24 * 3600, end_time_days = 0, velocity_tolerance = 0.05, power_tolerance = 10**5, min_step = None, max_step = 900):
+        """
+        Does the simulation until a certain end time (like simulate) but with a different step size for each tick. Long steps are taken while the net demand barely changes and no cart reaches the end of the track, and the steps are shortened to end at cart events (see TrainTrack.get_time_until_next_event) and at the data points of the supply and demand profiles, between which the net demand is linear. The compiled profile is not used since the ticks are not at fixed times.
+        
+        velocity_tolerance, power_tolerance, min_step and max_step set the step size, see get_adaptive_step. If min_step is None it is self.delta_time, so there are never more ticks than with fixed steps.
+        
+        How many steps were taken and saved (compared to fixed steps of self.delta_time) and what limited them is stored in self.step_statistics. The recorded rows are not at equal times, use get_energy_balance (which uses the time of each row) instead of multiplying by delta_time.
+        """
+        
+        end_time = end_time_seconds + 3600 * 24 * end_time_days
+        start_time = self.time
+        
+        if min_step is None:
+            min_step = self.delta_time
+        
+        steps = []
+        reasons = {}
+        segment_end = -np.inf# The net demand is linear until this time (the next data point of one of the profiles) with the slope below.
+        slope = 0
+        
+        while self.time <= end_time:
+            if self.time >= segment_end or segment_end == np.inf:# Without a next data point (the dummies, or after the last data point) the net demand isn't linear, so the slope is found again each step.
+                segment_end = min(self.supply.get_next_breakpoint(self.time), self.demand.get_next_breakpoint(self.time))
+                segment_time = segment_end if segment_end < np.inf else self.time + min_step# A small difference is used instead.
+                slope = (self.get_difference_supply_demand(segment_time) - self.get_difference_supply_demand(self.time)) / (segment_time - self.time)
+            
+            step, reason = self.get_adaptive_step(end_time, slope, velocity_tolerance, power_tolerance, min_step, max_step)
+            
+            self.do_tick(step)
+            
+            steps.append(step)
+            reasons[reason] = reasons.get(reason, 0) + 1
+        
+        fixed_steps = len(get_tick_times(start_time, end_time, self.delta_time))
+        
+        self.step_statistics = {"Steps" : len(steps),
+                                "Fixed steps" : fixed_steps,
+                                "Steps saved" : fixed_steps - len(steps),
+                                "Smallest step" : min(steps) if len(steps) > 0 else np.nan,
+                                "Largest step" : max(steps) if len(steps) > 0 else np.nan,
+                                "Mean step" : np.mean(steps) if len(steps) > 0 else np.nan,
+                                "Limited by" : reasons}
+        
+        supply, demand, net_demand = self.get_supply_demand()
+        
+        return supply - self.train_track.get_power() - demand# Positive is energy left over, negative is energy shortage
     
     def get_difference_supply_demand(self, time_seconds, time_days = 0):
         """
@@ -185,6 +372,65 @@ class Controller:
         
         return (self.supply.output(time) - self.train_track.get_power()) / self.demand.consumption(time)
 
+def get_energy_balance(data, end_time = None):
+    """
+    Integrates the recorded data over time and returns the energies (in kWh) of the supply, demand, storage, the difference (the net energy left over), the shortage (the energy of the demand that was not met) and the losses. Each row counts until the time of the next row, so this also works if the rows are not at equal times (see Controller.simulate_adaptive).
+    
+    data is a dictionary (or dataframe) with the recorded columns.
+    end_time is the time at which the last recorded tick ended (controller.time after simulating), if None the last tick is assumed to be as long as the one before it.
+    """
+    
+    time = np.asarray(data["Time"], dtype = np.float64)
+    
+    if len(time) == 0:
+        return {name : 0.0 for name in ["Supply", "Demand", "Storage", "Difference", "Shortage", "Losses"]}
+    
+    if end_time is None:
+        end_time = time[-1] + (time[-1] - time[-2] if len(time) > 1 else 0)
+    
+    steps = np.diff(time, append = end_time)
+    joules_to_kwh = 1 / (3.6 * 10**6)
+    
+    return {"Supply" : np.sum(np.asarray(data["Supply"]) * steps) * joules_to_kwh,
+            "Demand" : np.sum(np.asarray(data["Demand"]) * steps) * joules_to_kwh,
+            "Storage" : np.sum(np.asarray(data["Storage"]) * steps) * joules_to_kwh,
+            "Difference" : np.sum(np.asarray(data["Difference"]) * steps) * joules_to_kwh,
+            "Shortage" : -np.sum(np.minimum(np.asarray(data["Difference"]), 0) * steps) * joules_to_kwh,
+            "Losses" : np.sum(np.asarray(data["Losses"])) * joules_to_kwh}# The losses are already recorded as the energy lost during a tick.
+
+def compare_adaptive(make_controller, end_time_seconds = 364 * 24 * 3600, end_time_days = 0, **settings):
+    """
+    Simulates the same system once with fixed steps (Controller.simulate) and once with adaptive steps (Controller.simulate_adaptive) and compares them. Returns a dictionary with the step statistics of the adaptive run, the energy balance (see get_energy_balance) of both runs and the drift of the adaptive run (adaptive minus fixed, in kWh and relative to the demand) and the run times.
+    
+    make_controller is a function without arguments that makes a new controller, it is called once for each run so they don't share any objects.
+    settings are passed on to simulate_adaptive (like velocity_tolerance and power_tolerance).
+    """
+    
+    balances = {}
+    run_times = {}
+    
+    for mode in ["Fixed", "Adaptive"]:
+        controller = make_controller()
+        start = time.perf_counter()
+        
+        if mode == "Fixed":
+            controller.simulate(end_time_seconds, end_time_days)
+        else:
+            controller.simulate_adaptive(end_time_seconds, end_time_days, **settings)
+            step_statistics = controller.step_statistics
+        
+        run_times[mode] = time.perf_counter() - start
+        balances[mode] = get_energy_balance(controller.data, controller.time)
+    
+    drift = {name : balances["Adaptive"][name] - balances["Fixed"][name] for name in balances["Fixed"]}
+    
+    return {"Step statistics" : step_statistics,
+            "Fixed" : balances["Fixed"],
+            "Adaptive" : balances["Adaptive"],
+            "Drift (kWh)" : drift,
+            "Relative drift" : {name : value / balances["Fixed"]["Demand"] for name, value in drift.items()},
+            "Run time (s)" : run_times}
+
 """
 households = Households()
 wind_supply = WindSupplyDummy()
@@ -210,4 +456,16 @@ demand = Households(amount_of_households_per_type = [125000, 0, 0, 0, 0, 0, 0, 0
 controller = Controller(train_track = train_track, supply = supply, demand = demand, delta_time = 120)
 
 make_3Dfunction_plot(controller.get_sastisfaction_supply_demand, zLabel = "Satisfaction")
+#"""
+"""
+supply = WindSupply()
+demand = Households(amount_of_households_per_type = [67000, 0, 0, 0, 0, 0, 0, 0, 0, 0])
+
+def make_controller():
+    return Controller(train_track = TrainTrack(carts = 15000), supply = supply, demand = demand, delta_time = 10)
+
+comparison = compare_adaptive(make_controller, end_time_days = 7, velocity_tolerance = 0.05, power_tolerance = 10**5)
+
+print(comparison["Step statistics"])
+print(pd.DataFrame({"Fixed" : comparison["Fixed"], "Adaptive" : comparison["Adaptive"], "Drift (kWh)" : comparison["Drift (kWh)"]}))
 #"""
\ No newline at end of file
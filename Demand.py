@@ -3,83 +3,187 @@ import numpy as np
 import datetime
 import math
 
+from Helpers import interpolate_rows
+from Profiles import load_shared_profile, get_cached_profile_directory, save_cached_profile, is_cached
+
 class Households:
     """
     The households class is an object to store the data from the imported CSV file, then ready it for the modeling and finally giving values (with interpolation) to the simulation.
+    
+    The profiles are also kept normalised (the fraction of the yearly consumption in each 15 minutes) in profile_matrix, with a column per type. The power of each type (in watts) is made from it for the mix of households, so the mix can be changed with set_mix without reading the CSV file again, and the consumption of many mixes can be calculated at once (see consumption).
     """
-    def __init__(self, amount_of_households_per_type = [1, 0, 0, 0, 0, 0, 0, 0, 0, 0], power_consumption_per_type = [3500, 1000, 5000, 6900, 4200, 1, 0, 20000, 13000, 4000], profiel = "profielen Elektriciteit 2019 versie 1.00.csv"):
+    def __init__(self, amount_of_households_per_type = [1, 0, 0, 0, 0, 0, 0, 0, 0, 0], power_consumption_per_type = [3500, 1000, 5000, 6900, 4200, 1, 0, 20000, 13000, 4000], profiel = "profielen Elektriciteit 2019 versie 1.00.csv", shared_profile = None, cache_directory = None):
         """
         The initialize fuction for the households class imports the data from a CSV file and then reades it by cleaning up the data and converting it into actual power use.
         
         amount_of_households_per_type is the amount of households in each type of the data imported. Needs to match the amount of data columns in the profile in length.
         power_consumption_per_type is the amount of power each of those types consumes in a year. Unit is KWh per year. Also needs to match the amount of data columns in length.
         profiel is the name of the CSV file from which this NEDU data is imported.
+        shared_profile is a SharedProfile (see Profiles.py) published from another Households object, or its directory. If given the profile is not read from the CSV file but the shared arrays are used (read only, without copying them). The shared profile is normalised, so the amounts and consumptions given here are used. There is no dataframe then, so data is None.
+        cache_directory is the directory of the profile cache (see Profiles.py), if given the processed profile is stored there the first time and memory mapped from there afterwards (like a shared profile, so data is None then). If None there is no caching. The cached profile doesn't depend on the mix of households.
         """
         
+        cached_directory = None
+        
+        if shared_profile is None and cache_directory is not None:
+            cached_directory = get_cached_profile_directory(cache_directory, "Households", profiel)
+            
+            if is_cached(cached_directory):
+                shared_profile = cached_directory
+        
+        if shared_profile is not None:
+            arrays, metadata = load_shared_profile(shared_profile, "Households")
+            
+            self.data = None
+            self.start_time = pd.Timestamp(metadata["start_time"])
+            self.seconds = arrays["seconds"]
+            self.types = metadata["types"]
+            self.profile_matrix = arrays["profile_matrix"]
+            self.set_mix(amount_of_households_per_type, power_consumption_per_type)
+            return
+        
         data = pd.read_csv(profiel)# Import the data from a csv file as obtained from the NEBU website.
         data = data.drop([0,1,2,3], axis = 0)# Drop the first rows of useless meta data.
         data = data.reset_index(drop = True)# Fix the index now that some rows have been removed.
         data = data.rename(columns = {"Unnamed: 1":"Start time", "Versienr":"End time"})# Rename the relevant columns.
-        data = data.drop(data.columns[0], 1)# Drop the first column since it contains duplicate data.
+        data = data.drop(data.columns[0], axis = 1)# Drop the first column since it contains duplicate data.
         data["Start time"] = pd.to_datetime(data["Start time"], format="%d-%m-%Y %H:%M")
         start_time = data["Start time"][0]
         data["End time"] = pd.to_datetime(data["End time"], format="%d-%m-%Y %H:%M")
         
-        for i in range(2, len(data.columns)):# Loop trough all the data columns (so not the time columns)
-            data = data.rename(columns={data.columns[i]:data.columns[i][5:]})# Remove the first 5 letters from each columns name since that only contain the version number.
-            data[data.columns[i]] = data[data.columns[i]].astype("float")# Convert all the numbbers as strings to floats
-            
-            if data[data.columns[i]].sum() > 1 + 10**-4 or data[data.columns[i]].sum() < 1 - 10**-4:# Check if the sum of each column is (nearly) one.
-                print("Panic: column", data.columns[i],"of profile", profiel, "doesn't add up to 1 when summed. It is", data[data.columns[i]].sum(), "instead.")
+        data = data.rename(columns = {column : column[5:] for column in data.columns[2:]})# Remove the first 5 letters from each data column name (so not the time columns) since that only contain the version number.
+        types = list(data.columns[2:])
+        data[types] = data[types].astype("float")# Convert all the numbbers as strings to floats
         
-        for i in range(len(amount_of_households_per_type)):
-            data[data.columns[i + 2]] = data[data.columns[i + 2]] * power_consumption_per_type[i] * 3.6*10**6 / (15 * 60) * amount_of_households_per_type[i]# This calculation assumes 15 minutes between the datapoints.
+        for column, total in data[types].sum().items():
+            if total > 1 + 10**-4 or total < 1 - 10**-4:# Check if the sum of each column is (nearly) one.
+                print("Panic: column", column,"of profile", profiel, "doesn't add up to 1 when summed. It is", total, "instead.")
         
         time_since_start = data["Start time"] - start_time
-        data["Seconds"] = [time.total_seconds() for time in time_since_start]#[i * 15 * 60 for i in range(0,len(data["Start time"]))]
+        data["Seconds"] = time_since_start.dt.total_seconds()#[i * 15 * 60 for i in range(0,len(data["Start time"]))]
         data["Days"] = data["Seconds"] / (3600 * 24)
         
-        self.amount_of_households_per_type = amount_of_households_per_type
-        self.power_consumption_per_type = power_consumption_per_type
-        self.data = data
+        self.data = data# The power of each type in watts, set by set_mix.
         self.start_time = start_time
+        self.seconds = data["Seconds"].to_numpy(dtype = float)# Plain arrays of the columns needed for the interpolation, indexing these is a lot faster than indexing the dataframe.
+        self.types = list(data.columns[2:-2])# The names of the types of households.
+        self.profile_matrix = data[self.types].to_numpy(dtype = float)# A row per data point and a column per type.
+        self.set_mix(amount_of_households_per_type, power_consumption_per_type)
+        
+        if cached_directory is not None:
+            save_cached_profile(self, cached_directory)
+    
+    def set_mix(self, amount_of_households_per_type = None, power_consumption_per_type = None):
+        """
+        Changes the mix of households, without reading the profile again. Either can be left out (None) to keep the current one.
+        
+        amount_of_households_per_type is the amount of households of each type.
+        power_consumption_per_type is the consumption of each type in KWh per year.
+        """
+        
+        if amount_of_households_per_type is not None:
+            self.amount_of_households_per_type = np.array(amount_of_households_per_type, dtype = float)
+        if power_consumption_per_type is not None:
+            self.power_consumption_per_type = np.array(power_consumption_per_type, dtype = float)
+        
+        self.power_per_type = self.get_power_per_type(self.amount_of_households_per_type, self.power_consumption_per_type)
+        
+        if self.data is not None:
+            self.data[self.types] = self.power_per_type
+    
+    def get_power_per_type(self, amount_of_households_per_type, power_consumption_per_type = None):
+        """
+        Gets the power (in watts) of each type of households at each data point for a mix, from the normalised profiles.
+        
+        amount_of_households_per_type is the amount of households of each type.
+        power_consumption_per_type is the consumption of each type in KWh per year, if None the current one is used.
+        """
+        
+        if power_consumption_per_type is None:
+            power_consumption_per_type = self.power_consumption_per_type
+        
+        amounts = np.asarray(amount_of_households_per_type, dtype = float)
+        consumptions = np.asarray(power_consumption_per_type, dtype = float)
+        
+        if np.shape(amounts) != (len(self.types),) or np.shape(consumptions) != (len(self.types),):
+            raise ValueError("The mix needs a value for each of the " + str(len(self.types)) + " types of households " + str(self.types) + ".")
+        
+        return self.profile_matrix * consumptions * 3.6*10**6 / (15 * 60) * amounts# This calculation assumes 15 minutes between the datapoints.
+    
+    def get_profile_arrays(self):
+        """
+        Returns the arrays that are needed to calculate the consumption and a dictionary with the other information, used to publish them as a SharedProfile. The profiles are normalised so the mix is not part of it.
+        """
+        
+        metadata = {"start_time" : str(self.start_time),
+                    "types" : list(self.types)}
+        
+        return {"seconds" : self.seconds, "profile_matrix" : self.profile_matrix}, metadata
     
-    def consumption(self, time_seconds, time_days = 0, only_total = True):
+    def consumption(self, time_seconds, time_days = 0, only_total = True, mixes = None):
         """
         Based on the data in the households object it returns the amount power used. It uses linear interpolation between points to preserve continuity.
         
-        time_seconds is a number in seconds, which can be more than a day, is the time of which you want to know the power usage.
-        time_days is a number in days which gets converted to seconds and then added to time in seconds.
-        only_total is a boolean which decided if you want to have results split into categories or if you want just the total power usage.
+        time_seconds is a number in seconds, which can be more than a day, is the time of which you want to know the power usage. It can also be a (numpy) array of times, then an array with the power usage at each of those times is returned.
+        time_days is a number (or array) in days which gets converted to seconds and then added to time in seconds.
+        only_total is a boolean which decided if you want to have results split into categories or if you want just the total power usage. For a single time the split results are a dictionary with the type as key, for an array of times it is an array with one extra (last) axis for the types (in the order of self.types).
+        mixes is an array with a row of amounts of households per type for each mix, to calculate the total power usage of many mixes at once (with the current consumption per type). The result then has one extra (last) axis for the mixes, each with exactly the same value as when that mix is set with set_mix (the power of each type is made for one mix at a time, so that takes about as long as asking each mix one by one but without changing the mix). If None the current mix is used.
         """
         
-        estimated_row_bot = math.floor(time_seconds / (15 * 60) + time_days * 24 * 4)# Makes an estimate for which row the data is in we are searching for.
+        single_time = np.ndim(time_seconds) == 0 and np.ndim(time_days) == 0
+        time_seconds = np.asarray(time_seconds, dtype = float)
+        time_days = np.asarray(time_days, dtype = float)
+        
+        estimated_row_bot = np.floor(time_seconds / (15 * 60) + time_days * 24 * 4)# Makes an estimate for which row the data is in we are searching for.
         wanted_time = time_seconds + time_days * 3600 * 24
         
-        # print("Getting consumption at estimated index", estimated_row_bot)
-        if not (self.data["Seconds"][estimated_row_bot] <= wanted_time and self.data["Seconds"][estimated_row_bot + 1] >= wanted_time):# Checks if the estimate row is correct.
-            #print("Attention for time", wanted_time / (3600 * 24), "(d) the rows are not predicatable anymore.")
+        if mixes is not None:
+            mixes = np.asarray(mixes, dtype = float)
+            total = np.empty(np.shape(wanted_time) + (len(mixes),))
             
-            if self.data["Seconds"][estimated_row_bot] > wanted_time:# If estimate is incorrect determine if to high or to low.
-                direction = -1
-            else:
-                direction = 1
+            for j, mix in enumerate(mixes):
+                total[..., j] = self.get_total(self.get_power_per_type(mix), wanted_time, estimated_row_bot)
             
-            while not (self.data["Seconds"][estimated_row_bot] <= wanted_time and self.data["Seconds"][estimated_row_bot + 1] >= wanted_time):# Until the correct row is found go lower or higher.
-                estimated_row_bot = estimated_row_bot + direction
-        
-        interpolation_factor = (wanted_time - self.data["Seconds"][estimated_row_bot]) / (self.data["Seconds"][estimated_row_bot + 1] - self.data["Seconds"][estimated_row_bot]) # time_difference_for_bot_point / time_difference_between_points
+            return total
         
-        results = {}
+        if only_total:# Depending on the options either return the total power or the power per type.
+            return self.get_total(self.power_per_type, wanted_time, estimated_row_bot)[()]
         
-        for i in range(2, len(self.data.columns) - 2):# Do the procces for every column except the first two and the last two (both are time data).
-            column = self.data.columns[i]
-            results[column] = self.data[column][estimated_row_bot] + interpolation_factor * (self.data[column][estimated_row_bot + 1] - self.data[column][estimated_row_bot])# The amount of power is interpolated using linear interpolation.
+        results = interpolate_rows(self.seconds, self.power_per_type, wanted_time, estimated_row_bot)# The amount of power of each type is interpolated using linear interpolation, the rows are found with a binary search (only if the estimate is wrong).
         
-        if only_total:# Depending on the options either return the total power or the power per type.
-            return sum(results.values())
+        if single_time:
+            return dict(zip(self.types, results))
         else:
             return results
+    
+    def get_total(self, power_per_type, wanted_time, estimated_row_bot):
+        """
+        Interpolates the power of each type (see consumption) and returns the total of the types.
+        """
+        
+        results = interpolate_rows(self.seconds, power_per_type, wanted_time, estimated_row_bot)# The amount of power of each type is interpolated using linear interpolation, the rows are found with a binary search (only if the estimate is wrong).
+        
+        total = 0
+        for i in range(len(self.types)):# Sum the types one after the other (instead of np.sum) so the rounding doesn't depend on the amount of times asked.
+            total = total + results[..., i]
+        
+        return total
+    
+    def compile(self, times, mixes = None):
+        """
+        Gets the total power consumption for an entire array of times (in seconds) at once, optionally for many mixes at once (see consumption).
+        """
+        
+        return self.consumption(np.asarray(times, dtype = float), mixes = mixes)
+    
+    def get_next_breakpoint(self, time_seconds):
+        """
+        Gets the first time (in seconds) after the given time at which there is a data point in the profile. Between data points the consumption is linear. Returns infinity after the last data point.
+        """
+        
+        index = np.searchsorted(self.seconds, time_seconds, side = "right")
+        
+        return self.seconds[index] if index < len(self.seconds) else np.inf
 
 
 class HouseholdsDummy:
@@ -91,14 +195,28 @@ class HouseholdsDummy:
     
     def consumption(self, time_seconds, time_days = 0, average_power = 3500 * 3.6*10**6 / (365 * 24 * 3600)):
         
+        time_seconds = np.asarray(time_seconds, dtype = float)# So that lists and arrays of times also work.
+        time_days = np.asarray(time_days, dtype = float)
+        
         day_factor = np.cos(2 * np.pi * time_days / 360)
         
         return self.multiplication * average_power * (1 - 0.5 * np.sin(2 * np.pi * (time_seconds + 3600) / (24 * 3600)) + 0.25 * day_factor)
+    
+    def compile(self, times):
+        """
+        Gets the power consumption for an entire array of times (in seconds) at once.
+        """
+        
+        return self.consumption(np.asarray(times, dtype = float))
+    
+    def get_next_breakpoint(self, time_seconds):
+        """
+        The dummy is a smooth function without data points, so this is always infinity.
+        """
+        
+        return np.inf
 
-from mpl_toolkits.mplot3d import axes3d
-from matplotlib import pyplot
-from matplotlib import cm
-from Helpers import make_3Dfunction_plot
+from Helpers import make_3Dfunction_plot# Only imports matplotlib when a plot is made.
 
 
 """
@@ -106,5 +224,5 @@ households = Households()
 #print(households.data.head(100))
 print(households.data)
 #print(households.consumption(1400, 300))
-make_3Dfunction_plot(households.consumption, zlabel = "Power (Watts)")
+make_3Dfunction_plot(households.consumption, zlabel = "Power (Watts)", vectorized = True)
 #"""
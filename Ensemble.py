@@ -0,0 +1,392 @@
+import pandas as pd
+import numpy as np
+
+from Storage import TrainTrack
+from Profiles import CompiledProfile
+from Policies import ReferencePolicy, NO_CART, ADD_CART, ADD_TOP
+
+class Ensemble:
+    """
+    The ensemble simulates many train track configurations at the same time, all with the same supply and demand. Since the carts on a track move as one block the state of a configuration is only a few numbers (velocity, force, the amount of carts at the top and bottom and so on), so the state of all configurations is stored as one array per quantity (a struct of arrays) and each tick is done for all configurations at once with numpy. The physics and the control are the same as TrainTrack.do_tick and Controller.controller, with the operations in the same order so each configuration gives exactly the same numbers as simulating it on its own.
+    
+    The positions of the carts on the track are stored for each configuration in a ring buffer (one row of a 2D array). Carts are only added when they are at least the minimal distance apart, so a row only needs room for the length of the track divided by the minimal distance.
+    
+    Instead of recording every tick the ensemble keeps a running summary of each configuration (see get_summary).
+    """
+    def __init__(self, train_tracks, supply, demand, delta_time = 5, max_speed = 10, max_acceleration = 1, allow_new_carts = True, supply_scale = 1, demand_scale = 1, policy = None):
+        """
+        The init function.
+        
+        train_tracks is a list of TrainTrack objects, one for each configuration. Their settings and their current state are used (so they can also be warmed up first), the objects themselves are not changed (see get_train_track).
+        supply and demand are the supply and demand objects which are shared by all configurations, they need to have a compile function (see Profiles.py).
+        delta_time is the time step size.
+        max_speed, max_acceleration and allow_new_carts are the settings of the controller, either one value for all configurations or a list with a value for each configuration.
+        supply_scale and demand_scale multiply the (shared) supply and demand for each configuration, either one value for all or a list with a value for each configuration. This way for example a different amount of windmills can be simulated without a different profile.
+        policy is the policy (see Policies.py) that decides for all configurations at once, if None the ReferencePolicy (the same as the Controller uses by default).
+        """
+        
+        self.train_tracks = list(train_tracks)
+        self.size = len(self.train_tracks)
+        size = self.size
+        
+        self.time = 0
+        self.delta_time = delta_time
+        self.supply = supply
+        self.demand = demand
+        self.profile = None
+        self.profile_index = 0
+        self.policy = ReferencePolicy() if policy is None else policy
+        
+        self.max_speed = np.broadcast_to(np.asarray(max_speed, dtype = np.float64), size).copy()
+        self.max_acceleration = np.broadcast_to(np.asarray(max_acceleration, dtype = np.float64), size).copy()
+        self.allow_new_carts = np.broadcast_to(np.asarray(allow_new_carts, dtype = bool), size).copy()
+        self.supply_scale = np.broadcast_to(np.asarray(supply_scale, dtype = np.float64), size).copy()
+        self.demand_scale = np.broadcast_to(np.asarray(demand_scale, dtype = np.float64), size).copy()
+        
+        g = 9.81
+        friction_coefficient = 0.0015# The same constants as TrainTrack.get_friction.
+        
+        self.track_length = np.array([track.track_length for track in self.train_tracks], dtype = np.float64)
+        self.mass_per_cart = np.array([track.mass_per_cart for track in self.train_tracks], dtype = np.float64)
+        self.minimal_distance = np.array([track.minimal_distance for track in self.train_tracks], dtype = np.float64)
+        self.efficiency_generating = np.array([track.efficiency_generator[0] for track in self.train_tracks], dtype = np.float64)
+        self.efficiency_storing = np.array([track.efficiency_generator[1] for track in self.train_tracks], dtype = np.float64)
+        self.gravity_per_cart = np.array([-np.sin(track.angle) * g for track in self.train_tracks], dtype = np.float64)# Calculated for each track on its own (instead of with one np.sin on an array) so the rounding is the same as TrainTrack.get_gravity.
+        self.rolling_friction = np.array([np.cos(track.angle) * g * track.mass_per_cart * friction_coefficient for track in self.train_tracks], dtype = np.float64)
+        self.friction_multiplier = np.array([len(track.carts_of_track) for track in self.train_tracks], dtype = np.float64)# The same multiplier as TrainTrack.get_friction uses.
+        
+        self.velocity = np.array([track.velocity for track in self.train_tracks], dtype = np.float64)
+        self.displacement = np.array([track.displacement for track in self.train_tracks], dtype = np.float64)
+        self.carts_top = np.array([track.carts_of_track["Top"] for track in self.train_tracks], dtype = np.float64)
+        self.carts_bottom = np.array([track.carts_of_track["Bottom"] for track in self.train_tracks], dtype = np.float64)
+        self.force_of_generator = np.array([track.force_of_generator for track in self.train_tracks], dtype = np.float64)
+        self.other_power = np.array([track.other_power for track in self.train_tracks], dtype = np.float64)
+        self.losses_friction = np.array([track.losses["Friction"] for track in self.train_tracks], dtype = np.float64)
+        self.losses_efficiency = np.array([track.losses["Efficiency"] for track in self.train_tracks], dtype = np.float64)
+        
+        amount_of_carts = [track.get_amount_carts_on_track() for track in self.train_tracks]
+        capacity = max([int(length / distance) + 2 if distance > 0 else 64 for length, distance in zip(self.track_length, self.minimal_distance)] + amount_of_carts + [1])
+        
+        self.carts = np.zeros((size, capacity), dtype = np.float64)# The ring buffers with the carts of each track, stored like in TrainTrack.cart_queue (the position minus the displacement).
+        self.head = np.zeros(size, dtype = np.int64)# The index of the lowest cart in each ring buffer.
+        self.amount = np.array(amount_of_carts, dtype = np.int64)# The amount of carts on each track.
+        
+        for i, track in enumerate(self.train_tracks):
+            self.carts[i, :self.amount[i]] = track.cart_queue.view()
+        
+        self.rows = np.arange(size)
+        self.reset_summary()
+    
+    def grow(self):
+        """
+        Doubles the room in the ring buffers. Only needed if the minimal distance is zero (or a track started with more carts than fit).
+        """
+        
+        capacity = self.carts.shape[1]
+        positions = (self.head[:, np.newaxis] + np.arange(capacity)) % capacity
+        
+        new_carts = np.zeros((self.size, 2 * capacity), dtype = np.float64)
+        new_carts[:, :capacity] = self.carts[self.rows[:, np.newaxis], positions]
+        
+        self.carts = new_carts
+        self.head = np.zeros(self.size, dtype = np.int64)
+    
+    def get_lowest_carts(self):
+        """
+        Gets the stored value (position minus displacement) of the lowest cart of each track. Only meaningful for tracks with carts.
+        """
+        
+        return self.carts[self.rows, self.head]
+    
+    def get_highest_carts(self):
+        """
+        Gets the stored value (position minus displacement) of the highest cart of each track. Only meaningful for tracks with carts.
+        """
+        
+        return self.carts[self.rows, (self.head + self.amount - 1) % self.carts.shape[1]]
+    
+    def get_gravity(self):
+        """
+        Gets the gravity of each track, see TrainTrack.get_gravity.
+        """
+        
+        return self.gravity_per_cart * self.amount * self.mass_per_cart
+    
+    def get_friction(self):
+        """
+        Gets the friction of each track, see TrainTrack.get_friction.
+        """
+        
+        density_air = 1.275
+        drag_coefficient = 1.05 * (2.591 * 2.438) / 2
+        
+        return -np.sign(self.velocity) * self.friction_multiplier * (density_air * self.velocity**2 * drag_coefficient + self.rolling_friction)
+    
+    def get_efficiency_generator(self):
+        """
+        Gets the efficiency of the generator of each track, see TrainTrack.get_efficiency_generator.
+        """
+        
+        return np.where(self.velocity > 0, self.efficiency_storing, self.efficiency_generating)
+    
+    def get_power(self):
+        """
+        Gets the power that each track generates, see TrainTrack.get_power.
+        """
+        
+        return self.efficiency_generating * self.other_power + self.get_efficiency_generator() * self.force_of_generator * self.velocity
+    
+    def add_carts(self, mask, top):
+        """
+        Tries to add a cart to each of the tracks in the mask, see TrainTrack.add_cart.
+        
+        mask is a boolean array with the tracks to which a cart is added.
+        top is a boolean array which decides for each track if the cart is added at the top (True) or at the bottom (False).
+        """
+        
+        if not mask.any():
+            return
+        
+        if (mask & (self.amount >= self.carts.shape[1])).any():
+            self.grow()
+        
+        empty = self.amount == 0
+        highest = np.where(empty, 0, self.get_highest_carts() + self.displacement)
+        lowest = np.where(empty, self.track_length, self.get_lowest_carts() + self.displacement)
+        
+        fits = mask & np.where(top, (self.track_length - highest) > self.minimal_distance, lowest > self.minimal_distance)# Checks if the minimal distance can be kept when adding a cart.
+        
+        amount = self.amount[fits]
+        velocity = self.velocity[fits]
+        self.velocity[fits] = np.sign(velocity) * np.sqrt(amount * velocity**2 / (amount + 1))# The new velocity based on the conservation of energy (also when there turns out to be no cart available, just like TrainTrack.add_cart).
+        
+        capacity = self.carts.shape[1]
+        add_top = fits & top & (self.carts_top > 0)
+        add_bottom = fits & ~top & (self.carts_bottom > 0)
+        
+        rows = self.rows[add_top]
+        self.carts[rows, (self.head[rows] + self.amount[rows]) % capacity] = self.track_length[rows] - self.displacement[rows]
+        self.carts_top[add_top] = self.carts_top[add_top] - 1
+        
+        rows = self.rows[add_bottom]
+        self.head[rows] = (self.head[rows] - 1) % capacity
+        self.carts[rows, self.head[rows]] = 0 - self.displacement[rows]
+        self.carts_bottom[add_bottom] = self.carts_bottom[add_bottom] - 1
+        
+        self.amount[add_top | add_bottom] = self.amount[add_top | add_bottom] + 1
+    
+    def remove_carts_off_track(self, delta_time):
+        """
+        Removes the carts which have gone past the bottom or the top of the tracks and (if allowed) adds a new one at the other end for each, see TrainTrack.remove_carts_off_track. Each pass removes at most one cart from each track, so the carts are removed in the same order as on a single track.
+        """
+        
+        capacity = self.carts.shape[1]
+        
+        while True:
+            has_carts = self.amount > 0
+            lowest = self.get_lowest_carts()
+            highest = self.get_highest_carts()
+            
+            bottom = has_carts & ~(lowest > self.track_length - self.displacement) & (lowest < 0 - self.displacement)
+            top = has_carts & ~bottom & (highest > self.track_length - self.displacement)
+            removed = bottom | top
+            
+            if not removed.any():
+                break
+            
+            position = np.where(bottom, lowest, highest) + self.displacement
+            self.head[bottom] = (self.head[bottom] + 1) % capacity
+            self.amount[removed] = self.amount[removed] - 1
+            
+            energy_left_over = (1/2) * self.mass_per_cart[removed] * self.velocity[removed]**2
+            self.other_power[removed] = self.other_power[removed] - energy_left_over / delta_time
+            
+            to_top = removed & (position > self.track_length / 2)
+            self.carts_top[to_top] = self.carts_top[to_top] + 1
+            self.carts_bottom[removed & ~to_top] = self.carts_bottom[removed & ~to_top] + 1
+            
+            self.add_carts(removed & self.allow_new_carts, bottom)# A cart that went past the bottom is replaced at the top and the other way around.
+    
+    def get_policy_state(self, full = True):
+        """
+        Gets the state of all tracks that a policy uses, see Controller.get_policy_state. Each value is an array with a value for each configuration.
+        """
+        
+        state = {"time" : self.time,
+                 "max_speed" : self.max_speed,
+                 "max_acceleration" : self.max_acceleration}
+        
+        self.update_policy_state(state, full)
+        
+        return state
+    
+    def update_policy_state(self, state, full = True):
+        """
+        Sets the parts of a policy state that change when carts are added, see Controller.update_policy_state.
+        """
+        
+        state["velocity"] = self.velocity
+        state["amount_of_carts"] = self.amount
+        state["carts_on_top"] = self.carts_top
+        state["carts_on_bottom"] = self.carts_bottom
+        
+        if full:
+            state["gravity"] = self.get_gravity()
+            state["friction"] = self.get_friction()
+            state["efficiency"] = self.get_efficiency_generator()
+            state["efficiency_generating"] = self.efficiency_generating
+            state["efficiency_storing"] = self.efficiency_storing
+            state["mass_per_cart"] = self.mass_per_cart
+    
+    def controller(self, net_demand, delta_time):
+        """
+        The control of all tracks at once with the policy, see Controller.controller.
+        
+        net_demand is an array with the difference in supply and demand for each configuration.
+        delta_time is the size of the coming time step.
+        """
+        
+        self.remove_carts_off_track(delta_time)
+        
+        state = self.get_policy_state(False)
+        action = np.broadcast_to(self.policy.decide_carts(state, net_demand), self.size)
+        self.add_carts(action != NO_CART, np.where(action == ADD_CART, ~(np.sign(self.velocity) > 0), action == ADD_TOP))# With ADD_CART the direction decides the location, like TrainTrack.add_cart.
+        
+        self.update_policy_state(state)# With the carts that were added and the forces.
+        self.force_of_generator = np.broadcast_to(self.policy.get_force(state, net_demand, delta_time), self.size).astype(np.float64)
+    
+    def do_physics(self, delta_time):
+        """
+        The physics of all tracks at once, see TrainTrack.do_tick.
+        """
+        
+        efficiency = self.get_efficiency_generator()
+        friction = self.get_friction()
+        
+        self.losses_friction = np.abs(friction * self.velocity) * delta_time
+        self.losses_efficiency = (1 - self.efficiency_generating) * self.other_power + np.abs((1 - efficiency) * self.force_of_generator * self.velocity) * delta_time
+        self.other_power = np.zeros(self.size)
+        
+        has_carts = self.amount > 0
+        acceleration = np.zeros(self.size)
+        acceleration[has_carts] = (self.get_gravity()[has_carts] + friction[has_carts] + self.force_of_generator[has_carts]) / (self.amount[has_carts] * self.mass_per_cart[has_carts])
+        
+        self.velocity[~has_carts] = 0
+        self.displacement[~has_carts] = 0
+        
+        change_in_position = self.velocity * delta_time + 0.5 * acceleration * delta_time**2
+        self.displacement = self.displacement + change_in_position
+        self.velocity = self.velocity + acceleration * delta_time
+    
+    def record(self, supply, demand):
+        """
+        Adds the current tick to the running summary of each configuration (the same quantities as Recorder.record).
+        """
+        
+        storage = self.get_power()
+        difference = supply - storage - demand
+        
+        self.summary_ticks = self.summary_ticks + 1
+        self.summary_shortage = self.summary_shortage - np.minimum(difference, 0)
+        self.summary_satisfaction = self.summary_satisfaction + (supply - storage) / demand
+        self.summary_losses = self.summary_losses + (self.losses_friction + self.losses_efficiency)
+        self.summary_peak_velocity = np.maximum(self.summary_peak_velocity, np.abs(self.velocity))
+    
+    def reset_summary(self):
+        """
+        Clears the running summary, for example after warming up.
+        """
+        
+        self.summary_ticks = 0
+        self.summary_shortage = np.zeros(self.size)
+        self.summary_satisfaction = np.zeros(self.size)
+        self.summary_losses = np.zeros(self.size)
+        self.summary_peak_velocity = np.zeros(self.size)
+    
+    def get_summary(self):
+        """
+        Returns a dataframe with a row for each configuration with the same columns as Sweep.get_summary, calculated from the ticks since the last reset_summary.
+        """
+        
+        ticks = self.summary_ticks
+        
+        return pd.DataFrame({"Unmet energy (kWh)" : self.summary_shortage * self.delta_time / (3.6 * 10**6),
+                             "Mean satisfaction" : self.summary_satisfaction / ticks if ticks > 0 else np.full(self.size, np.nan),
+                             "Losses (kWh)" : self.summary_losses / (3.6 * 10**6),
+                             "Peak velocity" : self.summary_peak_velocity if ticks > 0 else np.full(self.size, np.nan)})
+    
+    def compile_profiles(self, end_time_seconds = 364 * 24 * 3600, end_time_days = 0):
+        """
+        Interpolates the shared supply and demand for all the ticks from the current time until the end time, see Controller.compile_profiles.
+        """
+        
+        end_time = end_time_seconds + 3600 * 24 * end_time_days
+        
+        self.profile = CompiledProfile(self.supply, self.demand, self.time, end_time, self.delta_time)
+        self.profile_index = 0
+    
+    def do_tick(self):
+        """
+        Does a tick for all configurations: records the summary, does the control and then the physics.
+        """
+        
+        supply = self.profile.supply[self.profile_index] * self.supply_scale
+        demand = self.profile.demand[self.profile_index] * self.demand_scale
+        
+        self.record(supply, demand)
+        
+        self.controller(supply - demand, self.delta_time)
+        self.do_physics(self.delta_time)
+        
+        self.time = self.time + self.delta_time
+        self.profile_index = self.profile_index + 1
+    
+    def simulate(self, end_time_seconds = 364 * 24 * 3600, end_time_days = 0):
+        """
+        Simulates all configurations until a certain end time. The supply and demand are compiled first if the compiled profile doesn't cover the horizon.
+        """
+        
+        end_time = end_time_seconds + 3600 * 24 * end_time_days
+        
+        if not (self.profile is not None and self.profile.covers(self.profile_index, self.time, end_time)):
+            self.compile_profiles(end_time)
+        
+        while self.time <= end_time:
+            self.do_tick()
+    
+    def get_train_track(self, index):
+        """
+        Returns a copy of the TrainTrack object of a configuration with the current state of that configuration, for example to continue simulating it on its own or to look at the positions of its carts.
+        """
+        
+        train_track = self.train_tracks[index].copy()
+        capacity = self.carts.shape[1]
+        
+        train_track.set_state({"velocity" : self.velocity[index],
+                               "cart_queue" : self.carts[index, (self.head[index] + np.arange(self.amount[index])) % capacity],
+                               "displacement" : self.displacement[index],
+                               "carts_of_track" : {"Bottom" : self.carts_bottom[index], "Top" : self.carts_top[index]},
+                               "losses" : {"Friction" : self.losses_friction[index], "Efficiency" : self.losses_efficiency[index]},
+                               "force_of_generator" : self.force_of_generator[index],
+                               "other_power" : self.other_power[index]})
+        
+        return train_track
+
+
+"""
+from Supply import WindSupply
+from Demand import Households
+
+supply = WindSupply()
+demand = Households(amount_of_households_per_type = [67000, 0, 0, 0, 0, 0, 0, 0, 0, 0])
+
+carts = np.linspace(1000, 50000, 1000)
+ensemble = Ensemble([TrainTrack(carts = amount / 2) for amount in carts], supply, demand, delta_time = 10)
+ensemble.simulate(3600)# Warm up.
+ensemble.reset_summary()
+ensemble.simulate(364 * 24 * 3600)
+
+summary = ensemble.get_summary()
+summary["Carts"] = carts
+print(summary)
+#"""
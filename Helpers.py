@@ -3,45 +3,95 @@ import numpy as np
 import datetime
 import math
 
-from mpl_toolkits.mplot3d import axes3d
-from matplotlib import pyplot
-import matplotlib.pyplot as plt
-from matplotlib import cm
+def find_rows(seconds, wanted_time, rows, correct):
+    """
+    Finds the rows of the times for which the estimated row was wrong (see interpolate_rows) with a binary search. Walking down ends at the last row at or before the wanted time, walking up at the row just before the first point at or after it.
+    
+    seconds is the sorted array with the time of each data point.
+    wanted_time is the array with the wanted times.
+    rows is the array with the estimated rows.
+    correct is a boolean array which is True where the estimated row is already correct, those rows are kept.
+    """
+    
+    walk_down = np.searchsorted(seconds, wanted_time, side = "right") - 1
+    walk_up = np.searchsorted(seconds, wanted_time, side = "left") - 1
+    rows = np.where(correct, rows, np.where(seconds[rows] > wanted_time, walk_down, walk_up))
+    
+    return np.clip(rows, 0, len(seconds) - 2)
 
-def make_3Dfunction_plot(function, amount_of_days = 364, increments_in_day = 200, zlabel = "", title = "", view_position = [60, -120]):
+def interpolate_rows(seconds, values, wanted_time, estimated_row_bot):
+    """
+    Does the linear interpolation of the profiles (WindSupply and Households) for an entire array of times at once. First the estimated row is checked, only if that is wrong a binary search is done. It ends up on the same row as walking from the estimate row by row would (also exactly on a data point) so the results don't depend on if the times are asked one by one or all at once.
+    
+    seconds is a sorted array with the time (in seconds) of each data point.
+    values is an array with the data that needs to be interpolated. Its first axis has to match seconds, if it is 2D every column is interpolated.
+    wanted_time is an array with the times (in seconds) of which you want to know the value.
+    estimated_row_bot is an array (same shape as wanted_time) with the estimate of the row the data is in.
+    
+    Raises a ValueError if a wanted time is before the first or after the last data point.
+    """
+    
+    wanted_time = np.asarray(wanted_time, dtype = float)
+    rows = np.clip(np.asarray(estimated_row_bot, dtype = np.int64), 0, len(seconds) - 2)
+    
+    correct = (seconds[rows] <= wanted_time) & (seconds[rows + 1] >= wanted_time)# Checks if the estimated row is correct.
+    
+    if not np.all(correct):
+        if np.min(wanted_time) < seconds[0] or np.max(wanted_time) > seconds[-1]:# Only possible if an estimate is wrong, so it costs nothing when all estimates are correct.
+            raise ValueError("The times have to be within the profile (from " + str(seconds[0]) + " until " + str(seconds[-1]) + " seconds), it is not extrapolated.")
+        
+        rows = find_rows(seconds, wanted_time, rows, correct)
+    
+    interpolation_factor = (wanted_time - seconds[rows]) / (seconds[rows + 1] - seconds[rows])# time_difference_for_bot_point / time_difference_between_points
+    
+    if values.ndim > 1:
+        interpolation_factor = interpolation_factor[..., np.newaxis]
+    
+    return values[rows] + interpolation_factor * (values[rows + 1] - values[rows])
+
+def make_3Dfunction_plot(function, amount_of_days = 364, increments_in_day = 200, zlabel = "", title = "", view_position = [60, -120], vectorized = False):
     """
     Makes a 3D plot like in the paper of Elke Klaasen (on the X axis the hours of the day, Y axis the days (of the year) and on the Z axis the actual value). Sadly makes a surface plot instead of a wireframe plot this is because the heatmap didn't work properly with the wireframe.
     
     function is the function of which it is going to make the wire plot
     amount_of_days is the amount of days you want the plot to coverting
     increments_in_day is the amount of steps during each day. Making this number large increases the x-axis accuracy of the plot but also increases computational time greatly.
+    vectorized is a boolean which can be set to True if the function accepts arrays of times (like WindSupply.output and Households.consumption). Then the entire surface is calculated in one call which is a lot faster. Functions that have to be called in order (like Controller.simulate) need it to be False.
     """
     
-    x = []
-    y = []
-    z = []
-    
-    x_new = []
-    y_new = []
-    z_new = []
+    from mpl_toolkits.mplot3d import axes3d# Matplotlib is only imported when a plot is made, so running simulations without plots (for example in worker processes) doesn't have to load it.
+    from matplotlib import pyplot
+    from matplotlib import cm
     
-    for day in range(0, amount_of_days):# For each individual day on the y-axis you make a new array containing the values for each hour (including the x and y-axis values themselfs) this you then append to the total array.
-        for hour in np.linspace(0, 24, increments_in_day, endpoint = True):
-            x_new.append(hour)
-            y_new.append(day)
-            z_new.append(function(hour * 3600, day))
-        
-        x.append(x_new)
-        y.append(y_new)
-        z.append(z_new)
+    if vectorized:
+        x, y = np.meshgrid(np.linspace(0, 24, increments_in_day, endpoint = True), np.arange(0, amount_of_days))# Each row is a day and each column a time in that day, just like the loop below makes it.
+        z = np.asarray(function(x * 3600, y))
+    else:
+        x = []
+        y = []
+        z = []
         
         x_new = []
         y_new = []
         z_new = []
-    
-    x = np.array(x)
-    y = np.array(y)
-    z = np.array(z)
+        
+        for day in range(0, amount_of_days):# For each individual day on the y-axis you make a new array containing the values for each hour (including the x and y-axis values themselfs) this you then append to the total array.
+            for hour in np.linspace(0, 24, increments_in_day, endpoint = True):
+                x_new.append(hour)
+                y_new.append(day)
+                z_new.append(function(hour * 3600, day))
+            
+            x.append(x_new)
+            y.append(y_new)
+            z.append(z_new)
+            
+            x_new = []
+            y_new = []
+            z_new = []
+        
+        x = np.array(x)
+        y = np.array(y)
+        z = np.array(z)
     
     #print(x, np.shape(x))
     #print(y, np.shape(y))
@@ -60,4 +110,64 @@ def make_3Dfunction_plot(function, amount_of_days = 364, increments_in_day = 200
     wf.set_xlim(0, 24)
     wf.set_ylim(0, amount_of_days)
     
-    pyplot.show()
\ No newline at end of file
+    pyplot.show()
+
+def plot_time_series(data, columns, labels = None, ylabel = "", title = "", max_points = 2000, start_time = None, end_time = None):
+    """
+    Plots columns of the recorded data against the time in days, for runs of any length. The data is indexed in a TimeSeriesPyramid (see Pyramid.py) so at most about max_points buckets per column are drawn: the mean as a line and the range between the minimum and maximum of each bucket as a shaded band, so short peaks stay visible. When zooming in the window is loaded again from the level that fits it, down to the recorded rows.
+    
+    data is a TimeSeriesPyramid or something it can index (the recorded data or the path of an output, see Output.open_output). Indexing takes some time for long runs, so for several plots of the same data make the TimeSeriesPyramid once.
+    columns is a list of the columns that are plotted.
+    labels is a list with the label of each column in the legend, if None there is no legend.
+    max_points is the amount of buckets per column that is drawn at most.
+    start_time and end_time are the first and last time (in seconds) that are shown, None is the start or end of the data.
+    
+    Returns the TimeSeriesPyramid.
+    """
+    
+    from matplotlib import pyplot# Only imported when a plot is made, see make_3Dfunction_plot.
+    from Pyramid import TimeSeriesPyramid
+    
+    pyramid = data if isinstance(data, TimeSeriesPyramid) else TimeSeriesPyramid(data, columns)
+    
+    fig = pyplot.figure(figsize = (8,8))
+    axis = fig.add_subplot(111)
+    lines = [axis.plot([], [], label = None if labels is None else labels[i])[0] for i in range(len(columns))]
+    bands = []
+    
+    def draw(start_time, end_time):
+        table = pyramid.query(start_time, end_time, max_points, columns)
+        days = table["Time"].to_numpy() / (3600 * 24)
+        
+        for band in bands:
+            band.remove()
+        bands.clear()
+        
+        for column, line in zip(columns, lines):
+            line.set_data(days, table[column + " mean"].to_numpy())
+            if table.attrs["Bucket size"] > 1:
+                bands.append(axis.fill_between(days, table[column + " min"].to_numpy(), table[column + " max"].to_numpy(), color = line.get_color(), alpha = 0.3, linewidth = 0))
+        
+        return days
+    
+    days = draw(start_time, end_time)
+    axis.relim()
+    axis.autoscale_view()
+    if len(days) > 0:
+        axis.set_xlim(days[0], days[-1])
+    
+    def on_zoom(axis):
+        start_day, end_day = axis.get_xlim()
+        draw(start_day * 3600 * 24, end_day * 3600 * 24)
+    
+    axis.callbacks.connect("xlim_changed", on_zoom)
+    
+    axis.set_xlabel("Time (days)")
+    axis.set_ylabel(ylabel)
+    axis.set_title(title)
+    if labels is not None:
+        axis.legend(loc = "upper left")
+    
+    pyplot.show()
+    
+    return pyramid
@@ -0,0 +1,182 @@
+import numpy as np
+import json
+import time
+
+import Helpers
+
+PHASES = ["Compiling profiles", "Supply and demand", "Recording", "Check carts", "Controller", "Physics"]# The phases of a simulation that are timed, together they are (nearly) the entire run time.
+
+class Instrumentation:
+    """
+    Measures where the time of a simulation goes. Give it to Controller.simulate (instrumentation = Instrumentation()) and during that call the functions that Controller.do_tick calls for each phase are timed (see start), and the carts that are added and removed are counted. It also counts how often the supply and demand come from the compiled profile and measures the binary searches done by the interpolation (see Helpers.find_rows).
+    
+    Without instrumentation Controller.simulate uses its normal loop, the timing code is only active during an instrumented simulate call, so it costs nothing otherwise. One object can be used for more than one simulate call, the results add up.
+    """
+    def __init__(self):
+        
+        self.phase_times = {phase : 0 for phase in PHASES}# In nanoseconds.
+        self.wall_time = 0
+        self.ticks = 0
+        self.carts_added = 0
+        self.carts_removed = 0
+        self.profile_lookups = 0# Ticks of which the supply and demand came from the compiled profile.
+        self.direct_lookups = 0# Ticks of which the supply and demand had to be interpolated.
+        self.searches = 0# Calls of Helpers.find_rows (so times the estimated row was wrong for at least one time).
+        self.searched_times = 0# The amount of times for which the estimated row was wrong.
+        self.search_time = 0# In nanoseconds, this is part of the phase during which the search was done.
+        
+        self.start_time = None
+    
+    def start(self, controller):
+        """
+        Starts measuring, this is called by Controller.simulate. The phases of Controller.do_tick (getting the supply and demand, recording, the controller and the physics of the train track) and the functions that are timed as a whole (compiling the profiles, checking the carts and the search of the interpolation) are replaced by timed versions until stop is called. do_tick itself is not changed, so the timed ticks are always the same as the normal ones.
+        """
+        
+        self.start_time = time.perf_counter_ns()
+        self.find_rows = Helpers.find_rows
+        self.recorder = controller.recorder
+        self.train_track = controller.train_track
+        
+        def timed(phase, function):
+            def timed_function(*arguments, **keywords):
+                start = time.perf_counter_ns()
+                result = function(*arguments, **keywords)
+                self.phase_times[phase] = self.phase_times[phase] + time.perf_counter_ns() - start
+                return result
+            
+            return timed_function
+        
+        compile_profiles = timed("Compiling profiles", lambda *arguments, **keywords: type(controller).compile_profiles(controller, *arguments, **keywords))
+        record = timed("Recording", self.recorder.record)
+        physics = timed("Physics", self.train_track.do_tick)
+        
+        def timed_get_supply_demand():
+            profile = controller.profile
+            if profile is not None and controller.profile_index < len(profile.times) and profile.times[controller.profile_index] == controller.time:
+                self.profile_lookups = self.profile_lookups + 1
+            else:
+                self.direct_lookups = self.direct_lookups + 1
+            
+            start = time.perf_counter_ns()
+            result = type(controller).get_supply_demand(controller)
+            self.phase_times["Supply and demand"] = self.phase_times["Supply and demand"] + time.perf_counter_ns() - start
+            return result
+        
+        def timed_controller(*arguments, **keywords):
+            carts_before = self.train_track.get_amount_carts_on_track()
+            removed_before = self.carts_removed
+            check_carts_before = self.phase_times["Check carts"]
+            
+            start = time.perf_counter_ns()
+            type(controller).controller(controller, *arguments, **keywords)
+            self.phase_times["Controller"] = self.phase_times["Controller"] + time.perf_counter_ns() - start - (self.phase_times["Check carts"] - check_carts_before)# Checking the carts is part of the controller but timed on its own.
+            
+            self.carts_added = self.carts_added + self.train_track.get_amount_carts_on_track() - carts_before + self.carts_removed - removed_before
+        
+        def timed_check_carts(*arguments, **keywords):
+            start = time.perf_counter_ns()
+            removed = type(controller).check_carts(controller, *arguments, **keywords)
+            self.phase_times["Check carts"] = self.phase_times["Check carts"] + time.perf_counter_ns() - start
+            self.carts_removed = self.carts_removed + removed
+            return removed
+        
+        def timed_do_tick(delta_time):
+            physics(delta_time)
+            self.ticks = self.ticks + 1# The physics is the last phase of a tick.
+        
+        def timed_find_rows(seconds, wanted_time, rows, correct):
+            start = time.perf_counter_ns()
+            rows = self.find_rows(seconds, wanted_time, rows, correct)
+            self.search_time = self.search_time + time.perf_counter_ns() - start
+            self.searches = self.searches + 1
+            self.searched_times = self.searched_times + int(np.size(correct) - np.count_nonzero(correct))
+            return rows
+        
+        controller.compile_profiles = compile_profiles# Instance attributes go before the methods of the class, so these are used until they are deleted again.
+        controller.get_supply_demand = timed_get_supply_demand
+        controller.controller = timed_controller
+        controller.check_carts = timed_check_carts
+        self.recorder.record = record
+        self.train_track.do_tick = timed_do_tick
+        Helpers.find_rows = timed_find_rows
+    
+    def stop(self, controller):
+        """
+        Stops measuring and puts the original functions back, this is called by Controller.simulate. It also works if start didn't finish.
+        """
+        
+        for name in ["compile_profiles", "get_supply_demand", "controller", "check_carts"]:
+            controller.__dict__.pop(name, None)
+        
+        if self.start_time is not None:
+            self.recorder.__dict__.pop("record", None)
+            self.train_track.__dict__.pop("do_tick", None)
+            Helpers.find_rows = self.find_rows
+            self.wall_time = self.wall_time + time.perf_counter_ns() - self.start_time
+        
+        self.start_time = None
+    
+    def get_summary(self):
+        """
+        Returns a dictionary with the results: the amount of ticks and ticks per second, the time (in seconds) and fraction of the total time of each phase, the amount of carts added and removed and the statistics of the profile lookups and interpolation searches.
+        """
+        
+        wall_time = self.wall_time / 10**9
+        phase_times = {phase : value / 10**9 for phase, value in self.phase_times.items()}
+        phase_times["Other"] = max(wall_time - sum(phase_times.values()), 0)# The loop itself and the timing.
+        
+        return {"Ticks" : self.ticks,
+                "Wall time (s)" : wall_time,
+                "Ticks per second" : self.ticks / wall_time if wall_time > 0 else np.nan,
+                "Phase times (s)" : phase_times,
+                "Phase fractions" : {phase : value / wall_time if wall_time > 0 else np.nan for phase, value in phase_times.items()},
+                "Carts added" : self.carts_added,
+                "Carts removed" : self.carts_removed,
+                "Profile lookups" : self.profile_lookups,
+                "Direct lookups" : self.direct_lookups,
+                "Interpolation searches" : self.searches,
+                "Searched times" : self.searched_times,
+                "Interpolation search time (s)" : self.search_time / 10**9}
+    
+    def to_json(self, path = None):
+        """
+        Returns the summary (see get_summary) as a json string, if a path is given it is also written to that file.
+        """
+        
+        text = json.dumps(self.get_summary(), indent = 4, default = float)
+        
+        if path is not None:
+            with open(path, "w") as file:
+                file.write(text)
+        
+        return text
+    
+    def print_summary(self):
+        """
+        Prints a short table of the phases.
+        """
+        
+        summary = self.get_summary()
+        
+        print(summary["Ticks"], "ticks in", np.round(summary["Wall time (s)"], 3), "s (" + str(int(summary["Ticks per second"]) if summary["Ticks"] > 0 else 0) + " ticks per second)")
+        
+        for phase, value in summary["Phase times (s)"].items():
+            print(" ", phase.ljust(20), str(np.round(value, 3)).rjust(10), "s", str(np.round(100 * summary["Phase fractions"][phase], 1)).rjust(6), "%")
+        
+        print("  Carts added:", summary["Carts added"], "removed:", summary["Carts removed"])
+        print("  Lookups from the compiled profile:", summary["Profile lookups"], "interpolated:", summary["Direct lookups"], "searches:", summary["Interpolation searches"], "(" + str(np.round(summary["Interpolation search time (s)"], 3)) + " s)")
+
+
+"""
+from Controller import Controller
+from Storage import TrainTrack
+from Supply import WindSupply
+from Demand import Households
+
+controller = Controller(train_track = TrainTrack(carts = 15000), supply = WindSupply(), demand = Households(amount_of_households_per_type = [67000, 0, 0, 0, 0, 0, 0, 0, 0, 0]), delta_time = 10)
+instrumentation = Instrumentation()
+controller.simulate(end_time_days = 30, compiled = True, instrumentation = instrumentation)
+
+instrumentation.print_summary()
+instrumentation.to_json("instrumentation.json")
+#"""
@@ -0,0 +1,230 @@
+import pandas as pd
+import numpy as np
+import argparse
+import inspect
+import sys
+import time
+
+from Storage import TrainTrack
+from Controller import Controller
+from Recorder import SummaryRecorder
+from Profiles import CompiledProfile
+from Sweep import SUPPLY_CLASSES, DEMAND_CLASSES
+
+TRACK_DIMENSIONS = {"length" : 0, "height" : 1}# The search parameters that are an element of track_dimensions of TrainTrack (the horizontal length and the height in meters) instead of a parameter of their own.
+
+class BudgetExceeded(Exception):
+    """
+    Raised by a BudgetRecorder as soon as a run can no longer meet its constraint.
+    """
+
+
+class BudgetRecorder(SummaryRecorder):
+    """
+    A summary recorder (see Recorder.SummaryRecorder) which stops the simulation with a BudgetExceeded error as soon as the unmet energy or the hours below a satisfaction level are more than allowed. Both only grow during a run, so once the budget is used up the run can never meet the constraint anymore and the rest of it does not have to be simulated.
+    """
+    def __init__(self, max_unmet_energy = None, satisfaction_level = None, max_hours_below = 0):
+        """
+        The init function.
+        
+        max_unmet_energy is the maximum unmet energy in kWh, None is no limit.
+        satisfaction_level and max_hours_below are the satisfaction level and the maximum amount of hours the satisfaction may be below it, if satisfaction_level is None there is no limit.
+        """
+        
+        SummaryRecorder.__init__(self, [] if satisfaction_level is None else [satisfaction_level])
+        
+        self.max_unmet_energy = max_unmet_energy
+        self.satisfaction_level = satisfaction_level
+        self.max_hours_below = max_hours_below
+        self.armed = True# If False the budget is not checked, for example during the warm up.
+    
+    def record(self, time, supply, demand, train_track):
+        SummaryRecorder.record(self, time, supply, demand, train_track)
+        
+        if not self.armed:
+            return
+        
+        if self.max_unmet_energy is not None and self.energies[3] > self.max_unmet_energy * 3.6 * 10**6:
+            raise BudgetExceeded("The unmet energy is more than " + str(self.max_unmet_energy) + " kWh at " + str(time) + " s.")
+        
+        if self.satisfaction_level is not None and self.seconds_below[0] > self.max_hours_below * 3600:
+            raise BudgetExceeded("The satisfaction was below " + str(self.satisfaction_level) + " for more than " + str(self.max_hours_below) + " hours at " + str(time) + " s.")
+    
+    def is_met(self, summary):
+        """
+        Checks if the summary (see SummaryRecorder.get_summary) of a finished run meets the constraint.
+        """
+        
+        if self.max_unmet_energy is not None and summary["Unmet energy (kWh)"] > self.max_unmet_energy:
+            return False
+        
+        if self.satisfaction_level is not None and summary["Hours below satisfaction " + str(self.satisfaction_level)] > self.max_hours_below:
+            return False
+        
+        return True
+    
+    def copy(self, keep_data = True):
+        new_recorder = BudgetRecorder(self.max_unmet_energy, self.satisfaction_level, self.max_hours_below)
+        
+        if keep_data:
+            new_recorder.set_state(self.get_state())
+        
+        return new_recorder
+
+
+def evaluate_candidate(train_track, supply, demand, profile, end_time, warm_up = 3600, max_unmet_energy = None, satisfaction_level = None, max_hours_below = 0, controller = {}):
+    """
+    Simulates a single candidate train track and checks if it meets the constraint (see BudgetRecorder). Returns a dictionary with if it is feasible, if it was aborted early, the simulated days and its summary.
+    
+    profile is the compiled profile (see Profiles.CompiledProfile) of the supply and demand from time 0 until the end time, it is shared by all candidates so the profiles are only interpolated once.
+    controller is a dictionary with the settings of the controller (delta_time, max_speed, max_acceleration and allow_new_carts).
+    """
+    
+    settings = dict(controller)
+    recorder = BudgetRecorder(max_unmet_energy, satisfaction_level, max_hours_below)
+    candidate = Controller(train_track = train_track, supply = supply, demand = demand, delta_time = settings.pop("delta_time", 10), recorder = recorder)
+    
+    for setting, value in settings.items():
+        setattr(candidate, setting, value)
+    
+    candidate.profile = profile
+    
+    recorder.armed = False
+    candidate.simulate(warm_up)
+    recorder.reset()
+    recorder.armed = True
+    
+    try:
+        candidate.simulate(end_time)
+        aborted = False
+    except BudgetExceeded:
+        aborted = True
+    
+    summary = recorder.get_summary(candidate.time)
+    
+    return {"Feasible" : not aborted and recorder.is_met(summary),
+            "Aborted" : aborted,
+            "Simulated days" : (candidate.time - warm_up) / (24 * 3600),
+            "Summary" : summary}
+
+def make_train_track(train_track, parameter, value):
+    """
+    Makes the train track of a candidate: the parameters in train_track with the searched parameter set to value. For length and height (see TRACK_DIMENSIONS) that element of track_dimensions is set, the other element is kept (from train_track or the default of TrainTrack).
+    """
+    
+    if parameter not in TRACK_DIMENSIONS:
+        return TrainTrack(**dict(train_track, **{parameter : value}))
+    
+    track_dimensions = list(train_track.get("track_dimensions", inspect.signature(TrainTrack).parameters["track_dimensions"].default))
+    track_dimensions[TRACK_DIMENSIONS[parameter]] = value
+    
+    return TrainTrack(**dict(train_track, track_dimensions = track_dimensions))
+
+def optimize_storage(supply, demand, days = 364, parameter = "carts", low = 0, high = 100000, resolution = 100, max_unmet_energy = None, satisfaction_level = None, max_hours_below = 0, train_track = {}, controller = {}, warm_up = 3600, progress = True):
+    """
+    Searches the smallest value of a parameter of the train track (the amount of carts by default, or the length or height of the track, see TRACK_DIMENSIONS) for which the storage meets the constraint, by bisection. This assumes that a larger value never makes the storage worse. The supply and demand are compiled once and used by all candidates, and a candidate is stopped as soon as it uses up its budget (see BudgetRecorder), so most infeasible candidates cost only a part of a full run.
+    
+    supply and demand are the supply and demand objects.
+    days is the amount of days that each candidate is simulated (after the warm up).
+    parameter is the name of the parameter of TrainTrack that is searched (a parameter with a single number like carts, mass_per_cart or minimal_distance) or length or height, low and high are the limits of the search (low has to be more than 0 for length and height, a track without length or height doesn't work). If both are integers only integers are tried.
+    resolution is the size of the interval at which the search stops, the optimum is then at most this much too large.
+    max_unmet_energy, satisfaction_level and max_hours_below are the constraint, see BudgetRecorder. At least one of them has to be given.
+    train_track is a dictionary with the other parameters of TrainTrack.
+    controller is a dictionary with the settings of the controller (delta_time, max_speed, max_acceleration and allow_new_carts).
+    warm_up is the amount of seconds that are simulated first to stabilize the system, these do not count for the constraint.
+    progress is a boolean which decides if each candidate is printed.
+    
+    Returns a dictionary with the optimum (None if even high does not meet the constraint), the summary of the optimum and the frontier: a dataframe with every evaluated candidate.
+    """
+    
+    if max_unmet_energy is None and satisfaction_level is None:
+        raise ValueError("Give a maximum unmet energy or a satisfaction level as the constraint.")
+    
+    if parameter in TRACK_DIMENSIONS and low <= 0:
+        raise ValueError("The lower limit of the " + parameter + " of the track has to be more than 0, not " + str(low) + ".")
+    
+    integer = isinstance(low, (int, np.integer)) and isinstance(high, (int, np.integer))
+    end_time = warm_up + days * 24 * 3600
+    profile = CompiledProfile(supply, demand, 0, end_time, controller.get("delta_time", 10))
+    
+    rows = []
+    summaries = {}
+    
+    def evaluate(value):
+        start = time.monotonic()
+        result = evaluate_candidate(make_train_track(train_track, parameter, value), supply, demand, profile, end_time, warm_up, max_unmet_energy, satisfaction_level, max_hours_below, controller)
+        summary = result["Summary"]
+        
+        row = {parameter : value, "Feasible" : result["Feasible"], "Aborted" : result["Aborted"], "Simulated days" : result["Simulated days"],
+               "Unmet energy (kWh)" : summary["Unmet energy (kWh)"], "Mean satisfaction" : summary["Mean satisfaction"]}
+        if satisfaction_level is not None:
+            row["Hours below satisfaction " + str(satisfaction_level)] = summary["Hours below satisfaction " + str(satisfaction_level)]
+        row["Run time (s)"] = time.monotonic() - start
+        
+        rows.append(row)
+        summaries[value] = summary
+        
+        if progress:
+            print(parameter + " = " + str(value) + ": " + ("feasible" if result["Feasible"] else "infeasible") + (" (aborted after " + str(np.round(result["Simulated days"], 1)) + " days)" if result["Aborted"] else "") + " in " + str(np.round(row["Run time (s)"], 1)) + " s", file = sys.stderr, flush = True)
+        
+        return result["Feasible"]
+    
+    if not evaluate(high):
+        optimum = None
+    elif evaluate(low):
+        optimum = low
+    else:
+        while high - low > resolution:# low is always infeasible and high always feasible.
+            middle = low + (high - low) // 2 if integer else low + (high - low) / 2
+            
+            if evaluate(middle):
+                high = middle
+            else:
+                low = middle
+        
+        optimum = high
+    
+    frontier = pd.DataFrame(rows).sort_values(parameter).reset_index(drop = True)
+    
+    return {"Optimum" : optimum, "Summary" : summaries.get(optimum), "Frontier" : frontier}
+
+def main(arguments = None):
+    """
+    The command line interface, searches the smallest amount of carts for the default wind supply and households.
+    """
+    
+    parser = argparse.ArgumentParser(description = "Search the smallest storage that meets a constraint.")
+    parser.add_argument("--days", type = float, default = 364, help = "Amount of days that each candidate is simulated.")
+    parser.add_argument("--parameter", default = "carts", help = "The parameter of TrainTrack that is searched (like carts), or length or height of the track.")
+    parser.add_argument("--low", type = int, default = None, help = "The lower limit of the search, by default 0 (1 for length and height).")
+    parser.add_argument("--high", type = int, default = 100000, help = "The upper limit of the search.")
+    parser.add_argument("--resolution", type = int, default = 100, help = "The search stops when the interval is this small.")
+    parser.add_argument("--max-unmet-energy", type = float, default = None, help = "The maximum unmet energy in kWh.")
+    parser.add_argument("--satisfaction-level", type = float, default = None, help = "The satisfaction level of the constraint.")
+    parser.add_argument("--max-hours-below", type = float, default = 0, help = "The maximum amount of hours the satisfaction may be below the satisfaction level.")
+    parser.add_argument("--households", type = int, default = 67000, help = "The amount of households (of the first type).")
+    parser.add_argument("--windmills", type = int, default = 60, help = "The amount of windmills.")
+    parser.add_argument("--delta-time", type = float, default = 10, help = "The time step size.")
+    parser.add_argument("--profile-cache", default = None, help = "Directory in which the parsed profiles are cached.")
+    parser.add_argument("--output", default = None, help = "CSV file in which the frontier is saved.")
+    
+    arguments = parser.parse_args(arguments)
+    
+    if arguments.low is None:
+        arguments.low = 1 if arguments.parameter in TRACK_DIMENSIONS else 0
+    
+    supply = SUPPLY_CLASSES["WindSupply"](amount_of_windmills = arguments.windmills, cache_directory = arguments.profile_cache)
+    demand = DEMAND_CLASSES["Households"](amount_of_households_per_type = [arguments.households, 0, 0, 0, 0, 0, 0, 0, 0, 0], cache_directory = arguments.profile_cache)
+    
+    result = optimize_storage(supply, demand, arguments.days, arguments.parameter, arguments.low, arguments.high, arguments.resolution, arguments.max_unmet_energy, arguments.satisfaction_level, arguments.max_hours_below, controller = {"delta_time" : arguments.delta_time})
+    
+    print(result["Frontier"].to_string(index = False))
+    print("Optimum:", arguments.parameter, "=", result["Optimum"])
+    
+    if arguments.output is not None:
+        result["Frontier"].to_csv(arguments.output, index = False)
+    
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+import pandas as pd
+import numpy as np
+import os
+import struct
+
+from Recorder import COLUMNS
+
+NPY_HEADER_SIZE = 128# The size (in bytes) of the header of the .npy files made by NpySink, it is fixed so that the header can be rewritten when the file grows.
+
+def write_npy_header(file, dtype, length):
+    """
+    Writes (or rewrites) the header of a one dimensional .npy file. The header is always NPY_HEADER_SIZE bytes long so the data after it never has to move.
+    
+    file is a file object opened in binary mode.
+    dtype is the dtype of the data in the file.
+    length is the amount of values in the file.
+    """
+    
+    header = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" % (np.lib.format.dtype_to_descr(np.dtype(dtype)), length)
+    header = header.ljust(NPY_HEADER_SIZE - 10 - 1) + "\n"# The header is padded with spaces and ends with a newline (10 bytes are for the magic string, version and header length).
+    
+    file.seek(0)
+    file.write(b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1"))
+
+
+class NpySink:
+    """
+    An output sink which writes each recorded column to its own .npy file in a directory. The recorder hands over the data in chunks which are appended to the files, after each chunk the files are valid .npy files again so they can be read (also with memory mapping) while the simulation is still running.
+    """
+    def __init__(self, directory, chunk_size = 2**16):
+        """
+        The init function.
+        
+        directory is the directory in which the files are made (one per column, named after the column). Existing files are overwritten.
+        chunk_size is the amount of rows the recorder collects before they are written to the files. This is also the maximum amount of rows that is kept in memory.
+        """
+        
+        os.makedirs(directory, exist_ok = True)
+        
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.files = {}
+        self.lengths = {}
+    
+    def write(self, data):
+        """
+        Appends a chunk of data to the files.
+        
+        data is a dictionary with an array for each column.
+        """
+        
+        for column, values in data.items():
+            if column not in self.files:
+                self.files[column] = open(os.path.join(self.directory, column + ".npy"), "wb+")
+                self.lengths[column] = 0
+                write_npy_header(self.files[column], values.dtype, 0)# The header comes first, the data is added after it.
+            
+            file = self.files[column]
+            file.seek(0, 2)# Go to the end of the file.
+            file.write(np.ascontiguousarray(values).tobytes())
+            
+            self.lengths[column] = self.lengths[column] + len(values)
+            write_npy_header(file, values.dtype, self.lengths[column])
+            file.flush()
+    
+    def close(self):
+        for file in self.files.values():
+            file.close()
+        
+        self.files = {}
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exception):
+        self.close()
+
+
+class ParquetSink:
+    """
+    An output sink which writes the recorded data to a Parquet file, each chunk becomes a row group. Needs pyarrow. The file is only complete after close is called (or the with block has ended).
+    """
+    def __init__(self, path, chunk_size = 2**16):
+        """
+        The init function.
+        
+        path is the name of the Parquet file. An existing file is overwritten.
+        chunk_size is the amount of rows in each row group. This is also the maximum amount of rows that is kept in memory.
+        """
+        
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("ParquetSink needs pyarrow, install it or use NpySink instead.")
+        
+        self.pyarrow = pyarrow
+        self.parquet = pyarrow.parquet
+        self.path = path
+        self.chunk_size = chunk_size
+        self.writer = None
+    
+    def write(self, data):
+        """
+        Writes a chunk of data as a row group.
+        
+        data is a dictionary with an array for each column.
+        """
+        
+        table = self.pyarrow.table(data)
+        
+        if self.writer is None:
+            self.writer = self.parquet.ParquetWriter(self.path, table.schema)
+        
+        self.writer.write_table(table)
+    
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exception):
+        self.close()
+
+
+def load_output(path, columns = None, start_time = None, end_time = None):
+    """
+    Loads the output written by NpySink or ParquetSink as a dataframe. Only the asked columns and the rows within the time window are read, so a small part of a very long run can be loaded for plotting.
+    
+    path is the directory of a NpySink or the file of a ParquetSink.
+    columns is a list of the wanted columns, if None all columns are loaded.
+    start_time and end_time are the (inclusive) time window in seconds, if None the window starts at the beginning or continues until the end.
+    """
+    
+    if os.path.isdir(path):
+        available = [column for column in COLUMNS if os.path.exists(os.path.join(path, column + ".npy"))]
+        
+        if columns is None:
+            columns = available
+        
+        time = np.load(os.path.join(path, "Time.npy"), mmap_mode = "r")# Memory mapped so only the parts that are used are read.
+        
+        start = 0 if start_time is None else np.searchsorted(time, start_time, side = "left")# The time is increasing so the window can be found with a binary search.
+        stop = len(time) if end_time is None else np.searchsorted(time, end_time, side = "right")
+        
+        return pd.DataFrame({column : np.array(np.load(os.path.join(path, column + ".npy"), mmap_mode = "r")[start:stop]) for column in columns})
+    else:
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("Loading Parquet output needs pyarrow.")
+        
+        filters = []
+        
+        if start_time is not None:
+            filters.append(("Time", ">=", start_time))
+        if end_time is not None:
+            filters.append(("Time", "<=", end_time))
+        
+        return pyarrow.parquet.read_table(path, columns = columns, filters = filters if len(filters) > 0 else None).to_pandas()
+
+def open_output(path, columns = None):
+    """
+    Opens the output written by NpySink or ParquetSink as a dictionary of arrays without reading it. The columns of a NpySink directory are memory mapped, so only the parts that are used are read from the disk. A Parquet file can't be read in parts like that, so its columns are loaded.
+    
+    path is the directory of a NpySink or the file of a ParquetSink.
+    columns is a list of the wanted columns (the Time column is always included), if None all columns are opened.
+    """
+    
+    if os.path.isdir(path):
+        available = [column for column in COLUMNS if os.path.exists(os.path.join(path, column + ".npy"))]
+        
+        if columns is None:
+            columns = available
+        
+        return {column : np.load(os.path.join(path, column + ".npy"), mmap_mode = "r") for column in ["Time"] + [column for column in columns if column != "Time"]}
+    
+    data = load_output(path, None if columns is None else ["Time"] + [column for column in columns if column != "Time"])
+    
+    return {column : data[column].to_numpy() for column in data.columns}
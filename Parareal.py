@@ -0,0 +1,281 @@
+import pandas as pd
+import numpy as np
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from Recorder import Recorder, SummaryRecorder
+from Profiles import get_tick_times
+from Sweep import make_controller, share_profiles, get_summary
+
+segment_controllers = {}# The controller of each scenario in a worker process, so the supply and demand are only loaded once per process.
+
+def get_boundary_vector(state):
+    """
+    Gets the part of a state (a dictionary with the time and the state of the train track, see TrainTrack.get_state) that is corrected between the segments: the carts at the top and at the bottom and the velocity.
+    """
+    
+    train_track = state["train_track"]
+    
+    return np.array([train_track["carts_of_track"]["Top"], train_track["carts_of_track"]["Bottom"], train_track["velocity"]], dtype = np.float64)
+
+def is_same_state(state, other_state):
+    """
+    Checks if two states are exactly the same, then a segment started from either gives exactly the same result.
+    """
+    
+    if state["time"] != other_state["time"]:
+        return False
+    
+    train_track = state["train_track"]
+    other_track = other_state["train_track"]
+    
+    return all(np.array_equal(train_track[name], other_track[name]) if name == "cart_queue" else train_track[name] == other_track[name] for name in train_track)
+
+def set_stocks(state, stocks):
+    """
+    Gets a copy of a state with the carts at the top changed to the given (rounded) amount. The carts at the bottom change the other way, so the total amount of carts stays the same. If nothing changes the state itself is returned.
+    """
+    
+    carts_of_track = state["train_track"]["carts_of_track"]
+    total = carts_of_track["Top"] + carts_of_track["Bottom"]
+    top = min(max(float(np.round(stocks[0])), 0), total)
+    
+    if top == carts_of_track["Top"]:
+        return state
+    
+    train_track = dict(state["train_track"], carts_of_track = dict(carts_of_track, Top = top, Bottom = total - top))
+    
+    return dict(state, train_track = train_track)
+
+def propagate(controller, state, end_time):
+    """
+    Simulates a controller from a state until the end time (see Controller.simulate) and returns the state at the end. The supply and demand are compiled from the time of the state on, so the ticks are at exactly the same times as in a single run.
+    """
+    
+    controller.time = state["time"]
+    controller.train_track.set_state(state["train_track"])
+    controller.compile_profiles(end_time)
+    controller.simulate(end_time)
+    
+    return {"time" : controller.time, "train_track" : controller.train_track.get_state()}
+
+def simulate_segment(scenario, state, end_time, keep_data = False):
+    """
+    Simulates a single segment of a scenario (see Sweep.run_scenario) from a state until the end time with the normal time step. This is the function that runs in the worker processes.
+    
+    Returns a dictionary with the state at the end, the summary of the segment (see Sweep.get_summary) with its amount of ticks, the recorded data (if keep_data is True) and the cpu time (which unlike the run time doesn't grow when there are more workers than cpu's).
+    """
+    
+    start = time.process_time()
+    key = repr(scenario)
+    
+    if key not in segment_controllers:
+        segment_controllers[key] = make_controller(scenario)
+    
+    controller = segment_controllers[key]
+    controller.recorder = Recorder()
+    
+    end_state = propagate(controller, state, end_time)
+    data = controller.data
+    
+    summary = get_summary(data, controller.delta_time)
+    summary["Ticks"] = len(data["Time"])
+    
+    return {"State" : end_state,
+            "Summary" : summary,
+            "Data" : {column : np.array(values) for column, values in data.items()} if keep_data else None,
+            "CPU time (s)" : time.process_time() - start}
+
+def combine_summaries(summaries):
+    """
+    Combines the summaries of consecutive segments (see simulate_segment) into the summary of the whole run, the same as Sweep.get_summary of all the data together.
+    """
+    
+    ticks = np.array([summary["Ticks"] for summary in summaries])
+    
+    return {"Unmet energy (kWh)" : sum(summary["Unmet energy (kWh)"] for summary in summaries),
+            "Mean satisfaction" : np.sum([summary["Mean satisfaction"] * amount for summary, amount in zip(summaries, ticks) if amount > 0]) / np.sum(ticks),
+            "Losses (kWh)" : sum(summary["Losses (kWh)"] for summary in summaries),
+            "Peak velocity" : max(summary["Peak velocity"] for summary, amount in zip(summaries, ticks) if amount > 0)}
+
+def run_parareal(scenario, segments = 12, workers = None, coarse_delta_time = 600, tolerance = 2, velocity_tolerance = 0.01, max_iterations = None, keep_data = False, compare = True, progress = True):
+    """
+    Simulates a scenario (see Sweep.run_scenario) in parallel in time with the parareal method. The horizon (after the warm up) is split into segments which are simulated at the same time on a pool of processes, each from an estimated state at its start. The estimates come from a coarse simulation (with a large time step) which is cheap enough to run serially.
+    
+    After every parallel sweep the states at the boundaries are corrected: the new state at the start of a segment is the coarse simulation from the new state of the segment before, plus the difference between the fine and the coarse simulation of the last sweep. Only the carts at the top and bottom (the slow part of the state, the storage itself) are corrected, the velocity and the positions of the carts are taken from the fine simulation. Only the segments of which the start state changed are simulated again. It stops when the state at the end of every segment matches the state at the start of the next one within the tolerance. The first segments are exact after the first sweeps, so after as many sweeps as there are segments it is the same as a serial run.
+    
+    segments is the amount of segments.
+    workers is the amount of processes, if None it is the amount of cpu's.
+    coarse_delta_time is the time step of the coarse simulation.
+    tolerance is the maximum difference (in carts) in the carts at the top and bottom between the end of a segment and the start of the next one. The correction is rounded to whole carts, so a tolerance of 0 often only converges after as many sweeps as there are segments.
+    velocity_tolerance is the maximum difference in velocity (in m/s) between the end of a segment and the start of the next one.
+    max_iterations is the maximum amount of sweeps, if None it is the amount of segments.
+    keep_data is a boolean which decides if the recorded data of the segments is stitched together and returned.
+    compare is a boolean which decides if the scenario is also simulated serially, to measure the speed-up and the deviation from the serial result.
+    progress is a boolean which decides if each sweep is printed.
+    
+    Returns a dictionary with the summary (see Sweep.get_summary), the amount of sweeps, the time of the parareal run (without the warm up), the history of the sweeps and, if compare is True, the summary and time of the serial run, the speed-up (also as estimated with a worker for each segment) and the maximum deviation (of the summary as a fraction, of the carts at the top and of the velocity at the boundaries).
+    """
+    
+    scenarios, shared_profiles = share_profiles([scenario])
+    scenario = scenarios[0]
+    max_iterations = segments if max_iterations is None else max_iterations
+    
+    try:
+        controller = make_controller(scenario, SummaryRecorder())
+        warm_up = scenario.get("warm_up", 3600)
+        end_time = warm_up + scenario.get("days", 364) * 24 * 3600
+        delta_time = controller.delta_time
+        
+        controller.compile_profiles(warm_up)
+        controller.simulate(warm_up)
+        
+        start = time.monotonic()
+        
+        times = get_tick_times(controller.time, end_time, delta_time)
+        segments = min(segments, len(times))
+        boundaries = [times[(i * len(times)) // segments] for i in range(segments)]
+        fine_ends = [boundary - delta_time / 2 for boundary in boundaries[1:]] + [end_time]# Each segment stops just before the first tick of the next one.
+        coarse_ends = [boundary - coarse_delta_time / 2 for boundary in boundaries[1:]]
+        
+        coarse = make_controller(dict(scenario, controller = dict(scenario.get("controller", {}), delta_time = coarse_delta_time)), SummaryRecorder())
+        
+        states = [{"time" : controller.time, "train_track" : controller.train_track.get_state()}]
+        coarse_vectors = []
+        
+        for n in range(segments - 1):# The first estimate is the coarse simulation of the whole horizon.
+            coarse_state = propagate(coarse, states[n], coarse_ends[n])
+            coarse_vectors.append(get_boundary_vector(coarse_state))
+            states.append(dict(coarse_state, time = boundaries[n + 1]))
+        
+        results = [None] * segments
+        started_from = [None] * segments
+        history = []
+        
+        with ProcessPoolExecutor(max_workers = workers) as executor:
+            for iteration in range(1, max_iterations + 1):
+                sweep_start = time.monotonic()
+                todo = [n for n in range(segments) if started_from[n] is None or not is_same_state(started_from[n], states[n])]
+                futures = {n : executor.submit(simulate_segment, scenario, states[n], fine_ends[n], keep_data) for n in todo}
+                
+                for n, future in futures.items():
+                    results[n] = future.result()
+                    started_from[n] = states[n]
+                
+                jumps = np.array([np.abs(get_boundary_vector(results[n]["State"]) - get_boundary_vector(states[n + 1])) for n in range(segments - 1)]).reshape(-1, 3)
+                converged = bool(np.all(jumps[:, :2] <= tolerance) and np.all(jumps[:, 2] <= velocity_tolerance))
+                
+                history.append({"Sweep" : iteration,
+                                "Segments simulated" : len(todo),
+                                "Largest jump (carts)" : float(np.max(jumps[:, :2], initial = 0)),
+                                "Largest jump (m/s)" : float(np.max(jumps[:, 2], initial = 0)),
+                                "Longest segment (s)" : max(results[n]["CPU time (s)"] for n in todo),
+                                "Time (s)" : time.monotonic() - sweep_start})
+                
+                if progress:
+                    print("Sweep " + str(iteration) + ": " + str(len(todo)) + " segments, largest jump " + str(history[-1]["Largest jump (carts)"]) + " carts and " + str(np.round(history[-1]["Largest jump (m/s)"], 4)) + " m/s after " + str(np.round(time.monotonic() - start, 1)) + " s", file = sys.stderr, flush = True)
+                
+                if converged or iteration == max_iterations:
+                    break
+                
+                new_states = [states[0]]
+                
+                for n in range(segments - 1):# The correction goes from segment to segment, so it is serial (but coarse).
+                    if is_same_state(new_states[n], states[n]):
+                        coarse_vector = coarse_vectors[n]
+                    else:
+                        coarse_vector = get_boundary_vector(propagate(coarse, new_states[n], coarse_ends[n]))
+                    
+                    stocks = coarse_vector + get_boundary_vector(results[n]["State"]) - coarse_vectors[n]
+                    coarse_vectors[n] = coarse_vector
+                    new_states.append(set_stocks(results[n]["State"], stocks))
+                
+                states = new_states
+        
+        parareal_time = time.monotonic() - start
+        
+        result = {"Summary" : combine_summaries([result["Summary"] for result in results]),
+                  "Sweeps" : len(history),
+                  "Converged" : converged,
+                  "Parareal time (s)" : parareal_time,
+                  "History" : pd.DataFrame(history)}
+        
+        if keep_data:
+            result["Data"] = {column : np.concatenate([segment["Data"][column] for segment in results]) for column in results[0]["Data"]}
+        
+        if compare:
+            serial = make_controller(scenario, Recorder())
+            serial.compile_profiles(warm_up)
+            serial.simulate(warm_up)
+            warm_up_rows = serial.recorder.cursor
+            
+            serial_start = time.monotonic()
+            serial.compile_profiles(end_time)
+            boundary_vectors = []
+            
+            for n in range(segments):
+                serial.simulate(fine_ends[n])
+                boundary_vectors.append(get_boundary_vector({"train_track" : serial.train_track.get_state()}))
+            
+            serial_time = time.monotonic() - serial_start
+            
+            data = {column : values[warm_up_rows:] for column, values in serial.data.items()}
+            serial_summary = get_summary(data, delta_time)
+            deviations = np.abs(np.array(boundary_vectors) - np.array([get_boundary_vector(segment["State"]) for segment in results]))
+            
+            result["Serial summary"] = serial_summary
+            result["Serial time (s)"] = serial_time
+            result["Speed-up"] = serial_time / parareal_time
+            result["Speed-up with a worker per segment"] = serial_time / (parareal_time - result["History"]["Time (s)"].sum() + result["History"]["Longest segment (s)"].sum())# If every sweep took as long as its longest segment, an estimate when there are fewer cpu's than segments.
+            result["Maximum deviation"] = {name : float(abs(result["Summary"][name] - value) / abs(value)) if value != 0 else float(abs(result["Summary"][name])) for name, value in serial_summary.items()}
+            result["Maximum deviation"]["Carts at the top"] = float(np.max(deviations[:, 0]))
+            result["Maximum deviation"]["Velocity"] = float(np.max(deviations[:, 2]))
+            
+            if keep_data:
+                result["Maximum deviation"]["Data"] = {column : float(np.max(np.abs(result["Data"][column] - np.asarray(values)), initial = 0)) if len(values) == len(result["Data"][column]) else np.nan for column, values in data.items()}
+    finally:
+        for shared_profile in shared_profiles:
+            shared_profile.close()
+    
+    return result
+
+def main(arguments = None):
+    """
+    The command line interface, runs a scenario with the default wind supply and households in parallel in time and prints the result.
+    """
+    
+    parser = argparse.ArgumentParser(description = "Simulate a scenario in parallel in time (parareal).")
+    parser.add_argument("--days", type = float, default = 364, help = "Amount of days to simulate.")
+    parser.add_argument("--segments", type = int, default = 12, help = "Amount of segments that are simulated at the same time.")
+    parser.add_argument("--workers", type = int, default = None, help = "Amount of worker processes (default is the amount of cpu's).")
+    parser.add_argument("--coarse-delta-time", type = float, default = 600, help = "Time step size of the coarse simulation.")
+    parser.add_argument("--tolerance", type = float, default = 2, help = "Maximum difference in carts at the boundaries of the segments.")
+    parser.add_argument("--velocity-tolerance", type = float, default = 0.01, help = "Maximum difference in velocity at the boundaries of the segments.")
+    parser.add_argument("--carts", type = float, default = 30000, help = "Total amount of carts (half starts at the top and half at the bottom).")
+    parser.add_argument("--households", type = int, default = 67000, help = "Amount of households (of the first type).")
+    parser.add_argument("--windmills", type = int, default = 60, help = "Amount of windmills.")
+    parser.add_argument("--delta-time", type = float, default = 10, help = "Time step size in seconds.")
+    parser.add_argument("--wind-profile", default = "wind_speed_ijmuiden.txt", help = "File with the wind speeds.")
+    parser.add_argument("--household-profile", default = "profielen Elektriciteit 2019 versie 1.00.csv", help = "NEDU profile file of the households.")
+    parser.add_argument("--profile-cache", default = None, help = "Directory in which the processed profiles are cached.")
+    parser.add_argument("--no-compare", action = "store_true", help = "Don't simulate the scenario serially as well.")
+    arguments = parser.parse_args(arguments)
+    
+    scenario = {"train_track" : {"carts" : arguments.carts / 2},
+                "supply" : {"amount_of_windmills" : arguments.windmills, "windspeeds_profile" : arguments.wind_profile, "cache_directory" : arguments.profile_cache},
+                "demand" : {"amount_of_households_per_type" : [arguments.households, 0, 0, 0, 0, 0, 0, 0, 0, 0], "profiel" : arguments.household_profile, "cache_directory" : arguments.profile_cache},
+                "controller" : {"delta_time" : arguments.delta_time},
+                "days" : arguments.days}
+    
+    result = run_parareal(scenario, arguments.segments, arguments.workers, arguments.coarse_delta_time, arguments.tolerance, arguments.velocity_tolerance, compare = not arguments.no_compare)
+    
+    print(result["History"].to_string(index = False))
+    print(json.dumps({name : value for name, value in result.items() if name != "History"}, indent = 4, default = float))
+    
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+import numpy as np
+import copy
+
+NO_CART = 0# The cart decisions of a policy.
+ADD_CART = 1# Add a cart where the track decides (at the end the carts move away from, see TrainTrack.add_cart).
+ADD_BOTTOM = 2
+ADD_TOP = 3
+
+def where(condition, a, b):
+    """
+    The same as np.where, but for a single condition it simply returns a or b.
+    """
+    
+    if condition.__class__ is bool or condition.__class__ is np.bool_:
+        return a if condition else b
+    
+    return np.where(condition, a, b)
+
+def minimum(a, b):
+    """
+    The same as np.minimum, but for two numbers it works like min (so it returns a if they are equal).
+    """
+    
+    if a.__class__ is np.ndarray or b.__class__ is np.ndarray:
+        return np.minimum(a, b)
+    
+    return b if b < a else a
+
+def maximum(a, b):
+    """
+    The same as np.maximum, but for two numbers it works like max (so it returns a if they are equal).
+    """
+    
+    if a.__class__ is np.ndarray or b.__class__ is np.ndarray:
+        return np.maximum(a, b)
+    
+    return b if b > a else a
+
+class Policy:
+    """
+    A policy decides what the controller does each tick, in two phases: first if (and where) a cart is added, then the force of the generator (with the carts that are on the track after adding). Controller.controller and Ensemble.controller do the rest (removing the carts that went off the track and actually adding the carts).
+    
+    A policy gets the state as a dictionary (see Controller.get_policy_state) and the net demand. For the Controller these are numbers, for the Ensemble arrays with a value for each configuration, so a policy should only use functions that work on both: where, minimum and maximum below instead of if statements, min and max (and normal arithmetic). Then the same policy drives both. These functions use plain python for numbers, numpy functions on single numbers would make the controller more than twice as slow.
+    
+    The state for decide_carts has:
+        time: the current time.
+        velocity: the velocity of the carts.
+        amount_of_carts: the amount of carts on the track.
+        carts_on_top and carts_on_bottom: the amount of carts at the top and bottom that are not on the track.
+        max_speed and max_acceleration: the settings of the controller.
+    The state for get_force also has:
+        gravity and friction: the forces on the carts on the track.
+        efficiency: the efficiency of the generator at the current velocity.
+        efficiency_generating and efficiency_storing: the efficiency of the generator when the carts move down and up.
+        mass_per_cart: the mass of a cart.
+    """
+    def decide_carts(self, state, net_demand):
+        """
+        Returns the cart decision (NO_CART, ADD_CART, ADD_BOTTOM or ADD_TOP). The default is to never add a cart.
+        """
+        
+        return NO_CART if np.ndim(net_demand) == 0 else np.full(np.shape(net_demand), NO_CART)
+    
+    def get_force(self, state, net_demand, delta_time):
+        """
+        Returns the force of the generator (zero or positive).
+        """
+        
+        raise NotImplementedError("A policy needs a get_force function.")
+    
+    def copy(self):
+        """
+        Returns a copy of the policy for a forked controller (see Controller.fork). Policies without a state of their own can be shared, so this returns the policy itself.
+        """
+        
+        return self
+
+
+class ReferencePolicy(Policy):
+    """
+    The original policy of the controller: it always tries to add a cart, and it controls the power purely based on (steady-state) speed by adjusting the generator force. See the report for more details. It gives exactly the same numbers as the controller did before policies existed.
+    """
+    def decide_carts(self, state, net_demand):
+        """
+        If there are other carts on the track the track itself decides were (and if it is possible) to add a cart. If there are no other carts on the track the velocity will be zero and thus the policy determines where to add the cart based on the net demand.
+        """
+        
+        return where(state["amount_of_carts"] > 0, ADD_CART, where(net_demand > 0, ADD_BOTTOM, where(net_demand < 0, ADD_TOP, NO_CART)))
+    
+    def get_force(self, state, net_demand, delta_time):
+        """
+        Calculates the force needed to keep the current speed, and adds to it the force for the change in speed to get to the desired power output (within the maximum speed and acceleration).
+        """
+        
+        gravity_and_friction = state["gravity"] + state["friction"]
+        neutral_force = -gravity_and_friction# The force the generator needs to have to maintain the current speed of the carts.
+        neutral_power = state["efficiency"] * abs(gravity_and_friction) * state["velocity"]# The assosiated power out/input.
+        
+        moving = neutral_force != 0# Prevent a devide by zero error. Will only be zero if there are no carts (or if the carts are at terminal velocity which should never happen).
+        needed_change_in_speed = where(moving, -(neutral_power - net_demand) / where(moving, abs(neutral_force), 1), 0)# The change in speed needed to get to the desired power output. It ignores a potential increase in friction but that is not a problem since during the next tick it will take into account an increased friction and thus it will exponentially decrease any effect this has.
+        
+        velocity = state["velocity"]
+        needed_change_in_speed = where((velocity > state["max_speed"]) | (velocity < -state["max_speed"]), 0, needed_change_in_speed)# If the speed is maximum then set the change in velocity to be zero.
+        
+        acceleration = minimum(maximum(needed_change_in_speed / delta_time, -state["max_acceleration"]), state["max_acceleration"])# Make sure the maximum acceleration also is not exeded.
+        force = neutral_force + acceleration * state["mass_per_cart"] * state["amount_of_carts"]
+        
+        return where(force <= 0, 0.0, force)# Make sure the force is not negative.
+
+
+
+class LookAheadPolicy(ReferencePolicy):
+    """
+    A receding horizon policy that looks ahead at the net demand of the coming ticks, read from precomputed arrays (a compiled profile, see Profiles.CompiledProfile), with perfect foresight or with noise added to it.
+    
+    Every resolve_every ticks it makes a plan for the window of coming ticks: the velocity each tick needs for its net demand, moved earlier where the maximum acceleration would otherwise make the storage deliver too late (it only ramps up early in the direction that delivers more, so it never causes unmet energy to prevent a surplus). Between plans it only looks up the planned change in power of the next tick and adds it to the current net demand (which is known, so a forecast error only matters as far as it changes from tick to tick), so each tick costs the same no matter how long the window is.
+    
+    The force is then solved exactly (from the equation of motion of one tick) so that the power at the next tick is the planned power, instead of the steady state estimate of the ReferencePolicy, which reacts one tick late. The cart decision is the same as the ReferencePolicy (always add a cart), the track is then kept as full as the minimal distance allows.
+    """
+    def __init__(self, profile, window = 360, resolve_every = 30, noise = 0, noise_timescale = 3600, seed = 0):
+        """
+        The init function.
+        
+        profile is the compiled profile (see Profiles.CompiledProfile, for example controller.profile after compile_profiles) with the net demand that is looked ahead at. Outside of it the policy only uses the current net demand.
+        window is the amount of ticks that is looked ahead.
+        resolve_every is the amount of ticks after which a new plan is made.
+        noise is the standard deviation of the forecast error as a fraction of the standard deviation of the net demand, 0 is perfect foresight.
+        noise_timescale is the time (in seconds) over which the forecast error changes: there is a random error every noise_timescale seconds and it is linearly interpolated in between (like the profiles themselves), so like a real forecast it is wrong for longer periods and smooth from tick to tick.
+        seed is the seed of the random forecast error.
+        """
+        
+        self.profile = profile
+        self.window = window
+        self.resolve_every = resolve_every
+        
+        self.forecast = profile.net_demand
+        
+        if noise > 0:
+            random = np.random.default_rng(seed)
+            nodes = np.arange(profile.times[0], profile.times[-1] + noise_timescale, noise_timescale)
+            errors = random.standard_normal((len(nodes),) + profile.net_demand.shape[1:])
+            error = np.stack([np.interp(profile.times, nodes, column) for column in errors.reshape(len(nodes), -1).T], axis = -1).reshape(profile.net_demand.shape)
+            
+            self.forecast = profile.net_demand + noise * np.std(profile.net_demand, axis = 0) * error
+        
+        self.plan = None# The planned change in power of the ticks from plan_index on.
+        self.plan_index = 0
+    
+    def copy(self):
+        """
+        Returns a copy with its own plan, the profile and forecast are shared.
+        """
+        
+        new_policy = copy.copy(self)
+        new_policy.plan = None
+        
+        return new_policy
+    
+    def get_index(self, time):
+        """
+        Gets the index of a time in the profile, or None if it is not in it.
+        """
+        
+        profile = self.profile
+        index = int(round((time - profile.start_time) / profile.delta_time))
+        
+        if 0 <= index < len(profile.times) - 1 and profile.times[index] == time:
+            return index
+        
+        return None
+    
+    def make_plan(self, state, index):
+        """
+        Makes the plan for the window of ticks after the given index: the power for each tick. The velocity needed for the forecast net demand (with the current steady state force) is moved earlier where it decreases faster than the maximum acceleration allows, with a reversed cumulative minimum (so the whole window is done at once).
+        """
+        
+        forecast = self.forecast[index:index + 1 + self.window]# From the current tick on.
+        
+        if np.ndim(state["velocity"]) == forecast.ndim:# The same forecast for all tracks of an Ensemble.
+            forecast = forecast[:, np.newaxis]
+        
+        upcoming = forecast[1:]
+        neutral_force = abs(state["gravity"] + state["friction"])
+        step = state["max_acceleration"] * self.profile.delta_time
+        
+        efficiency = np.where(upcoming > 0, state["efficiency_storing"], state["efficiency_generating"])
+        scale = np.where(neutral_force > 0, efficiency * neutral_force, 1)
+        needed_velocity = np.clip(upcoming / scale, -state["max_speed"], state["max_speed"])
+        
+        ticks = np.arange(1, len(upcoming) + 1).reshape((-1,) + (1,) * (upcoming.ndim - 1))
+        limited = np.minimum.accumulate((needed_velocity + ticks * step)[::-1], axis = 0)[::-1] - ticks * step# The highest velocity from which every later needed velocity can still be reached in time.
+        
+        plan = np.where(limited < needed_velocity, np.where(limited > 0, state["efficiency_storing"], state["efficiency_generating"]) * neutral_force * limited, upcoming)
+        
+        change = plan - forecast[:-1]# The planned change compared to the forecast of the tick before, see get_force.
+        self.plan = change.tolist() if change.ndim == 1 else change# A list is faster to index for a single track.
+        self.plan_index = index
+    
+    def get_force(self, state, net_demand, delta_time):
+        """
+        Gets the force for which the power at the next tick is the planned power, within the maximum acceleration and speed. The power at the next tick is efficiency * force * (velocity + acceleration * delta_time), which is a quadratic equation in the force.
+        """
+        
+        index = self.get_index(state["time"])
+        
+        if index is None:# Outside of the profile there is nothing to look ahead at.
+            target = net_demand
+        else:
+            if self.plan is None or not 0 <= index - self.plan_index < min(self.resolve_every, len(self.plan)):
+                self.make_plan(state, index)
+            
+            target = net_demand + self.plan[index - self.plan_index]# The current net demand is known, so only the planned change is added to it (the current forecast error is assumed to last).
+        
+        amount_of_carts = state["amount_of_carts"]
+        gravity_and_friction = state["gravity"] + state["friction"]
+        mass = where(amount_of_carts > 0, amount_of_carts * state["mass_per_cart"], 1)
+        velocity = state["velocity"]
+        
+        k = delta_time / mass
+        c = velocity + gravity_and_friction * k# The velocity at the next tick without a generator force.
+        efficiency = where(target > 0, state["efficiency_storing"], state["efficiency_generating"])
+        root = maximum(c * c + 4 * k * target / efficiency, 0)**0.5# Zero if the target can't be reached, then it gets as close as it can.
+        force = (-c + where(2 * velocity >= c, root, -root)) / (2 * k)# Of the two forces with the same power the one for which the velocity at the next tick, (c + root) / 2 or (c - root) / 2, is closest to the current velocity.
+        
+        lowest = maximum(-state["max_acceleration"] * mass, (-state["max_speed"] - velocity) / k) - gravity_and_friction
+        highest = minimum(state["max_acceleration"] * mass, (state["max_speed"] - velocity) / k) - gravity_and_friction
+        force = maximum(minimum(force, highest), lowest)
+        
+        if amount_of_carts.__class__ is np.ndarray:
+            return np.where(amount_of_carts > 0, np.maximum(force, 0.0), ReferencePolicy.get_force(self, state, net_demand, delta_time))
+        
+        return maximum(force, 0.0) if amount_of_carts > 0 else ReferencePolicy.get_force(self, state, net_demand, delta_time)# Without carts there is no force to solve for, then it does what the ReferencePolicy does.
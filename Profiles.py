@@ -0,0 +1,174 @@
+import numpy as np
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+def get_tick_times(start_time, end_time, delta_time):
+    """
+    Gets the times of all the ticks a controller does when simulating from the start time until the end time. The times are added up one step at a time (just like Controller.do_tick does) so they are exactly the same as the times the controller itself will use.
+    
+    start_time is the time (in seconds) of the first tick.
+    end_time is the time (in seconds) until which is simulated (the last tick is at or before this time).
+    delta_time is the time step size.
+    """
+    
+    amount_of_ticks = max(int(np.floor((end_time - start_time) / delta_time)) + 3, 1)# A few ticks to many so that rounding can never make it to short, the extra ones are cut off below.
+    
+    steps = np.full(amount_of_ticks, delta_time, dtype = np.float64)
+    steps[0] = start_time
+    times = np.cumsum(steps)# Cumsum adds the steps one after the other so the rounding is the same as time = time + delta_time.
+    
+    return times[times <= end_time]
+
+
+class CompiledProfile:
+    """
+    A compiled profile contains the supply, demand and net demand for every tick of a simulation. They are interpolated once for the entire horizon (vectorized) and stored in contiguous arrays so the controller only has to look them up by tick index instead of interpolating them each tick.
+    """
+    def __init__(self, supply, demand, start_time, end_time, delta_time):
+        """
+        The init function, it directly interpolates the entire horizon.
+        
+        supply is the supply object (for example WindSupply), it needs to have a compile function.
+        demand is the demand object (for example Households), it needs to have a compile function.
+        start_time is the time (in seconds) of the first tick.
+        end_time is the time (in seconds) until which the profile is made.
+        delta_time is the time step size.
+        """
+        
+        self.start_time = start_time
+        self.end_time = end_time
+        self.delta_time = delta_time
+        
+        self.times = get_tick_times(start_time, end_time, delta_time)
+        self.supply = np.ascontiguousarray(supply.compile(self.times), dtype = np.float64)
+        self.demand = np.ascontiguousarray(demand.compile(self.times), dtype = np.float64)
+        
+        if self.supply.ndim > self.demand.ndim:# A supply with a column per configuration (like WindYears.WindYearsSupply), only for the ensemble.
+            self.net_demand = self.supply - self.demand[:, np.newaxis]
+        else:
+            self.net_demand = self.supply - self.demand# The difference in supply and demand that the storage system should fill.
+    
+    def __len__(self):
+        return len(self.times)
+    
+    def covers(self, index, time, end_time):
+        """
+        Checks if tick index belongs to the given time and if the profile continues until (at least) the end time. If so the profile can be used to simulate until that end time.
+        """
+        
+        return index < len(self.times) and self.times[index] == time and self.end_time >= end_time
+
+PROFILE_CACHE_VERSION = 2# Part of the key of cached profiles, raise it when the way the profiles are processed changes so old cached profiles are no longer used.
+
+def get_cached_profile_directory(cache_directory, source, path, parameters = {}):
+    """
+    Gets the directory in the profile cache for a processed profile. The name is a hash of the contents of the profile file and the parameters, so a changed file or different parameters get their own entry.
+    
+    cache_directory is the directory of the cache.
+    source is the name of the class that processes the profile (for example "WindSupply").
+    path is the file from which the profile is read.
+    parameters is a dictionary with the parameters that change the processed arrays.
+    """
+    
+    key = hashlib.sha256(repr((PROFILE_CACHE_VERSION, source, sorted(parameters.items()))).encode())
+    
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(2**20), b""):
+            key.update(block)
+    
+    return os.path.join(cache_directory, source + "_" + key.hexdigest()[:32])
+
+def save_cached_profile(source, directory):
+    """
+    Saves the profile of an object (see SharedProfile) in the profile cache. It is first written to a temporary directory which is then renamed, so other processes never see a half written profile. If another process saved the same profile first that one is kept.
+    
+    source is the object of which the profile is saved, for example a WindSupply object.
+    directory is the directory in the cache (see get_cached_profile_directory).
+    """
+    
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok = True)
+    temporary = tempfile.mkdtemp(prefix = ".writing_", dir = parent)
+    
+    SharedProfile(source, temporary)
+    
+    try:
+        os.rename(temporary, directory)
+    except OSError:
+        shutil.rmtree(temporary)
+
+def is_cached(directory):
+    """
+    Checks if there is a complete cached profile (or shared profile) in the directory.
+    """
+    
+    return os.path.exists(os.path.join(directory, "metadata.json"))
+
+
+class SharedProfile:
+    """
+    A shared profile publishes the numeric arrays of a parsed profile (of a WindSupply or Households object) once as memory mapped .npy files. Other processes can then make their supply and demand objects from it (with the shared_profile parameter) instead of parsing the profile again. The arrays are opened read only and memory mapped, so all processes use the same memory (the page cache of the operating system) instead of each having their own copy.
+    
+    A shared profile can be sent to other processes (it is pickled as just the name of the directory). Only the process that published it removes the files, with close or at the end of a with block.
+    """
+    def __init__(self, source, directory = None):
+        """
+        The init function, it directly writes the arrays.
+        
+        source is the object of which the profile is shared, it needs to have a get_profile_arrays function that returns a dictionary with the arrays and a dictionary with other information (that can be saved as json).
+        directory is the directory in which the files are made, if None a new temporary directory is made.
+        """
+        
+        arrays, metadata = source.get_profile_arrays()
+        
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix = "shared_profile_")
+        else:
+            os.makedirs(directory, exist_ok = True)
+        
+        for name, array in arrays.items():
+            np.save(os.path.join(directory, name + ".npy"), np.ascontiguousarray(array))# Saved uncompressed so the files can be memory mapped.
+        
+        with open(os.path.join(directory, "metadata.json"), "w") as file:
+            json.dump({"source" : type(source).__name__, "arrays" : list(arrays), "metadata" : metadata}, file)
+        
+        self.directory = directory
+        self.publisher = os.getpid()# Only this process removes the files.
+    
+    def close(self):
+        """
+        Removes the files of the shared profile. Only does something in the process that published it, objects that already use the arrays keep working on linux (the memory stays until it is no longer used).
+        """
+        
+        if os.getpid() == self.publisher and os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exception):
+        self.close()
+
+
+def load_shared_profile(shared_profile, source = None):
+    """
+    Opens the arrays of a shared profile read only and memory mapped. Returns a dictionary with the arrays and the dictionary with the other information.
+    
+    shared_profile is a SharedProfile object or the directory of one.
+    source is the name of the class that is expected to have published it, if given and it is a different class a ValueError is raised.
+    """
+    
+    directory = shared_profile.directory if isinstance(shared_profile, SharedProfile) else shared_profile
+    
+    with open(os.path.join(directory, "metadata.json")) as file:
+        description = json.load(file)
+    
+    if source is not None and description["source"] != source:
+        raise ValueError("The shared profile in " + str(directory) + " was published by a " + description["source"] + " object, not by a " + source + " object.")
+    
+    arrays = {name : np.load(os.path.join(directory, name + ".npy"), mmap_mode = "r") for name in description["arrays"]}
+    
+    return arrays, description["metadata"]
@@ -0,0 +1,158 @@
+import pandas as pd
+import numpy as np
+import math
+
+from Output import open_output
+
+class TimeSeriesPyramid:
+    """
+    An index of the recorded data (see Recorder.py and Output.py) for plotting long runs. A run of a year with a tick every 10 seconds has over 3 million rows, plotting all of them is slow and plotting every n-th row hides short peaks (like a moment of unmet demand). So for each bucket size (a power of two, from smallest_bucket rows on) the minimum, maximum, sum and amount of values (without NaN) of each column are made once, each level from the one below it, which takes O(n) time and about 8 / smallest_bucket times the memory of the data.
+    
+    A query for a time window then picks the level with at most max_points buckets in that window and only returns those, so zooming in on an hour costs the same as showing the whole year. Windows that have at most max_points rows are returned as they are recorded.
+    """
+    def __init__(self, data, columns = None, smallest_bucket = 16, chunk_size = 2**20):
+        """
+        The init function, makes the levels.
+        
+        data is the recorded data (a dataframe or dictionary with a Time column, for example controller.data) or the path of the output of a NpySink or ParquetSink (see Output.open_output). The columns of a NpySink are memory mapped, so they are never entirely in memory: the levels are made a chunk at a time and a query only reads the rows it returns.
+        columns is a list of the columns that are indexed, if None all columns (except Time).
+        smallest_bucket is the amount of rows in a bucket of the lowest level, a power of two.
+        chunk_size is the amount of rows that is read at once while making the lowest level, a multiple of smallest_bucket.
+        """
+        
+        if isinstance(data, str):
+            data = open_output(data, columns)
+        
+        if columns is None:
+            columns = [column for column in data.keys() if column != "Time"]
+        
+        if smallest_bucket < 1 or smallest_bucket & (smallest_bucket - 1) != 0:
+            raise ValueError("smallest_bucket has to be a power of two, not " + str(smallest_bucket) + ".")
+        
+        if chunk_size % smallest_bucket != 0:
+            raise ValueError("chunk_size has to be a multiple of smallest_bucket.")
+        
+        self.time = np.asarray(data["Time"])
+        self.data = {column : np.asarray(data[column]) for column in columns}# Memory mapped columns stay memory mapped.
+        self.columns = list(columns)
+        self.smallest_bucket = smallest_bucket
+        self.length = len(self.time)
+        
+        self.levels = [self.make_lowest_level(chunk_size)]# A dictionary per level with for each column the minimum, maximum, sum and amount of values of each bucket.
+        
+        while len(self.levels[-1]["Time"]) > 1:
+            self.levels.append(self.make_next_level(self.levels[-1]))
+    
+    def get_bucket_size(self, level):
+        return self.smallest_bucket * 2**level
+    
+    def make_lowest_level(self, chunk_size):
+        """
+        Makes the level with buckets of smallest_bucket rows, from chunk_size rows at a time. NaN values (like the satisfaction when there is no demand) are left out, so the mean of a bucket is the mean of its other values and only a bucket with nothing but NaN values has a NaN mean.
+        """
+        
+        size = self.smallest_bucket
+        amount = -(-self.length // size)
+        level = {"Time" : np.asarray(self.time[::size], dtype = np.float64)}
+        
+        for column in self.columns:
+            minimums = np.empty(amount)
+            maximums = np.empty(amount)
+            sums = np.empty(amount)
+            counts = np.empty(amount, dtype = np.int32)
+            
+            for start in range(0, self.length, chunk_size):
+                values = np.asarray(self.data[column][start:start + chunk_size], dtype = np.float64)
+                first = start // size
+                full = len(values) // size
+                
+                buckets = values[:full * size].reshape(full, size)
+                minimums[first:first + full] = np.fmin.reduce(buckets, axis = 1)
+                maximums[first:first + full] = np.fmax.reduce(buckets, axis = 1)
+                sums[first:first + full] = np.nansum(buckets, axis = 1)
+                counts[first:first + full] = np.count_nonzero(~np.isnan(buckets), axis = 1)
+                
+                if full * size < len(values):# The last bucket is only partly filled.
+                    rest = values[full * size:]
+                    minimums[first + full] = np.fmin.reduce(rest)
+                    maximums[first + full] = np.fmax.reduce(rest)
+                    sums[first + full] = np.nansum(rest)
+                    counts[first + full] = np.count_nonzero(~np.isnan(rest))
+            
+            level[column] = (minimums, maximums, sums, counts)
+        
+        return level
+    
+    def make_next_level(self, level):
+        """
+        Makes the level with buckets twice as large from the level below it, by combining each pair of buckets.
+        """
+        
+        def combine(function, values):
+            pairs = len(values) // 2
+            combined = function(values[0:2 * pairs:2], values[1:2 * pairs:2])
+            
+            return combined if len(values) % 2 == 0 else np.append(combined, values[-1])# A bucket without a partner stays the same.
+        
+        next_level = {"Time" : level["Time"][::2]}
+        
+        for column in self.columns:
+            minimums, maximums, sums, counts = level[column]
+            next_level[column] = (combine(np.fmin, minimums), combine(np.fmax, maximums), combine(np.add, sums), combine(np.add, counts))
+        
+        return next_level
+    
+    def get_level(self, amount_of_rows, max_points = 2000):
+        """
+        Gets the level for a window of amount_of_rows rows: the lowest level with at most max_points buckets in it, or None if the rows themselves are few enough (at most max_points).
+        """
+        
+        if amount_of_rows <= max_points:
+            return None
+        
+        level = max(math.ceil(math.log2(amount_of_rows / (max_points * self.smallest_bucket))), 0)# The lowest level already has fewer buckets than max_points rows.
+        
+        return min(level, len(self.levels) - 1)
+    
+    def query(self, start_time = None, end_time = None, max_points = 2000, columns = None):
+        """
+        Gets the data between start_time and end_time (in seconds, None is the start or end of the data) with at most about max_points buckets (or the recorded rows if there are at most max_points), in O(max_points) time. Returns a dataframe with the start time of each bucket (Time) and for each column its minimum, maximum and mean in the bucket ("Supply min", "Supply max" and "Supply mean" for example). The buckets at the edges may also contain some rows just outside the window. The amount of rows per bucket is in the attrs of the dataframe (1 if the rows are returned as they are recorded).
+        """
+        
+        if columns is None:
+            columns = self.columns
+        
+        first_row = 0 if start_time is None else int(np.searchsorted(self.time, start_time, side = "left"))
+        end_row = self.length if end_time is None else int(np.searchsorted(self.time, end_time, side = "right"))
+        end_row = max(end_row, first_row)
+        
+        level = self.get_level(end_row - first_row, max_points)
+        result = {}
+        
+        if level is None:
+            result["Time"] = np.asarray(self.time[first_row:end_row], dtype = np.float64)
+            
+            for column in columns:
+                values = np.asarray(self.data[column][first_row:end_row], dtype = np.float64)
+                result[column + " min"] = values
+                result[column + " max"] = values
+                result[column + " mean"] = values
+            
+            bucket_size = 1
+        else:
+            bucket_size = self.get_bucket_size(level)
+            first = first_row // bucket_size
+            end = -(-end_row // bucket_size)
+            
+            result["Time"] = self.levels[level]["Time"][first:end]
+            
+            for column in columns:
+                minimums, maximums, sums, counts = self.levels[level][column]
+                result[column + " min"] = minimums[first:end]
+                result[column + " max"] = maximums[first:end]
+                result[column + " mean"] = np.divide(sums[first:end], counts[first:end], out = np.full(end - first, np.nan), where = counts[first:end] > 0)# NaN if the bucket only has NaN values.
+        
+        table = pd.DataFrame(result)
+        table.attrs["Bucket size"] = bucket_size
+        
+        return table
@@ -0,0 +1,364 @@
+import pandas as pd
+import numpy as np
+import bisect
+import math
+import copy
+
+COLUMNS = ["Time", "Velocity", "Satisfaction", "Amount carts on track", "Supply", "Demand", "Storage", "Difference", "Losses", "Amount carts on top", "Amount carts on bottom"]# The columns of the data that is recorded each tick.
+COMPACT_DTYPES = {"Amount carts on track" : np.float32, "Amount carts on bottom" : np.float32, "Amount carts on top" : np.float32}# The amount of carts are whole numbers (up to 16 million) so float32 stores them exactly in half the memory.
+
+class Recorder:
+    """
+    The recorder stores the data of the simulation (see COLUMNS) in preallocated numpy arrays, one per column. Each recorded tick is written at the next index instead of being appended to a list. The arrays can be handed to pandas without copying. If an output sink is set the data is written to disk in chunks instead of being kept in memory.
+    """
+    def __init__(self, stride = 1, dtypes = {}, capacity = 1024):
+        """
+        The init function.
+        
+        stride is the amount of ticks between recorded ticks, so with a stride of 6 only every 6th tick is recorded. The first tick is always recorded.
+        dtypes is a dictionary with the dtype for a column, columns not in it are stored as float64. COMPACT_DTYPES can be used to store the amount of carts as float32.
+        capacity is the amount of rows for which room is made at the start. Controller.simulate reserves room for the entire horizon so this is normally not important.
+        """
+        
+        self.stride = stride
+        self.dtypes = {column : dtypes.get(column, np.float64) for column in COLUMNS}
+        self.columns = {column : np.empty(capacity, dtype = self.dtypes[column]) for column in COLUMNS}
+        
+        self.cursor = 0# The index where the next recorded tick will be written (so also the amount of recorded rows).
+        self.tick = 0# The amount of ticks that have been offered to the recorder (including those skipped due to the stride).
+        self.flushed = 0# The amount of rows that have been written to the sink (and removed from memory).
+        
+        self.sink = None# An output sink (see Output.py), if there is one the rows are written to it in chunks and removed from memory.
+    
+    def reserve(self, amount_of_ticks):
+        """
+        Makes sure there is room for the given amount of extra ticks. If the arrays have to grow they at least double in size so that growing doesn't happen often.
+        """
+        
+        needed = self.cursor + (amount_of_ticks + self.stride - 1) // self.stride + 1
+        
+        if self.sink is not None:# With a sink never more than one chunk is kept in memory.
+            needed = min(needed, self.sink.chunk_size)
+        capacity = len(self.columns["Time"])
+        
+        if needed > capacity:
+            capacity = max(needed, 2 * capacity)
+            
+            for column in COLUMNS:
+                new_array = np.empty(capacity, dtype = self.dtypes[column])
+                new_array[:self.cursor] = self.columns[column][:self.cursor]
+                self.columns[column] = new_array
+    
+    def record(self, time, supply, demand, train_track):
+        """
+        Records a tick (if it is not skipped because of the stride).
+        
+        time is the time of the tick.
+        supply and demand are the power supplied and demanded during the tick.
+        train_track is the TrainTrack object of which the state is recorded.
+        """
+        
+        tick = self.tick
+        self.tick = tick + 1
+        
+        if tick % self.stride != 0:
+            return
+        
+        if self.cursor == len(self.columns["Time"]):
+            self.reserve(self.stride)
+        
+        i = self.cursor
+        columns = self.columns
+        storage = train_track.get_power()
+        
+        columns["Time"][i] = time
+        columns["Velocity"][i] = train_track.velocity
+        columns["Satisfaction"][i] = (supply - storage) / demand
+        columns["Amount carts on track"][i] = train_track.get_amount_carts_on_track()
+        columns["Supply"][i] = supply
+        columns["Demand"][i] = demand
+        columns["Storage"][i] = storage
+        columns["Difference"][i] = supply - storage - demand# Positive is energy left over, negative is energy shortage
+        columns["Losses"][i] = sum(train_track.losses.values())
+        columns["Amount carts on top"][i] = train_track.carts_of_track["Top"]
+        columns["Amount carts on bottom"][i] = train_track.carts_of_track["Bottom"]
+        
+        self.cursor = i + 1
+        
+        if self.sink is not None and self.cursor >= self.sink.chunk_size:
+            self.flush()
+    
+    def flush(self):
+        """
+        Writes the recorded rows to the sink and then removes them from memory. Does nothing if there is no sink.
+        """
+        
+        if self.sink is not None and self.cursor > 0:
+            self.sink.write(self.get_data())
+            self.flushed = self.flushed + self.cursor
+            self.cursor = 0
+    
+    def get_state(self):
+        """
+        Gets the position of the recorder (the cursor, the amount of ticks and the amount of rows written to the sink) as a dictionary.
+        """
+        
+        return {"cursor" : self.cursor, "tick" : self.tick, "flushed" : self.flushed}
+    
+    def set_state(self, state):
+        """
+        Moves the recorder back (or forward) to a position made with get_state. Rows recorded after that position are overwritten by the next recorded ticks. Rows that were already written to a sink can't be undone, so moving to a position from before the last flush raises a ValueError (the cursor would point at rows that have been replaced).
+        """
+        
+        if state.get("flushed", 0) != self.flushed:
+            raise ValueError("The recorder can't be moved to a position from before the last flush to the sink (" + str(state.get("flushed", 0)) + " rows were written then, now " + str(self.flushed) + ").")
+        
+        self.cursor = state["cursor"]
+        self.tick = state["tick"]
+    
+    def copy(self, keep_data = True):
+        """
+        Returns a new recorder with the same settings (but without a sink).
+        
+        keep_data is a boolean which decides if the recorded rows are copied to the new recorder, if False the new recorder starts empty.
+        """
+        
+        new_recorder = Recorder(self.stride, self.dtypes, max(self.cursor, 1024) if keep_data else 1024)
+        
+        if keep_data:
+            for column in COLUMNS:
+                new_recorder.columns[column][:self.cursor] = self.columns[column][:self.cursor]
+            
+            new_recorder.flushed = self.flushed# The rows before these are in the sink of this recorder.
+            new_recorder.set_state(self.get_state())
+        
+        return new_recorder
+    
+    def get_data(self):
+        """
+        Returns a dictionary with for each column a view (not a copy) of the recorded part of the array.
+        """
+        
+        return {column : self.columns[column][:self.cursor] for column in COLUMNS}
+    
+    def to_dataframe(self):
+        """
+        Returns the recorded data as a pandas dataframe. The columns of the dataframe use the arrays of the recorder so no data is copied.
+        """
+        
+        return pd.DataFrame(self.get_data(), copy = False)
+    
+    def to_records(self):
+        """
+        Returns the recorded data as a numpy structured array (one record per row). Unlike to_dataframe this does copy the data since a structured array stores the rows together.
+        """
+        
+        records = np.empty(self.cursor, dtype = [(column, self.dtypes[column]) for column in COLUMNS])
+        
+        for column in COLUMNS:
+            records[column] = self.columns[column][:self.cursor]
+        
+        return records
+
+
+class SummaryRecorder:
+    """
+    A recorder (with the same record function as Recorder) that doesn't store the data of each tick but only keeps running statistics, so the memory use stays a few kilobytes no matter how long the simulation is. The statistics are updated each tick: energies and times are weighted with the time until the next tick (so they also work with Controller.simulate_adaptive), means and variances use Welford's method and the satisfaction is counted in a histogram with fixed bins. See get_summary for what is kept.
+    """
+    def __init__(self, satisfaction_levels = [0.5, 0.9, 0.99, 1], histogram_bins = np.linspace(0, 2, 41)):
+        """
+        The init function.
+        
+        satisfaction_levels is a list of satisfaction levels, for each the amount of hours the satisfaction is below it is counted.
+        histogram_bins are the edges of the bins of the satisfaction histogram (satisfaction values), for each bin the amount of hours with a satisfaction in it is counted. Satisfactions outside of the edges are counted in an extra bin at each end.
+        """
+        
+        self.satisfaction_levels = list(satisfaction_levels)
+        self.histogram_bins = [float(edge) for edge in histogram_bins]
+        
+        self.sink = None# Never used, but the controller checks it.
+        self.reset()
+    
+    def reset(self):
+        """
+        Clears all statistics, for example after warming up.
+        """
+        
+        self.tick = 0
+        self.last_time = None# The time of the last tick and its values, these are weighted with the time until the next tick.
+        self.last_values = None
+        self.last_step = 0
+        
+        self.energies = [0.0, 0.0, 0.0, 0.0, 0.0]# Supplied, demanded, stored, unmet and surplus energy in joules.
+        self.seconds_below = [0.0 for level in self.satisfaction_levels]
+        self.histogram = [0.0 for i in range(len(self.histogram_bins) + 1)]# In seconds, the first and last bin are below and above the edges.
+        self.friction_losses = 0.0
+        self.efficiency_losses = 0.0
+        self.means = [0.0, 0.0, 0.0]# Of the satisfaction, velocity and storage power, with the sums of squared differences from the mean for Welford's method.
+        self.satisfaction_ticks = 0# The ticks with demand, the satisfaction of the others is NaN and left out.
+        self.squares = [0.0, 0.0, 0.0]
+        self.peak_velocity = 0.0
+        self.peak_storage = 0.0
+        self.minimal_carts_on_top = np.inf
+        self.minimal_carts_on_bottom = np.inf
+        self.maximal_carts_on_track = 0
+    
+    def reserve(self, amount_of_ticks):
+        """
+        Does nothing, a summary recorder never needs more room.
+        """
+    
+    def flush(self):
+        """
+        Does nothing, a summary recorder has no rows to write.
+        """
+    
+    def add_weighted(self, values, step):
+        """
+        Adds the values of a tick (supply, demand, storage and satisfaction) weighted with the length of that tick.
+        """
+        
+        supply, demand, storage, satisfaction = values
+        difference = supply - storage - demand
+        energies = self.energies
+        
+        energies[0] = energies[0] + supply * step
+        energies[1] = energies[1] + demand * step
+        energies[2] = energies[2] + storage * step
+        
+        if difference < 0:# Negative is energy shortage, positive is energy left over.
+            energies[3] = energies[3] - difference * step
+        else:
+            energies[4] = energies[4] + difference * step
+        
+        if math.isnan(satisfaction):# No demand, so no satisfaction to count.
+            return
+        
+        for i, level in enumerate(self.satisfaction_levels):
+            if satisfaction < level:
+                self.seconds_below[i] = self.seconds_below[i] + step
+        
+        index = bisect.bisect_right(self.histogram_bins, satisfaction)
+        self.histogram[index] = self.histogram[index] + step
+    
+    def record(self, time, supply, demand, train_track):
+        """
+        Updates the statistics with a tick, see Recorder.record.
+        """
+        
+        if self.last_time is not None:
+            self.last_step = time - self.last_time
+            self.add_weighted(self.last_values, self.last_step)
+        
+        supply = float(supply)# Python floats, calculating with numpy scalars is a lot slower.
+        demand = float(demand)
+        storage = float(train_track.get_power())
+        satisfaction = (supply - storage) / demand if demand != 0 else np.nan# The satisfaction of no demand is NaN, like 0 / 0.
+        velocity = float(train_track.velocity)
+        
+        self.last_time = time
+        self.last_values = (supply, demand, storage, satisfaction)
+        
+        self.tick = self.tick + 1
+        means = self.means
+        squares = self.squares
+        
+        for i, value, ticks in ((0, satisfaction, self.satisfaction_ticks + 1), (1, velocity, self.tick), (2, storage, self.tick)):# Welford's method, the mean and variance without keeping the values.
+            if i == 0 and demand == 0:
+                continue
+            
+            delta = value - means[i]
+            means[i] = means[i] + delta / ticks
+            squares[i] = squares[i] + delta * (value - means[i])
+        
+        if demand != 0:
+            self.satisfaction_ticks = self.satisfaction_ticks + 1
+        
+        self.friction_losses = self.friction_losses + float(train_track.losses["Friction"])
+        self.efficiency_losses = self.efficiency_losses + float(train_track.losses["Efficiency"])
+        
+        if abs(velocity) > self.peak_velocity:
+            self.peak_velocity = abs(velocity)
+        if abs(storage) > self.peak_storage:
+            self.peak_storage = abs(storage)
+        
+        carts_of_track = train_track.carts_of_track
+        if carts_of_track["Top"] < self.minimal_carts_on_top:
+            self.minimal_carts_on_top = carts_of_track["Top"]
+        if carts_of_track["Bottom"] < self.minimal_carts_on_bottom:
+            self.minimal_carts_on_bottom = carts_of_track["Bottom"]
+        amount_of_carts = train_track.get_amount_carts_on_track()# Without making the positions of the carts.
+        if amount_of_carts > self.maximal_carts_on_track:
+            self.maximal_carts_on_track = amount_of_carts
+    
+    def get_summary(self, end_time = None):
+        """
+        Returns a dictionary with the statistics: the unmet, surplus, supplied, demanded and stored energy (kWh), the mean and standard deviation of the satisfaction (of the ticks with demand), velocity and storage power, the hours below each satisfaction level, the satisfaction histogram (hours per bin), the friction and efficiency losses (kWh), the peak velocity and storage power, the minimal amount of carts at the top and bottom and the maximal amount of carts on the track. The first four entries are the same as those of Sweep.get_summary.
+        
+        end_time is the time at which the last tick ended (controller.time after simulating), if None the last tick is assumed to be as long as the one before it.
+        """
+        
+        saved = (list(self.energies), list(self.seconds_below), list(self.histogram))# The last tick is only added for the summary, afterwards it is taken out again.
+        
+        if self.last_time is not None:
+            self.add_weighted(self.last_values, self.last_step if end_time is None else end_time - self.last_time)
+        
+        kwh = 1 / (3.6 * 10**6)
+        empty = self.tick == 0
+        no_demand = self.satisfaction_ticks == 0
+        
+        summary = {"Unmet energy (kWh)" : self.energies[3] * kwh,
+                   "Mean satisfaction" : np.nan if no_demand else self.means[0],
+                   "Losses (kWh)" : (self.friction_losses + self.efficiency_losses) * kwh,
+                   "Peak velocity" : np.nan if empty else self.peak_velocity,
+                   "Surplus energy (kWh)" : self.energies[4] * kwh,
+                   "Supplied energy (kWh)" : self.energies[0] * kwh,
+                   "Demanded energy (kWh)" : self.energies[1] * kwh,
+                   "Storage energy (kWh)" : self.energies[2] * kwh,
+                   "Friction losses (kWh)" : self.friction_losses * kwh,
+                   "Efficiency losses (kWh)" : self.efficiency_losses * kwh,
+                   "Standard deviation satisfaction" : np.nan if no_demand else np.sqrt(self.squares[0] / self.satisfaction_ticks),
+                   "Mean velocity" : np.nan if empty else self.means[1],
+                   "Standard deviation velocity" : np.nan if empty else np.sqrt(self.squares[1] / self.tick),
+                   "Mean storage" : np.nan if empty else self.means[2],
+                   "Standard deviation storage" : np.nan if empty else np.sqrt(self.squares[2] / self.tick),
+                   "Peak storage" : np.nan if empty else self.peak_storage,
+                   "Minimal carts on top" : np.nan if empty else self.minimal_carts_on_top,
+                   "Minimal carts on bottom" : np.nan if empty else self.minimal_carts_on_bottom,
+                   "Maximal carts on track" : self.maximal_carts_on_track,
+                   "Ticks" : self.tick}
+        
+        for level, seconds in zip(self.satisfaction_levels, self.seconds_below):
+            summary["Hours below satisfaction " + str(level)] = seconds / 3600
+        
+        summary["Satisfaction histogram (hours)"] = [seconds / 3600 for seconds in self.histogram]
+        summary["Satisfaction histogram edges"] = list(self.histogram_bins)
+        
+        self.energies, self.seconds_below, self.histogram = saved
+        
+        return summary
+    
+    def get_data(self):
+        raise ValueError("A SummaryRecorder doesn't keep the data of each tick, use get_summary instead.")
+    
+    def get_state(self):
+        """
+        Gets a copy of all statistics, so that Controller.snapshot and restore also work with a summary recorder.
+        """
+        
+        return copy.deepcopy({name : value for name, value in self.__dict__.items() if name != "sink"})
+    
+    def set_state(self, state):
+        self.__dict__.update(copy.deepcopy(state))
+    
+    def copy(self, keep_data = True):
+        """
+        Returns a new summary recorder with the same settings, with a copy of the statistics if keep_data is True.
+        """
+        
+        new_recorder = SummaryRecorder(self.satisfaction_levels, self.histogram_bins)
+        
+        if keep_data:
+            new_recorder.set_state(self.get_state())
+        
+        return new_recorder
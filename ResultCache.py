@@ -0,0 +1,337 @@
+import pandas as pd
+import numpy as np
+import argparse
+import hashlib
+import inspect
+import io
+import json
+import os
+import sqlite3
+import sys
+import time
+
+import Controller as ControllerModule
+import Demand
+import Ensemble
+import Helpers
+import Policies
+import Profiles
+import Recorder
+import Storage
+import Supply
+import Sweep
+from Storage import TrainTrack
+from Controller import Controller
+from Sweep import SUPPLY_CLASSES, DEMAND_CLASSES, run_scenario
+
+RESULT_CACHE_VERSION = 1# Part of the key of cached results, raise it when the meaning of a result changes without the code of the simulation changing.
+CODE_MODULES = [Storage, ControllerModule, Supply, Demand, Recorder, Profiles, Policies, Helpers, Ensemble, Sweep]# The modules of which the code decides the results, a change in any of them makes all cached results unused.
+PROFILE_PARAMETERS = ["windspeeds_profile", "profiel"]# Parameters that are the name of a profile file, the contents of the file are part of the key instead of its name.
+IGNORED_PARAMETERS = ["shared_profile", "cache_directory"]# Parameters that only change where a profile is read from, not the results.
+SETTINGS = {"supply_class" : "WindSupply", "demand_class" : "Households", "days" : 364, "warm_up" : 3600, "summary_only" : True, "max_speed" : 10, "max_acceleration" : 1, "allow_new_carts" : True}# The settings of a scenario (see Sweep.run_scenario) that change its results, with their defaults.
+
+file_hashes = {}# The hashes of the files that were already read, by path, modification time and size.
+code_version = None
+
+def get_file_hash(path):
+    """
+    Gets the sha256 hash of the contents of a file. A file is only read again if its modification time or size changed.
+    """
+    
+    status = os.stat(path)
+    key = (os.path.abspath(path), status.st_mtime_ns, status.st_size)
+    
+    if key not in file_hashes:
+        file_hash = hashlib.sha256()
+        
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(2**20), b""):
+                file_hash.update(block)
+        
+        file_hashes[key] = file_hash.hexdigest()
+    
+    return file_hashes[key]
+
+def get_code_version():
+    """
+    Gets the version of the code: a hash of the source files of the simulation (see CODE_MODULES) and RESULT_CACHE_VERSION. So any change to the code gives new keys, results of older code are never returned.
+    """
+    
+    global code_version
+    
+    if code_version is None:
+        code_version = hashlib.sha256(repr((RESULT_CACHE_VERSION, [get_file_hash(module.__file__) for module in CODE_MODULES])).encode()).hexdigest()
+    
+    return code_version
+
+def make_plain(value):
+    """
+    Makes a value plain json (numpy numbers and arrays and tuples become python numbers and lists).
+    """
+    
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        return [make_plain(item) for item in value]
+    if isinstance(value, dict):
+        return {str(name) : make_plain(item) for name, item in value.items()}
+    
+    return value
+
+def get_parameters(function, parameters):
+    """
+    Gets all parameters of an init function, the given ones and the defaults of the others, so a scenario that leaves out a default gets the same key as one that gives it. Profile files are replaced by the hash of their contents and parameters that don't change the results are left out.
+    """
+    
+    all_parameters = {name : parameter.default for name, parameter in inspect.signature(function).parameters.items() if parameter.default is not inspect.Parameter.empty}
+    all_parameters.update(parameters)
+    
+    for name in PROFILE_PARAMETERS:
+        if isinstance(all_parameters.get(name), str) and os.path.isfile(all_parameters[name]):
+            all_parameters[name] = "sha256:" + get_file_hash(all_parameters[name])
+    
+    return {name : make_plain(value) for name, value in all_parameters.items() if name not in IGNORED_PARAMETERS}
+
+def describe_scenario(scenario):
+    """
+    Gets everything of a scenario (see Sweep.run_scenario) that decides its results as a dictionary: all parameters of the train track, supply, demand and controller, the settings and the version of the code.
+    """
+    
+    settings = {name : make_plain(scenario.get(name, default)) for name, default in SETTINGS.items()}
+    
+    return {"train_track" : get_parameters(TrainTrack.__init__, scenario.get("train_track", {})),
+            "supply" : get_parameters(SUPPLY_CLASSES[settings["supply_class"]].__init__, scenario.get("supply", {})),
+            "demand" : get_parameters(DEMAND_CLASSES[settings["demand_class"]].__init__, scenario.get("demand", {})),
+            "controller" : {name : value for name, value in get_parameters(Controller.__init__, scenario.get("controller", {})).items() if name not in ["train_track", "supply", "demand", "recorder", "policy"]},
+            "settings" : settings,
+            "code" : get_code_version()}
+
+def get_scenario_key(scenario):
+    """
+    Gets the key of a scenario in the cache: a hash of everything that decides its results (see describe_scenario).
+    """
+    
+    return hashlib.sha256(json.dumps(describe_scenario(scenario), sort_keys = True, default = repr).encode()).hexdigest()
+
+def pack_data(data):
+    """
+    Packs the recorded data (a dictionary of columns) as the bytes of a compressed npz file.
+    """
+    
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **{column : np.asarray(values) for column, values in data.items()})
+    
+    return buffer.getvalue()
+
+def unpack_data(blob):
+    with np.load(io.BytesIO(blob)) as arrays:
+        return {column : arrays[column] for column in arrays.files}
+
+
+class ResultCache:
+    """
+    A persistent cache of the results of scenarios (see Sweep.run_scenario) in a SQLite file, so running exactly the same scenario again (for example after restarting a notebook) returns its summary at once instead of simulating it again.
+    
+    A result is found by the key of its scenario (see get_scenario_key), which covers all parameters of the train track, supply, demand and controller (with their defaults), the contents of the profile files and the code of the simulation, so a changed file or changed code is never answered with an old result. When there are more entries or bytes than allowed the least recently used results are removed.
+    """
+    def __init__(self, path = "result_cache.sqlite", max_entries = None, max_size = None):
+        """
+        The init function, opens (or makes) the cache file.
+        
+        path is the name of the SQLite file.
+        max_entries is the maximum amount of results that are kept, None is no limit.
+        max_size is the maximum amount of bytes of the summaries and data that are kept, None is no limit.
+        """
+        
+        self.path = path
+        self.max_entries = max_entries
+        self.max_size = max_size
+        
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok = True)
+        
+        self.connection = sqlite3.connect(path, timeout = 60)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, scenario TEXT, summary TEXT, data BLOB, size INTEGER, created REAL, last_used REAL)")
+        self.connection.commit()
+    
+    def close(self):
+        self.connection.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exception):
+        self.close()
+    
+    def get(self, scenario, with_data = False):
+        """
+        Gets the cached summary of a scenario, or None if it is not in the cache. If with_data is True it returns a tuple of the summary and the data instead, or None if the data was not cached.
+        """
+        
+        key = get_scenario_key(scenario)
+        row = self.connection.execute("SELECT summary, data FROM results WHERE key = ?", (key,)).fetchone()
+        
+        if row is None or (with_data and row[1] is None):
+            return None
+        
+        self.connection.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+        self.connection.commit()
+        
+        summary = json.loads(row[0])
+        
+        return (summary, unpack_data(row[1])) if with_data else summary
+    
+    def put(self, scenario, summary, data = None):
+        """
+        Stores the summary (and optionally the recorded data) of a scenario, and then removes the least recently used results if the cache is too large.
+        """
+        
+        description = json.dumps(describe_scenario(scenario), sort_keys = True, default = repr)
+        summary = json.dumps(make_plain(summary))
+        blob = None if data is None else pack_data(data)
+        now = time.time()
+        
+        self.connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)", (get_scenario_key(scenario), description, summary, blob, len(summary) + (0 if blob is None else len(blob)), now, now))
+        self.connection.commit()
+        
+        self.evict()
+    
+    def evict(self, max_entries = None, max_size = None):
+        """
+        Removes the least recently used results until there are at most max_entries results of at most max_size bytes together (by default the limits of the cache). Returns the amount of removed results.
+        """
+        
+        max_entries = self.max_entries if max_entries is None else max_entries
+        max_size = self.max_size if max_size is None else max_size
+        
+        if max_entries is None and max_size is None:
+            return 0
+        
+        rows = self.connection.execute("SELECT key, size FROM results ORDER BY last_used DESC").fetchall()
+        removed = []
+        total_size = 0
+        
+        for number, (key, size) in enumerate(rows):
+            total_size += size
+            
+            if (max_entries is not None and number >= max_entries) or (max_size is not None and total_size > max_size):
+                removed.append((key,))
+        
+        self.connection.executemany("DELETE FROM results WHERE key = ?", removed)
+        self.connection.commit()
+        
+        return len(removed)
+    
+    def invalidate(self, scenarios = None, keys = None, older_than = None):
+        """
+        Removes results from the cache. Returns the amount of removed results.
+        
+        scenarios is a list of scenarios of which the results are removed.
+        keys is a list of keys (see get_entries) of which the results are removed.
+        older_than is an amount of seconds, results that were made longer ago are removed.
+        If none of them is given everything is removed.
+        """
+        
+        if scenarios is None and keys is None and older_than is None:
+            removed = self.connection.execute("DELETE FROM results").rowcount
+        else:
+            keys = list(keys or []) + [get_scenario_key(scenario) for scenario in scenarios or []]
+            removed = sum(self.connection.execute("DELETE FROM results WHERE key = ?", (key,)).rowcount for key in keys)
+            
+            if older_than is not None:
+                removed += self.connection.execute("DELETE FROM results WHERE created < ?", (time.time() - older_than,)).rowcount
+        
+        self.connection.commit()
+        
+        return removed
+    
+    def get_entries(self):
+        """
+        Gets a dataframe with a row for each cached result: its key, size, if the data is cached, when it was made and last used and its scenario.
+        """
+        
+        rows = self.connection.execute("SELECT key, size, data IS NOT NULL, created, last_used, scenario FROM results ORDER BY last_used DESC").fetchall()
+        entries = pd.DataFrame(rows, columns = ["Key", "Size (bytes)", "Data", "Created", "Last used", "Scenario"])
+        entries["Data"] = entries["Data"].astype(bool)
+        
+        for column in ["Created", "Last used"]:
+            entries[column] = pd.to_datetime(entries[column], unit = "s")
+        
+        return entries
+
+
+def run_scenario_cached(scenario, cache, keep_data = False):
+    """
+    Runs a scenario (see Sweep.run_scenario) unless its result is already in the cache, then the cached result is returned at once. A new result is stored in the cache.
+    
+    cache is a ResultCache.
+    keep_data is a boolean which decides if the recorded data is returned (and cached) as well, see Sweep.run_scenario. The summary is then made from the data, so it is cached separately from the summary of a run with only a SummaryRecorder.
+    """
+    
+    if keep_data:
+        scenario = dict(scenario, summary_only = False)
+    
+    result = cache.get(scenario, keep_data)
+    
+    if result is None:
+        result = run_scenario(scenario, keep_data)
+        
+        if keep_data:
+            cache.put(scenario, *result)
+        else:
+            cache.put(scenario, result)
+    
+    return result
+
+def main(arguments = None):
+    """
+    The command line interface to look at and clean the cache. "list" prints the cached results, "invalidate" removes results and "evict" removes the least recently used results until the cache is small enough.
+    """
+    
+    parser = argparse.ArgumentParser(description = "Manage the cache of simulation results.")
+    parser.add_argument("--path", default = "result_cache.sqlite", help = "The SQLite file of the cache.")
+    commands = parser.add_subparsers(dest = "command", required = True)
+    
+    commands.add_parser("list", help = "List the cached results.")
+    
+    invalidate = commands.add_parser("invalidate", help = "Remove cached results.")
+    invalidate.add_argument("keys", nargs = "*", help = "The keys of the results that are removed (the start of a key is enough).")
+    invalidate.add_argument("--older-than", type = float, default = None, help = "Remove the results made more than this amount of days ago.")
+    invalidate.add_argument("--all", action = "store_true", help = "Remove all results.")
+    
+    evict = commands.add_parser("evict", help = "Remove the least recently used results.")
+    evict.add_argument("--max-entries", type = int, default = None, help = "The maximum amount of results that are kept.")
+    evict.add_argument("--max-size", type = float, default = None, help = "The maximum size (in MB) of the results that are kept.")
+    
+    arguments = parser.parse_args(arguments)
+    
+    with ResultCache(arguments.path) as cache:
+        if arguments.command == "list":
+            entries = cache.get_entries()
+            
+            with pd.option_context("display.width", 200, "display.max_colwidth", 60):
+                print(entries.drop(columns = "Scenario").to_string(index = False))
+            print(len(entries), "results,", np.round(entries["Size (bytes)"].sum() / 10**6, 2), "MB")
+        elif arguments.command == "invalidate":
+            if not arguments.all and not arguments.keys and arguments.older_than is None:
+                parser.error("Give the keys of the results, --older-than or --all.")
+            
+            if arguments.all:
+                removed = cache.invalidate()
+            else:
+                keys = [key for key in cache.get_entries()["Key"] if any(key.startswith(start) for start in arguments.keys)]
+                removed = cache.invalidate(keys = keys, older_than = None if arguments.older_than is None else arguments.older_than * 24 * 3600)
+            
+            print("Removed", removed, "results.")
+        else:
+            if arguments.max_entries is None and arguments.max_size is None:
+                parser.error("Give --max-entries or --max-size.")
+            
+            print("Removed", cache.evict(arguments.max_entries, None if arguments.max_size is None else int(arguments.max_size * 10**6)), "results.")
+    
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
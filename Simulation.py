@@ -8,13 +8,15 @@ from matplotlib import pyplot
 import matplotlib.pyplot as plt
 from matplotlib import cm
 
-from Helpers import make_3Dfunction_plot
+from Helpers import make_3Dfunction_plot, plot_time_series
 from Supply import WindSupply
 from Supply import WindSupplyDummy
 from Demand import Households
 from Demand import HouseholdsDummy
 from Storage import TrainTrack
 from Controller import Controller
+from Output import NpySink, load_output
+from Pyramid import TimeSeriesPyramid
 
 
 ### SETTINGS
@@ -22,49 +24,39 @@ days_to_simulate = 364
 amount_of_carts = 30000
 amount_households = 67000
 amount_windmils = 60
+profile_cache = "profile_cache"# Directory in which the processed profiles are cached so that they are only parsed the first time, None to not cache them.
 
 train_track = TrainTrack(carts = amount_of_carts/2)
-supply = WindSupply(amount_of_windmills = amount_windmils)#WindSupplyDummy(100000)
-demand = Households(amount_of_households_per_type = [amount_households, 0, 0, 0, 0, 0, 0, 0, 0, 0])# Theoretically 125000
+supply = WindSupply(amount_of_windmills = amount_windmils, cache_directory = profile_cache)#WindSupplyDummy(100000)
+demand = Households(amount_of_households_per_type = [amount_households, 0, 0, 0, 0, 0, 0, 0, 0, 0], cache_directory = profile_cache)# Theoretically 125000
 controller = Controller(train_track = train_track, supply = supply, demand = demand, delta_time = 10)
+controller.compile_profiles(end_time_seconds = 0, end_time_days = days_to_simulate)# Interpolate the supply and demand for the entire year at once instead of each tick.
 
 
 ### SIMULATION AND PLOTTING
-#make_3Dfunction_plot(controller.get_difference_supply_demand, amount_of_days = days_to_simulate, zlabel = "Difference in power (Watts)")
-#make_3Dfunction_plot(controller.get_sastisfaction_supply_demand, amount_of_days = days_to_simulate, zlabel = "Satisfaction")
-controller.simulate(3600)# First simulate a hour to stabalize the stystem. This will cause the end result to have a constant first hour.
+#make_3Dfunction_plot(controller.get_difference_supply_demand, amount_of_days = days_to_simulate, zlabel = "Difference in power (Watts)", vectorized = True)
+#make_3Dfunction_plot(controller.get_sastisfaction_supply_demand, amount_of_days = days_to_simulate, zlabel = "Satisfaction", vectorized = True)
+controller.simulate(3600)# First simulate a hour to stabalize the stystem.
+controller = controller.fork()# Continue from the stabalized state with an empty recorder, so the first hour is not part of the data (and the warmed up controller could be forked again for other runs).
+
+output = NpySink(str(days_to_simulate) + "days" + str(amount_households) + "households" + str(amount_of_carts) + "carts")# The data is written to this directory during the simulation instead of being kept in memory.
+controller.recorder.sink = output
+
 make_3Dfunction_plot(controller.simulate, amount_of_days = days_to_simulate, zlabel = "Difference in power (Watts)", title = "Difference plot " +str(days_to_simulate) + " days, "+ str(amount_households) + " households and " + str(amount_of_carts) + " carts.")
 
-data = pd.DataFrame(controller.data)
-data.to_csv(str(days_to_simulate) + "days" + str(amount_households) + "households" + str(amount_of_carts) + "carts.csv")
-#data = pd.read_csv("364days62500households10000000carts.csv")
-data = data.iloc[360:]# Drop the first 360 rows (1 hour) of the data
+controller.recorder.flush()# Write the last rows.
+output.close()
+
+data = load_output(output.directory)
+#data = load_output("364days62500households10000000carts", columns = ["Time", "Velocity"], start_time = 100 * 24 * 3600, end_time = 110 * 24 * 3600)# Only load a part of the data.
 print(data)
 
-plt.figure(figsize = (8,8))
-plt.plot(data["Time"] / (3600 * 24), data["Supply"], label="Supply")
-plt.plot(data["Time"] / (3600 * 24), data["Demand"], label="Demand")
-plt.xlabel("Time (days)")
-plt.ylabel("Supply (Watts)")
-plt.legend(loc="upper left")
-plt.show()
-
-plt.figure(figsize = (8,8))
-plt.plot(data["Time"] / (3600 * 24), data["Satisfaction"])
-plt.xlabel("Time (days)")
-plt.ylabel("Satisfaction")
-plt.show()
-
-plt.figure(figsize = (8,8))
-plt.plot(data["Time"] / (3600 * 24), data["Velocity"])
-plt.xlabel("Time (days)")
-plt.ylabel("Velocity on track (meter per second)")
-plt.show()
-
-plt.figure(figsize = (8,8))
-plt.plot(data["Time"] / (3600 * 24), data["Amount carts on top"], label = "Amount of carts at top")
-plt.plot(data["Time"] / (3600 * 24), data["Amount carts on bottom"], label = "Amount of carts at bottom")
-plt.xlabel("Time (days)")
-plt.ylabel("Amount of carts")
-plt.legend(loc="upper left")
-plt.show()
+pyramid = TimeSeriesPyramid(output.directory)# Indexed once for all plots, each plot then only draws a few thousand points per line (also when zooming in).
+
+plot_time_series(pyramid, ["Supply", "Demand"], labels = ["Supply", "Demand"], ylabel = "Supply (Watts)")
+
+plot_time_series(pyramid, ["Satisfaction"], ylabel = "Satisfaction")
+
+plot_time_series(pyramid, ["Velocity"], ylabel = "Velocity on track (meter per second)")
+
+plot_time_series(pyramid, ["Amount carts on top", "Amount carts on bottom"], labels = ["Amount of carts at top", "Amount of carts at bottom"], ylabel = "Amount of carts")
@@ -2,6 +2,115 @@ import pandas as pd
 import numpy as np
 import datetime
 import math
+import copy
+
+class CartQueue:
+    """
+    A double ended queue of numbers which is stored in a numpy array. The numbers are kept in order by only adding to the front or the back. Adding and removing at both ends is (amortized) O(1) and the entire queue can be read as a numpy view without copying.
+    """
+    def __init__(self, values = [], capacity = 64):
+        """
+        The init function.
+        
+        values is an (already sorted) list or array of the starting values.
+        capacity is the amount of values the array has room for at the start, it automatically grows when needed.
+        """
+        
+        values = np.asarray(values, dtype = np.float64)
+        
+        self.values = np.empty(max(capacity, 4 * len(values) + 4), dtype = np.float64)
+        self.start = (len(self.values) - len(values)) // 2# The queue is kept in the middle of the array so that there is room on both ends.
+        self.stop = self.start + len(values)
+        self.values[self.start:self.stop] = values
+    
+    def __len__(self):
+        return self.stop - self.start
+    
+    def __getitem__(self, index):
+        return self.view()[index]
+    
+    def view(self):
+        """
+        Returns the values in the queue as a numpy view (not a copy).
+        """
+        
+        return self.values[self.start:self.stop]
+    
+    def front(self):
+        return self.values[self.start]
+    
+    def back(self):
+        return self.values[self.stop - 1]
+    
+    def append(self, value):
+        """
+        Adds a value to the back of the queue.
+        """
+        
+        if self.stop == len(self.values):
+            self.recenter()
+        
+        self.values[self.stop] = value
+        self.stop = self.stop + 1
+    
+    def appendleft(self, value):
+        """
+        Adds a value to the front of the queue.
+        """
+        
+        if self.start == 0:
+            self.recenter()
+        
+        self.start = self.start - 1
+        self.values[self.start] = value
+    
+    def pop(self):
+        """
+        Removes and returns the value at the back of the queue. Raises an IndexError if the queue is empty (like list.pop).
+        """
+        
+        if self.stop == self.start:
+            raise IndexError("pop from an empty CartQueue")
+        
+        self.stop = self.stop - 1
+        return self.values[self.stop]
+    
+    def popleft(self):
+        """
+        Removes and returns the value at the front of the queue. Raises an IndexError if the queue is empty.
+        """
+        
+        if self.stop == self.start:
+            raise IndexError("pop from an empty CartQueue")
+        
+        self.start = self.start + 1
+        return self.values[self.start - 1]
+    
+    def remove(self, index):
+        """
+        Removes and returns the value at any index. Unlike the other functions this is O(N).
+        """
+        
+        values = self.view()
+        value = values[index]
+        self.__init__(np.delete(values, index), len(self.values))
+        
+        return value
+    
+    def recenter(self):
+        """
+        Moves the queue back to the middle of the array when it has reached one of the ends. If the queue takes up more than a quarter of the array it is also made bigger, this way it only has to happen once in a while.
+        """
+        
+        self.__init__(self.view().copy(), len(self.values))
+    
+    def copy(self):
+        """
+        Returns a new queue with a copy of the values.
+        """
+        
+        return CartQueue(self.view(), len(self.values))
+
 
 class TrainTrack:
     """
@@ -18,7 +127,8 @@ class TrainTrack:
         efficiency_generator is a list with the first element being the efficiency of generating power and the second element being the efficiency of storing power. Default values are based on sources (which can be found in the report).
         """
         
-        self.carts_on_track = []# Each cart on the track will be represented by a number which indicates its position on the track.
+        self.cart_queue = CartQueue()# Each cart on the track is stored (in order of position) as the position it had minus the displacement when it entered, since all carts move together the displacement only has to be kept once (see carts_on_track).
+        self.displacement = 0# How far all the carts have moved in total.
         self.velocity = 0# The velocity of the consolidated cart.
         self.carts_of_track = {"Bottom" : carts, "Top" : carts}# Both at the bottom and the top the same amount of carts is started with.
         self.losses = {"Friction" : 0, "Efficiency" : 0}
@@ -34,6 +144,96 @@ class TrainTrack:
         self.efficiency_generator = efficiency_generator
         self.other_power = 0
     
+    @property
+    def carts_on_track(self):
+        """
+        The positions of the carts on the track as an array, sorted from the lowest to the highest (not in the order they were added). It is calculated from the queue each time it is asked, so each access makes a new array of all carts (O(N)) and changing that array doesn't change the track. Use get_amount_carts_on_track (or cart_queue) instead where the positions themselves aren't needed.
+        
+        Setting it (to a list or array of positions, in any order) replaces all the carts on the track with a sorted copy of the positions.
+        """
+        
+        return self.cart_queue.view() + self.displacement
+    
+    @carts_on_track.setter
+    def carts_on_track(self, positions):
+        self.cart_queue = CartQueue(np.sort(np.asarray(positions, dtype = np.float64)))
+        self.displacement = 0
+    
+    def get_state(self):
+        """
+        Gets the state of the track (everything that changes during a simulation) as a dictionary. The arrays and dictionaries in it are copies, so the state doesn't change when the simulation continues. The carts are stored as they are in the queue (see carts_on_track) so restoring the state gives exactly the same numbers.
+        """
+        
+        return {"velocity" : self.velocity,
+                "cart_queue" : self.cart_queue.view().copy(),
+                "displacement" : self.displacement,
+                "carts_of_track" : dict(self.carts_of_track),
+                "losses" : dict(self.losses),
+                "force_of_generator" : self.force_of_generator,
+                "other_power" : self.other_power}
+    
+    def set_state(self, state):
+        """
+        Sets the state of the track to a state made with get_state. The state itself is not changed, so it can be set more than once.
+        """
+        
+        self.velocity = state["velocity"]
+        self.cart_queue = CartQueue(state["cart_queue"])
+        self.displacement = state["displacement"]
+        self.carts_of_track = dict(state["carts_of_track"])
+        self.losses = dict(state["losses"])
+        self.force_of_generator = state["force_of_generator"]
+        self.other_power = state["other_power"]
+    
+    def copy(self):
+        """
+        Returns a new track with the same settings and a copy of the state, changing one doesn't change the other.
+        """
+        
+        new_track = copy.copy(self)
+        new_track.set_state(self.get_state())
+        
+        return new_track
+    
+    def get_amount_carts_on_track(self):
+        """
+        Gets the amount of carts on the track.
+        """
+        
+        return len(self.cart_queue)
+    
+    def get_lowest_cart(self):
+        """
+        Gets the position of the lowest cart on the track.
+        """
+        
+        return self.cart_queue.front() + self.displacement
+    
+    def get_highest_cart(self):
+        """
+        Gets the position of the highest cart on the track.
+        """
+        
+        return self.cart_queue.back() + self.displacement
+    
+    def get_side_off_track(self, index):
+        """
+        Checks if a cart has gone past the top or the bottom of the track. Returns "Top" or "Bottom" if it has and "" if it is still on the track.
+        
+        index is the index of the cart (0 is the lowest cart and -1 the highest).
+        
+        The check is done on the stored values instead of the positions, that way a cart which was just added exactly at the top or bottom can never be seen as off the track due to rounding.
+        """
+        
+        value = self.cart_queue[index]
+        
+        if value > self.track_length - self.displacement:
+            return "Top"
+        elif value < 0 - self.displacement:
+            return "Bottom"
+        else:
+            return ""
+    
     def get_friction(self, velocity = "NaN"):
         """
         This function gets the friction of all the carts in total.
@@ -58,7 +258,43 @@ class TrainTrack:
         """
         
         g = 9.81
-        return -np.sin(self.angle) * g * len(self.carts_on_track) * self.mass_per_cart
+        return -np.sin(self.angle) * g * len(self.cart_queue) * self.mass_per_cart
+    
+    def get_acceleration(self):
+        """
+        Gets the acceleration of the carts due to gravity, friction and the generator. Without carts it is zero.
+        """
+        
+        if len(self.cart_queue) == 0:
+            return 0
+        
+        return (self.get_gravity() + self.get_friction() + self.force_of_generator) / (len(self.cart_queue) * self.mass_per_cart)
+    
+    def get_time_until_next_event(self):
+        """
+        Predicts (with the current velocity) how long it takes until the next cart goes past the end of the track or until there is enough room to add a cart at the other end. Returns infinity if the carts are not moving or if there are no carts.
+        """
+        
+        velocity = self.velocity
+        
+        if len(self.cart_queue) == 0 or velocity == 0:
+            return np.inf
+        
+        lowest = self.get_lowest_cart()
+        highest = self.get_highest_cart()
+        
+        if velocity > 0:# Going up the highest cart leaves at the top and carts are added at the bottom.
+            times = [(self.track_length - highest) / velocity]
+            if self.carts_of_track["Bottom"] > 0:
+                times.append((self.minimal_distance - lowest) / velocity)
+        else:# Going down the lowest cart leaves at the bottom and carts are added at the top.
+            times = [lowest / -velocity]
+            if self.carts_of_track["Top"] > 0:
+                times.append((self.track_length - self.minimal_distance - highest) / velocity)
+        
+        times = [time for time in times if time >= 0]# Events that already happened are not in the future, an event that is exactly now still has to be stepped over.
+        
+        return min(times) if len(times) > 0 else np.inf
     
     def get_kinetic_energy_per_cart(self, velocity = "NaN"):
         """
@@ -81,27 +317,27 @@ class TrainTrack:
             location = "Top"
         
         
-        if len(self.carts_on_track) == 0:# The max function doesn't like empty arrays so in that case define it yourself.
+        if len(self.cart_queue) == 0:# If there are no carts define the highest and lowest cart yourself.
             max_cart = 0
             min_cart = self.track_length
         else:
-            max_cart = max(self.carts_on_track)# The position of the highest cart on the track.
-            min_cart = min(self.carts_on_track)# The position of the lowest cart on the track.
+            max_cart = self.get_highest_cart()# The position of the highest cart on the track.
+            min_cart = self.get_lowest_cart()# The position of the lowest cart on the track.
         
         if (location == "Top" and (self.track_length - max_cart) > self.minimal_distance) or (location == "Bottom" and min_cart > self.minimal_distance):# Checks if the minimal distance can be kept when adding a cart.
             
-            self.velocity = np.sign(self.velocity) * np.sqrt(len(self.carts_on_track) * self.velocity**2 / (len(self.carts_on_track) + 1))# The new velocity based on the conservation of energy.
+            self.velocity = np.sign(self.velocity) * np.sqrt(len(self.cart_queue) * self.velocity**2 / (len(self.cart_queue) + 1))# The new velocity based on the conservation of energy.
             
             if location == "Top":
                 if self.carts_of_track["Top"] > 0:# Checks if there is a cart available on top.
-                    self.carts_on_track.append(self.track_length)# Adds a cart to the top.
+                    self.cart_queue.append(self.track_length - self.displacement)# Adds a cart to the top (which is the back of the queue since it is the highest cart).
                     self.carts_of_track["Top"] = self.carts_of_track["Top"] - 1# Remove a cart.
                     return True
                 else:
                     return False
             elif location == "Bottom":
                 if self.carts_of_track["Bottom"] > 0:# Checks if there is a cart available on the bottom
-                    self.carts_on_track.append(0)# Adds a cart to the bottom.
+                    self.cart_queue.appendleft(0 - self.displacement)# Adds a cart to the bottom (the front of the queue).
                     self.carts_of_track["Bottom"] = self.carts_of_track["Bottom"] - 1# Remove a cart.
                     return True
                 else:
@@ -115,20 +351,55 @@ class TrainTrack:
         This function removes a cart and then adds the amount of kinetic energy to the output power.
         
         delta_time is the time step size.
-        index is the index of the cart you want to remove.
+        index is the index of the cart you want to remove. The carts are ordered from low to high so 0 is the lowest cart and -1 the highest cart, removing those is O(1).
         """
         
-        if self.carts_on_track[index] > self.track_length / 2:# Determines the location of the cart, generally should be very obvious (either completely at the top or completley at the bottom) but this function also allows for half way removal (altrough that doesn't make physics sense).
+        if index == 0:
+            position = self.cart_queue.popleft() + self.displacement# Removes that cart.
+        elif index == -1 or index == len(self.cart_queue) - 1:
+            position = self.cart_queue.pop() + self.displacement
+        else:
+            position = self.cart_queue.remove(index) + self.displacement
+        
+        if position > self.track_length / 2:# Determines the location of the cart, generally should be very obvious (either completely at the top or completley at the bottom) but this function also allows for half way removal (altrough that doesn't make physics sense).
             location = "Top"
-        elif self.carts_on_track[index] <= self.track_length / 2:
+        elif position <= self.track_length / 2:
             location = "Bottom"
         
         energy_left_over = self.get_kinetic_energy_per_cart()# Gets how much energy is left.
         self.other_power = self.other_power -  energy_left_over / delta_time# Adds the energy to other power.
         
-        self.carts_on_track.pop(index)# Removes that cart.
         self.carts_of_track[location] = self.carts_of_track[location] + 1# Adds the cart to the stockpile.
     
+    def remove_carts_off_track(self, delta_time, replace = True):
+        """
+        Removes all the carts which have gone past the bottom or the top of the track. Because the carts are ordered only the ends of the queue have to be checked, so it takes O(1) per removed cart instead of searching the entire track.
+        
+        delta_time is the time step size.
+        replace is a boolean which decides if a new cart is added at the other end of the track for each removed cart (if possible).
+        
+        The carts are removed and replaced one after the other in the same order as removing them one at a time would, since adding a cart changes the velocity (and thus the kinetic energy of the next removed cart) this keeps other_power exactly the same. Returns the amount of removed carts.
+        """
+        
+        amount_removed = 0
+        
+        while len(self.cart_queue) > 0:
+            if self.get_side_off_track(0) == "Bottom":# The lowest cart is the only one that can have gone past the bottom first.
+                self.remove_cart(delta_time, 0)
+                new_location = "Top"
+            elif self.get_side_off_track(-1) == "Top":# And the highest cart the only one that can have gone past the top first.
+                self.remove_cart(delta_time, -1)
+                new_location = "Bottom"
+            else:# All the carts are on the track.
+                break
+            
+            amount_removed = amount_removed + 1
+            
+            if replace:
+                self.add_cart(new_location)
+        
+        return amount_removed
+    
     def get_power(self):
         """
         Gets the amount of power that the track generates. Both based on the generator and the other sources of power
@@ -151,14 +422,14 @@ class TrainTrack:
         
         self.other_power = 0#Reset the other power to zero. It could be considered to make a exponential decay of this such that the size of delta_time thus doesn't influence the behavior of other power.
         
-        if len(self.carts_on_track) == 0:# Prevent devide by zero error
-            acceleration = 0
+        acceleration = self.get_acceleration()# Calculate the acceleration.
+        
+        if len(self.cart_queue) == 0:# Without carts there is no movement.
             self.velocity = 0
-        else:
-            acceleration = (self.get_gravity() + self.get_friction() + self.force_of_generator) / (len(self.carts_on_track) * self.mass_per_cart)# Calculate the acceleration.
+            self.displacement = 0# Without carts the displacement can be reset, this keeps the numbers small.
         
         change_in_position = self.velocity * delta_time + 0.5 * acceleration * delta_time**2# Do the kinematics of the position.
-        self.carts_on_track = [current_position_of_cart + change_in_position for current_position_of_cart in self.carts_on_track]# Change the position of each of the carts.
+        self.displacement = self.displacement + change_in_position# All carts move the same distance so only the shared displacement has to change.
         self.velocity = self.velocity + acceleration * delta_time
     
     def get_efficiency_generator(self):
@@ -184,7 +455,7 @@ class TrainTrack:
 """
 train_track = TrainTrack()
 time = 0
-train_track.carts_on_track.append(train_track.track_length-1000)
+train_track.carts_on_track = [train_track.track_length-1000]
 
 for i in range(10):
     print(time, train_track.return_data())
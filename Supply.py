@@ -3,71 +3,128 @@ import pandas as pd
 import datetime
 import math
 
+from Helpers import interpolate_rows
+from Profiles import load_shared_profile, get_cached_profile_directory, save_cached_profile, is_cached
+
+def get_wind_power(wind_speed, air_density = 1.225, power_coefficient = 0.3, swept_area = 5027, rated_power = 2 * 10**6):
+    """
+    The power curve of a single windmill: the power (in watts) for the given wind speed (in m/s, or an array of them), capped at the rated power.
+    
+    air_density is in kg/m^3.
+    power_coefficient is the fraction of the power in the wind that the windmill gets out of it.
+    swept_area is the area of the rotor in m^2.
+    rated_power is the maximum power of the windmill in watts.
+    """
+    
+    return np.minimum(1/2 * air_density * power_coefficient * swept_area * wind_speed**3, rated_power)
+
+def read_windspeeds_profile(windspeeds_profile):
+    """
+    Reads a file with wind speeds (an hourly KNMI file like wind_speed_ijmuiden.txt) into a dataframe with the start time of each hour, the time since the first hour (in seconds and days) and the wind speed in m/s.
+    """
+    
+    data = pd.read_csv(windspeeds_profile)
+    data["Start time"] = pd.to_datetime(data["date"], format="%Y%m%d")
+    data["Start time"] = data["Start time"] + pd.to_timedelta(data["hour"].astype(float), unit = "h")
+    data["wind speed"] = data["wind speed"] * 0.1
+    #data["max wind speed"] = data["max wind speed"] * 0.1        
+    start_time = data["Start time"][0]
+    
+    time_since_start = data["Start time"] - start_time
+    data["Seconds"] = time_since_start.dt.total_seconds()
+    data["Days"] = data["Seconds"] / (3600 * 24)
+    
+    return data
+
 class WindSupply:
     """
     This class will calculate the poweroutput form windmills with the windspeeds in the database
     """
-    def __init__(self, amount_of_windmills = 60, windspeeds_profile = "wind_speed_ijmuiden.txt"):
+    def __init__(self, amount_of_windmills = 60, windspeeds_profile = "wind_speed_ijmuiden.txt", shared_profile = None, cache_directory = None, air_density = 1.225, power_coefficient = 0.3, swept_area = 5027, rated_power = 2 * 10**6, yearly_energy_per_windmill = 435 * 10**9 / 60):
+        """
+        The init function.
         
-        data = pd.read_csv(windspeeds_profile)
-        data["Start time"] = pd.to_datetime(data["date"], format="%Y%m%d")
-        data["Start time"] = [data["Start time"][i] + datetime.timedelta(hours = float(data["hour"][i])) for i in range(len(data["Start time"]))]
-        data["wind speed"] = data["wind speed"] * 0.1
-        #data["max wind speed"] = data["max wind speed"] * 0.1        
-        start_time = data["Start time"][0]
+        amount_of_windmills is the amount of windmills in the park.
+        windspeeds_profile is the name of the file with the wind speeds.
+        air_density, power_coefficient, swept_area and rated_power are the parameters of the power curve of a windmill, see get_wind_power.
+        yearly_energy_per_windmill is the energy (in Wh) a windmill is expected to make in a year, only used for the calibrated output in data.
+        shared_profile is a SharedProfile (see Profiles.py) published from another WindSupply object, or its directory. If given the profile is not read from the file but the shared arrays are used (read only, without copying them). There is no dataframe then, so data is None.
+        cache_directory is the directory of the profile cache (see Profiles.py), if given the processed profile is stored there the first time and memory mapped from there afterwards (like a shared profile, so data is None then). If None there is no caching.
+        """
         
         self.amount_of_windmills = amount_of_windmills
+        cached_directory = None
+        
+        if shared_profile is None and cache_directory is not None:
+            cached_directory = get_cached_profile_directory(cache_directory, "WindSupply", windspeeds_profile, {"air_density" : float(air_density), "power_coefficient" : float(power_coefficient), "swept_area" : float(swept_area), "rated_power" : float(rated_power)})
+            
+            if is_cached(cached_directory):
+                shared_profile = cached_directory
         
-        time_since_start = data["Start time"] - start_time
-        data["Seconds"] = [time.total_seconds() for time in time_since_start]
-        data["Days"] = data["Seconds"] / (3600 * 24)
-             
-        ρ = 1.225# Air density in kg/m^3 
-        Cp = 0.3# Power efficiency factor
-        A = 5027# Sweep area in m^2
-        K = 0# Efficiency difference land sea
-        T = 60# Amount of windmills in the park
-        year_amount = 435 * 10**9# wh per year in the park
+        if shared_profile is not None:
+            arrays, metadata = load_shared_profile(shared_profile, "WindSupply")
+            
+            self.data = None
+            self.seconds = arrays["seconds"]
+            self.power = arrays["power"]
+            return
         
-        hour_amount = year_amount / (365 * 24 * T) #wh per hour
+        data = read_windspeeds_profile(windspeeds_profile)
         
-        data["output"] = 1/2 * ρ * Cp * A * (data["wind speed"])**3 #calculating the power output in watt for each given windspeed.
+        hour_amount = yearly_energy_per_windmill / (365 * 24) #wh per hour
         
-        data.loc[(data.output > 2000000),'output'] = 2000000
+        data["output"] = get_wind_power(data["wind speed"], air_density, power_coefficient, swept_area, rated_power)#calculating the power output in watt for each given windspeed.
         
-        K = hour_amount / data["output"].mean()
-        data["output_adjusted"] = K * 1.33 * 1/2 * ρ * Cp * A * (data["wind speed"])**3 #calculating the power output in watt for each given windspeed.
-        data.loc[(data.output_adjusted > 2000000),'output_adjusted'] = 2000000
+        K = hour_amount / data["output"].mean()# Efficiency difference land sea
+        data["output_adjusted"] = get_wind_power(data["wind speed"], K * 1.33 * air_density, power_coefficient, swept_area, rated_power)#calculating the power output in watt for each given windspeed.
         
         self.data = data
+        self.seconds = data["Seconds"].to_numpy(dtype = float)# Plain arrays of the columns needed for the interpolation, indexing these is a lot faster than indexing the dataframe.
+        self.power = data["output"].to_numpy(dtype = float)
+        
+        if cached_directory is not None:
+            save_cached_profile(self, cached_directory)
+    
+    def get_profile_arrays(self):
+        """
+        Returns the arrays that are needed to calculate the output (and an empty dictionary of other information), used to publish them as a SharedProfile. The amount of windmills is not part of it, so objects with a different amount can share a profile.
+        """
+        
+        return {"seconds" : self.seconds, "power" : self.power}, {}
     
     def output(self, time_seconds, time_days = 0):
         """
-        Based on the data in the households object it returns the amount power used. It uses linear interpolation between points to preserve continuity.
+        Based on the data in the windsupply object it returns the amount of power generated. It uses linear interpolation between points to preserve continuity.
         
-        time_seconds is a number in seconds, which can be more than a day, is the time of which you want to know the power usage.
-        time_days is a number in days which gets converted to second and then added to time in seconds.
-        only_total is a boolean which decided if you want to have results split into categories or if you want just the total power usage.
+        time_seconds is a number in seconds, which can be more than a day, is the time of which you want to know the power output. It can also be a (numpy) array of times, then an array with the output at each of those times is returned.
+        time_days is a number (or array) in days which gets converted to second and then added to time in seconds.
         """
         
-        estimated_row_bot = math.floor(time_seconds / (3600) + time_days * 24)# Makes an estimate for which row the data is in we are searching for.
+        time_seconds = np.asarray(time_seconds, dtype = float)
+        time_days = np.asarray(time_days, dtype = float)
+        
+        estimated_row_bot = np.floor(time_seconds / (3600) + time_days * 24)# Makes an estimate for which row the data is in we are searching for.
         wanted_time = time_seconds + time_days * 3600 * 24
         
-        # print("Getting consumption at estimated index", estimated_row_bot)
-        if not (self.data["Seconds"][estimated_row_bot] <= wanted_time and self.data["Seconds"][estimated_row_bot + 1] >= wanted_time):# Checks if the estimate row is correct.
-            #print("Attention for time", wanted_time / (3600 * 24), "(d) the rows are not predicatable anymore.")
-            
-            if self.data["Seconds"][estimated_row_bot] > wanted_time:# If estimate is incorrect determine if to high or to low.
-                direction = -1
-            else:
-                direction = 1
-            
-            while not (self.data["Seconds"][estimated_row_bot] <= wanted_time and self.data["Seconds"][estimated_row_bot + 1] >= wanted_time):# Until the correct row is found go lower or higher.
-                estimated_row_bot = estimated_row_bot + direction
+        output = self.amount_of_windmills * interpolate_rows(self.seconds, self.power, wanted_time, estimated_row_bot)# The rows are found with a binary search (only if the estimate is wrong).
+        
+        return output[()]# Turns a zero dimensional array back into a number if a single time was given.
+    
+    def compile(self, times):
+        """
+        Gets the power output for an entire array of times (in seconds) at once.
+        """
+        
+        return self.output(np.asarray(times, dtype = float))
+    
+    def get_next_breakpoint(self, time_seconds):
+        """
+        Gets the first time (in seconds) after the given time at which there is a data point in the profile. Between data points the output is linear. Returns infinity after the last data point.
+        """
         
-        interpolation_factor = (wanted_time - self.data["Seconds"][estimated_row_bot]) / (self.data["Seconds"][estimated_row_bot + 1] - self.data["Seconds"][estimated_row_bot]) # time_difference_for_bot_point / time_difference_between_points
+        index = np.searchsorted(self.seconds, time_seconds, side = "right")
         
-        return self.amount_of_windmills * (self.data["output"][estimated_row_bot] + interpolation_factor * (self.data["output"][estimated_row_bot + 1] - self.data["output"][estimated_row_bot]))
+        return self.seconds[index] if index < len(self.seconds) else np.inf
 
 
 class WindSupplyDummy:
@@ -79,21 +136,125 @@ class WindSupplyDummy:
     
     def output(self, time_seconds, time_days = 0, average_power = 3500 * 3.6*10**6 / (365 * 24 * 3600)):
         
+        time_seconds = np.asarray(time_seconds, dtype = float)# So that lists and arrays of times also work.
+        time_days = np.asarray(time_days, dtype = float)
+        
         day_factor = np.cos(2 * np.pi * time_days / 360)
         
         return self.multiplication * average_power * (1 - 0.5 * np.sin(2 * np.pi * time_seconds / (24 * 3600)) + 0.25 * day_factor)
+    
+    def compile(self, times):
+        """
+        Gets the power output for an entire array of times (in seconds) at once.
+        """
+        
+        return self.output(np.asarray(times, dtype = float))
+    
+    def get_next_breakpoint(self, time_seconds):
+        """
+        The dummy is a smooth function without data points, so this is always infinity.
+        """
+        
+        return np.inf
+
+
+class CompositeSupply:
+    """
+    A supply made of any number of other supplies (for example several wind parks with their own profiles, or other generators), which are added up. With a resolution the total is calculated once for the entire horizon as a single series, so asking the supply during the simulation costs the same no matter how many sources there are. The contribution of each source is kept as well, see get_contributions.
+    """
+    def __init__(self, sources, names = None, resolution = None, end_time = 365 * 24 * 3600):
+        """
+        The init function.
+        
+        sources is a list of supply objects (with output and compile functions, like WindSupply).
+        names is a list with a name for each source, if None they are numbered.
+        resolution is the time (in seconds) between the points of the precomputed series. Use the delta_time of the simulation, then every tick is exactly on a point of the series. If None nothing is precomputed and the sources are added up each time.
+        end_time is the time (in seconds) until which the series is precomputed, after it the sources are added up each time.
+        """
+        
+        self.sources = list(sources)
+        self.names = [str(i) for i in range(len(self.sources))] if names is None else list(names)
+        self.resolution = resolution
+        self.data = None
+        
+        if len(self.names) != len(self.sources):
+            raise ValueError("CompositeSupply needs a name for each source.")
+        
+        if resolution is not None:
+            self.seconds = np.arange(0, end_time + resolution, resolution, dtype = float)
+            self.contributions = np.stack([np.asarray(source.compile(self.seconds), dtype = float) for source in self.sources], axis = 1)# A row per point of the series and a column per source.
+            self.power = self.add_up(self.contributions)
+    
+    def add_up(self, contributions):
+        """
+        Adds up the contributions of the sources (the last axis), one after the other so the rounding is always the same.
+        """
+        
+        total = 0
+        for i in range(len(self.sources)):
+            total = total + contributions[..., i]
+        
+        return total
+    
+    def get_contributions(self, time_seconds, time_days = 0):
+        """
+        Gets the power output of each source, as a dictionary with the name of the source as key. For an array of times each value is an array.
+        """
+        
+        time_seconds = np.asarray(time_seconds, dtype = float)
+        time_days = np.asarray(time_days, dtype = float)
+        
+        return {name : source.output(time_seconds, time_days) for name, source in zip(self.names, self.sources)}
+    
+    def output(self, time_seconds, time_days = 0):
+        """
+        Gets the total power output of the sources, see WindSupply.output.
+        """
+        
+        time_seconds = np.asarray(time_seconds, dtype = float)
+        time_days = np.asarray(time_days, dtype = float)
+        wanted_time = time_seconds + time_days * 3600 * 24
+        
+        if self.resolution is None or np.any(wanted_time > self.seconds[-1]) or np.any(wanted_time < 0):
+            output = self.add_up(np.stack([np.asarray(source.output(wanted_time), dtype = float) for source in self.sources], axis = -1))
+        else:
+            output = interpolate_rows(self.seconds, self.power, wanted_time, np.floor(wanted_time / self.resolution))
+        
+        return output[()]
+    
+    def compile(self, times):
+        """
+        Gets the power output for an entire array of times (in seconds) at once.
+        """
+        
+        return self.output(np.asarray(times, dtype = float))
+    
+    def get_next_breakpoint(self, time_seconds):
+        """
+        Gets the first time after the given time at which the output can bend, the first of those of the sources. With a precomputed series that is the point of the series around the first breakpoint of the sources (the series is linear between its points, so it only bends at the points next to a breakpoint of a source), or the end of the series.
+        """
+        
+        if self.resolution is None or time_seconds >= self.seconds[-1]:
+            return min(source.get_next_breakpoint(time_seconds) for source in self.sources)
+        
+        point = np.floor(time_seconds / self.resolution) * self.resolution# The point of the series at or before the given time, the series is linear from it to the next point.
+        breakpoint = min(source.get_next_breakpoint(point) for source in self.sources)
+        
+        if breakpoint == np.inf:
+            return self.seconds[-1]
+        
+        next_point = (np.floor((breakpoint - self.resolution) / self.resolution) + 1) * self.resolution# The first point of the series after breakpoint - resolution, the series bends there.
+        
+        return min(max(next_point, point + self.resolution), self.seconds[-1])
 
-from mpl_toolkits.mplot3d import axes3d
-from matplotlib import pyplot
-from matplotlib import cm
-from Helpers import make_3Dfunction_plot
+from Helpers import make_3Dfunction_plot# Only imports matplotlib when a plot is made.
 
 
 """
 wind_supply = WindSupply()
-make_3Dfunction_plot(wind_supply.output, zlabel = "Power (Watts)")
+make_3Dfunction_plot(wind_supply.output, zlabel = "Power (Watts)", vectorized = True)
 
 wind_supply = WindSupplyDummy()
-make_3Dfunction_plot(wind_supply.output, zlabel = "Power (Watts)")
+make_3Dfunction_plot(wind_supply.output, zlabel = "Power (Watts)", vectorized = True)
 #"""
 
@@ -0,0 +1,424 @@
+import pandas as pd
+import numpy as np
+import argparse
+import itertools
+import sys
+import time
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+from Supply import WindSupply
+from Supply import WindSupplyDummy
+from Demand import Households
+from Demand import HouseholdsDummy
+from Storage import TrainTrack
+from Controller import Controller
+from Recorder import SummaryRecorder
+from Profiles import SharedProfile
+from Ensemble import Ensemble
+
+SUPPLY_CLASSES = {"WindSupply" : WindSupply, "WindSupplyDummy" : WindSupplyDummy}
+DEMAND_CLASSES = {"Households" : Households, "HouseholdsDummy" : HouseholdsDummy}
+PARTS = ["train_track", "supply", "demand", "controller"]# The parts of a scenario that contain the parameters of an object.
+TIMEOUT_GRACE = 5# The amount of seconds after its timeout that a scenario is stopped by run_sweep, so a scenario that checks its timeout itself (see run_scenario) can still report it.
+
+def make_grid(train_track = {}, supply = {}, demand = {}, controller = {}, **settings):
+    """
+    Makes a list of scenarios with every combination of the given parameter values.
+    
+    train_track, supply, demand and controller are dictionaries with for each parameter (of the init function of that object) a list of values to try.
+    settings are the other settings of a scenario (see run_scenario), each also given as a list of values.
+    
+    For example make_grid(train_track = {"carts" : [10000, 20000]}, supply = {"amount_of_windmills" : [40, 60]}, days = [364]) gives 4 scenarios.
+    """
+    
+    options = []
+    
+    for part, parameters in zip(PARTS, [train_track, supply, demand, controller]):
+        for name, values in parameters.items():
+            options.append(((part, name), values))
+    
+    for name, values in settings.items():
+        options.append(((None, name), values))
+    
+    scenarios = []
+    
+    for combination in itertools.product(*[values for key, values in options]):
+        scenario = {part : {} for part in PARTS}
+        
+        for ((part, name), value) in zip([key for key, values in options], combination):
+            if part is None:
+                scenario[name] = value
+            else:
+                scenario[part][name] = value
+        
+        scenarios.append(scenario)
+    
+    return scenarios
+
+def get_summary(data, delta_time, stride = 1):
+    """
+    Calculates the summary of a run from its recorded data.
+    
+    data is a dictionary (or dataframe) with the recorded columns.
+    delta_time is the time step size.
+    stride is the stride of the recorder (see Recorder.Recorder), each recorded row then stands for stride ticks. The summary is then an estimate from the recorded ticks, a SummaryRecorder gives the exact one.
+    """
+    
+    difference = np.asarray(data["Difference"])
+    losses = np.asarray(data["Losses"])
+    
+    return {"Unmet energy (kWh)" : -np.sum(np.minimum(difference, 0)) * delta_time * stride / (3.6 * 10**6),# Negative difference is a shortage of power.
+            "Mean satisfaction" : np.mean(data["Satisfaction"]) if len(difference) > 0 else np.nan,
+            "Losses (kWh)" : np.sum(losses) * stride / (3.6 * 10**6),# The losses are recorded as the energy lost during a tick.
+            "Peak velocity" : np.max(np.abs(data["Velocity"])) if len(difference) > 0 else np.nan}
+
+def make_result_row(scenario, index, summary, status, run_time):
+    """
+    Makes the row of the summary table of a sweep for a scenario, with its parameters (as part.name columns), its summary, status and run time.
+    """
+    
+    row = {"Scenario" : index}
+    
+    for part in PARTS:
+        for name, value in scenario.get(part, {}).items():
+            row[part + "." + name] = value if np.isscalar(value) else str(value)
+    
+    for name, value in scenario.items():
+        if name not in PARTS:
+            row[name] = value
+    
+    row.update(summary)
+    row["Status"] = status
+    row["Run time (s)"] = run_time
+    
+    return row
+
+def make_controller(scenario, recorder = None):
+    """
+    Builds the controller of a scenario (see run_scenario) with its train track, supply and demand and the settings of the controller.
+    
+    recorder is the recorder of the controller, if None it gets a normal Recorder.
+    """
+    
+    train_track = TrainTrack(**scenario.get("train_track", {}))
+    supply = SUPPLY_CLASSES[scenario.get("supply_class", "WindSupply")](**scenario.get("supply", {}))
+    demand = DEMAND_CLASSES[scenario.get("demand_class", "Households")](**scenario.get("demand", {}))
+    controller = Controller(train_track = train_track, supply = supply, demand = demand, recorder = recorder, **scenario.get("controller", {}))
+    
+    for setting in ["max_speed", "max_acceleration", "allow_new_carts"]:
+        if setting in scenario:
+            setattr(controller, setting, scenario[setting])
+    
+    return controller
+
+def run_scenario(scenario, keep_data = False):
+    """
+    Builds and simulates a single scenario and returns its summary. This is the function that runs in the worker processes.
+    
+    scenario is a dictionary with:
+        train_track, supply, demand and controller: dictionaries with the parameters for the init functions of those objects (controller only gets the delta_time and such, not the other objects).
+        supply_class and demand_class: the names of the supply and demand classes (default WindSupply and Households).
+        days: the amount of days to simulate (default 364).
+        warm_up: the amount of seconds that are simulated first to stabilize the system, these are not part of the summary (default 3600).
+        timeout: the maximum amount of seconds the run may take, if it takes longer a TimeoutError is raised (default no limit).
+        max_speed, max_acceleration and allow_new_carts: settings of the controller.
+        summary_only: if True (the default) the data of each tick is not kept, only the running statistics of a SummaryRecorder, so a worker uses a few kilobytes instead of hundreds of megabytes for a year. The summary then also has the other statistics of SummaryRecorder.get_summary.
+    keep_data is a boolean which decides if the recorded data (without the warm up) is returned as well, as a tuple of the summary and the data. summary_only is then ignored.
+    """
+    
+    start = time.monotonic()
+    timeout = scenario.get("timeout", None)
+    
+    summary_only = scenario.get("summary_only", True) and not keep_data
+    controller = make_controller(scenario, SummaryRecorder() if summary_only else None)
+    
+    warm_up = scenario.get("warm_up", 3600)
+    end_time = warm_up + scenario.get("days", 364) * 24 * 3600
+    
+    controller.compile_profiles(end_time)
+    controller.simulate(warm_up)
+    
+    if summary_only:
+        controller.recorder.reset()
+    else:
+        warm_up_rows = controller.recorder.cursor
+    
+    while controller.time <= end_time:# Simulate a day at a time so that the timeout can be checked.
+        controller.simulate(min(controller.time + 24 * 3600, end_time))
+        
+        if timeout is not None and time.monotonic() - start > timeout:
+            raise TimeoutError("Scenario took longer than " + str(timeout) + " seconds.")
+    
+    if summary_only:
+        return controller.recorder.get_summary(controller.time)
+    
+    data = {column : values[warm_up_rows:] for column, values in controller.data.items()}
+    summary = get_summary(data, controller.delta_time)
+    
+    return (summary, data) if keep_data else summary
+
+def run_scenario_safely(scenario):
+    """
+    Runs a scenario (see run_scenario) but catches any error so that it can be reported instead. Returns the summary, the status and the run time.
+    """
+    
+    start = time.monotonic()
+    
+    try:
+        return run_scenario(scenario), "ok", time.monotonic() - start
+    except TimeoutError:
+        return {}, "timeout", time.monotonic() - start
+    except Exception as error:
+        return {}, "failed: " + repr(error), time.monotonic() - start
+
+def share_profiles(scenarios):
+    """
+    Publishes the profiles that the scenarios use as shared profiles (see Profiles.py), each different profile only once. Returns a list with copies of the scenarios that use the shared profiles and a list of the SharedProfile objects (which should be closed when the scenarios are done).
+    
+    The wind profile is shared between all scenarios with the same profile file and power curve (the amount of windmills doesn't matter). The households profile is normalised, so it is shared between all scenarios with the same profile file (the mix of households doesn't matter either). If publishing a profile fails the scenario is left as it is, so the error is reported when the scenario itself is run.
+    """
+    
+    published = {}
+    shared_scenarios = []
+    
+    def publish(key, make_source):
+        if key not in published:
+            try:
+                published[key] = SharedProfile(make_source())
+            except Exception:
+                published[key] = None
+        
+        return published[key]
+    
+    for scenario in scenarios:
+        scenario = dict(scenario)
+        supply = dict(scenario.get("supply", {}))
+        demand = dict(scenario.get("demand", {}))
+        
+        if scenario.get("supply_class", "WindSupply") == "WindSupply" and "shared_profile" not in supply:
+            profile_parameters = {name : value for name, value in supply.items() if name in ["windspeeds_profile", "cache_directory", "air_density", "power_coefficient", "swept_area", "rated_power"]}
+            shared_profile = publish(("WindSupply", repr(profile_parameters)), lambda: WindSupply(**profile_parameters))
+            
+            if shared_profile is not None:
+                supply["shared_profile"] = shared_profile.directory
+        
+        if scenario.get("demand_class", "Households") == "Households" and "shared_profile" not in demand:
+            profile_parameters = {name : value for name, value in demand.items() if name in ["profiel", "cache_directory"]}
+            shared_profile = publish(("Households", repr(profile_parameters)), lambda: Households(**profile_parameters))
+            
+            if shared_profile is not None:
+                demand["shared_profile"] = shared_profile.directory
+        
+        scenario["supply"] = supply
+        scenario["demand"] = demand
+        shared_scenarios.append(scenario)
+    
+    return shared_scenarios, [shared_profile for shared_profile in published.values() if shared_profile is not None]
+
+def stop_workers(executor):
+    """
+    Stops the worker processes of a ProcessPoolExecutor right away, also the ones that are still running a scenario. The futures that were still running fail with a BrokenProcessPool error.
+    
+    From python 3.14 on the executor can do this itself (terminate_workers). Before that there is no public way, so the processes are taken from its private _processes attribute, which is how it works in python 3.8 to 3.13 (tested on 3.11). If that attribute doesn't exist the pool is only shut down, then the stuck workers keep running in the background until they finish (the sweep itself still continues).
+    """
+    
+    if hasattr(executor, "terminate_workers"):
+        executor.terminate_workers()
+        return
+    
+    processes = list((getattr(executor, "_processes", None) or {}).values())
+    executor.shutdown(wait = False, cancel_futures = True)
+    
+    if not hasattr(executor, "_processes"):
+        print("The worker processes of the pool could not be found, stuck scenarios keep running in the background.", file = sys.stderr, flush = True)
+    
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+
+def run_sweep(scenarios, workers = None, timeout = None, progress = True, shared = True, cache = None):
+    """
+    Runs a list of scenarios (see make_grid and run_scenario) on a pool of processes and collects their summaries in a dataframe. A scenario that fails or takes too long gets its status in the table and does not stop the other scenarios.
+    
+    workers is the amount of processes, if None it is the amount of cpu's.
+    timeout is the maximum amount of seconds a single scenario may take, scenarios can also have their own timeout. A scenario checks it itself after each simulated day, and if it is still running TIMEOUT_GRACE seconds after its timeout (for example because a single day hangs) its worker is stopped and the pool is replaced. The other scenarios that were running are then started again.
+    progress is a boolean which decides if the progress is printed.
+    shared is a boolean which decides if the profiles are parsed once and shared with the workers (see share_profiles) instead of each scenario parsing them itself.
+    cache is a ResultCache.ResultCache (or None), scenarios with a cached result are not run again (their status is "cached") and the new results are stored in it.
+    """
+    
+    results = [None] * len(scenarios)
+    start = time.monotonic()
+    
+    def add_result(index, summary, status, run_time):
+        results[index] = make_result_row(scenarios[index], index, summary, status, run_time)
+        
+        if progress:
+            done = sum(result is not None for result in results)
+            print("[" + str(done) + "/" + str(len(scenarios)) + "] scenario " + str(index) + ": " + status + " after " + str(np.round(run_time, 1)) + " s (" + str(np.round(time.monotonic() - start, 1)) + " s total)", file = sys.stderr, flush = True)
+    
+    if cache is not None:
+        for index, scenario in enumerate(scenarios):
+            summary = cache.get(scenario)
+            
+            if summary is not None:
+                add_result(index, summary, "cached", 0.0)
+    
+    submitted, shared_profiles = share_profiles([scenario for index, scenario in enumerate(scenarios) if results[index] is None]) if shared else ([scenario for index, scenario in enumerate(scenarios) if results[index] is None], [])
+    indices = [index for index in range(len(scenarios)) if results[index] is None]
+    
+    pending = []
+    for index, scenario in zip(indices, submitted):
+        if timeout is not None and "timeout" not in scenario:
+            scenario = dict(scenario, timeout = timeout)
+        
+        pending.append((index, scenario))
+    
+    workers = workers if workers is not None else os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers = workers)
+    running = {}# The index, scenario, start time and deadline of each running future.
+    
+    try:
+        while len(pending) > 0 or len(running) > 0:
+            while len(pending) > 0 and len(running) < workers:# Only as many scenarios as workers are submitted, so a scenario starts when it is submitted and its deadline can be kept here.
+                index, scenario = pending.pop(0)
+                scenario_timeout = scenario.get("timeout", None)
+                submit_time = time.monotonic()
+                running[executor.submit(run_scenario_safely, scenario)] = (index, scenario, submit_time, np.inf if scenario_timeout is None else submit_time + scenario_timeout + TIMEOUT_GRACE)
+            
+            first_deadline = min(deadline for index, scenario, submit_time, deadline in running.values())
+            done, not_done = wait(running, timeout = None if first_deadline == np.inf else max(first_deadline - time.monotonic(), 0), return_when = FIRST_COMPLETED)
+            broken = False
+            
+            for future in done:
+                index, scenario, submit_time, deadline = running.pop(future)
+                
+                try:
+                    summary, status, run_time = future.result()
+                    add_result(index, summary, status, run_time)
+                    
+                    if cache is not None and status == "ok":
+                        cache.put(scenarios[index], summary)
+                except BrokenProcessPool:# Only happens if a worker process itself dies (for example when it runs out of memory).
+                    add_result(index, {}, "failed: worker process died", np.nan)
+                    broken = True
+            
+            now = time.monotonic()
+            expired = [future for future, (index, scenario, submit_time, deadline) in running.items() if deadline <= now]
+            
+            for future in expired:# The scenario is stuck inside a day (or a day is very slow), so its worker is stopped from here.
+                index, scenario, submit_time, deadline = running.pop(future)
+                add_result(index, {}, "timeout", now - submit_time)
+            
+            if broken or len(expired) > 0:# A single worker can't be stopped, so the pool is replaced and the other running scenarios start again.
+                pending = [(index, scenario) for index, scenario, submit_time, deadline in running.values()] + pending
+                running = {}
+                stop_workers(executor)
+                executor = ProcessPoolExecutor(max_workers = workers)
+    finally:
+        if len(running) > 0:# Only if an error stopped the sweep.
+            stop_workers(executor)
+        else:
+            executor.shutdown()
+        
+        for shared_profile in shared_profiles:
+            shared_profile.close()
+    
+    return pd.DataFrame(results)
+
+def run_ensemble_sweep(scenarios, progress = True):
+    """
+    Runs a list of scenarios (see make_grid and run_scenario) with the ensemble engine (see Ensemble.py) instead of a pool of processes. Scenarios that only differ in the train track and the controller settings (max_speed, max_acceleration and allow_new_carts) are simulated together as one ensemble, so a sizing sweep of many tracks costs about as much as a single vectorized run. Returns the same table as run_sweep, the run time of a scenario is the run time of its ensemble divided by the amount of scenarios in it. A timeout is not supported.
+    """
+    
+    groups = {}
+    
+    for index, scenario in enumerate(scenarios):
+        key = repr((scenario.get("supply_class", "WindSupply"), sorted(scenario.get("supply", {}).items()),
+                    scenario.get("demand_class", "Households"), sorted(scenario.get("demand", {}).items()),
+                    sorted(scenario.get("controller", {}).items()), scenario.get("days", 364), scenario.get("warm_up", 3600)))
+        groups.setdefault(key, []).append(index)
+    
+    results = [None] * len(scenarios)
+    
+    for number, indices in enumerate(groups.values()):
+        start = time.monotonic()
+        first = scenarios[indices[0]]
+        
+        try:
+            supply = SUPPLY_CLASSES[first.get("supply_class", "WindSupply")](**first.get("supply", {}))
+            demand = DEMAND_CLASSES[first.get("demand_class", "Households")](**first.get("demand", {}))
+            
+            settings = {setting : [scenarios[index].get(setting, default) for index in indices] for setting, default in [("max_speed", 10), ("max_acceleration", 1), ("allow_new_carts", True)]}
+            ensemble = Ensemble([TrainTrack(**scenarios[index].get("train_track", {})) for index in indices], supply, demand, delta_time = first.get("controller", {}).get("delta_time", 5), **settings)
+            
+            warm_up = first.get("warm_up", 3600)
+            end_time = warm_up + first.get("days", 364) * 24 * 3600
+            
+            ensemble.compile_profiles(end_time)
+            ensemble.simulate(warm_up)
+            ensemble.reset_summary()
+            ensemble.simulate(end_time)
+            
+            summaries = ensemble.get_summary().to_dict("records")
+            status = "ok"
+        except Exception as error:
+            summaries = [{}] * len(indices)
+            status = "failed: " + repr(error)
+        
+        run_time = (time.monotonic() - start) / len(indices)
+        
+        for index, summary in zip(indices, summaries):
+            results[index] = make_result_row(scenarios[index], index, summary, status, run_time)
+        
+        if progress:
+            print("[" + str(number + 1) + "/" + str(len(groups)) + "] ensemble of " + str(len(indices)) + " scenarios: " + status + " after " + str(np.round(run_time * len(indices), 1)) + " s", file = sys.stderr, flush = True)
+    
+    return pd.DataFrame(results)
+
+def main(arguments = None):
+    """
+    The command line interface of the sweep. Makes a grid of the given amounts of carts, households and windmills and runs it.
+    """
+    
+    parser = argparse.ArgumentParser(description = "Run a parameter sweep of the gravity storage simulation on multiple processes.")
+    parser.add_argument("--carts", type = float, nargs = "+", default = [30000], help = "Total amount of carts (half starts at the top and half at the bottom).")
+    parser.add_argument("--households", type = int, nargs = "+", default = [67000], help = "Amount of households (of the first type in the profile).")
+    parser.add_argument("--windmills", type = int, nargs = "+", default = [60], help = "Amount of windmills.")
+    parser.add_argument("--days", type = float, default = 364, help = "Amount of days to simulate.")
+    parser.add_argument("--delta-time", type = float, default = 10, help = "Time step size in seconds.")
+    parser.add_argument("--wind-profile", default = "wind_speed_ijmuiden.txt", help = "File with the wind speeds.")
+    parser.add_argument("--household-profile", default = "profielen Elektriciteit 2019 versie 1.00.csv", help = "NEDU profile file of the households.")
+    parser.add_argument("--profile-cache", default = None, help = "Directory in which the processed profiles are cached (default is no cache).")
+    parser.add_argument("--workers", type = int, default = None, help = "Amount of worker processes (default is the amount of cpu's).")
+    parser.add_argument("--timeout", type = float, default = None, help = "Maximum amount of seconds per scenario.")
+    parser.add_argument("--ensemble", action = "store_true", help = "Simulate the scenarios together with the ensemble engine instead of on multiple processes.")
+    parser.add_argument("--result-cache", default = None, help = "SQLite file in which the results are cached, scenarios that are in it are not run again (see ResultCache.py).")
+    parser.add_argument("--output", default = "sweep.csv", help = "File in which the summary table is saved.")
+    arguments = parser.parse_args(arguments)
+    
+    scenarios = make_grid(train_track = {"carts" : [carts / 2 for carts in arguments.carts]},
+                          supply = {"amount_of_windmills" : arguments.windmills, "windspeeds_profile" : [arguments.wind_profile], "cache_directory" : [arguments.profile_cache]},
+                          demand = {"amount_of_households_per_type" : [[households, 0, 0, 0, 0, 0, 0, 0, 0, 0] for households in arguments.households], "profiel" : [arguments.household_profile], "cache_directory" : [arguments.profile_cache]},
+                          controller = {"delta_time" : [arguments.delta_time]},
+                          days = [arguments.days])
+    
+    if arguments.ensemble:
+        summary = run_ensemble_sweep(scenarios)
+    elif arguments.result_cache is not None:
+        from ResultCache import ResultCache# Imported here since ResultCache itself imports this module.
+        
+        with ResultCache(arguments.result_cache) as cache:
+            summary = run_sweep(scenarios, workers = arguments.workers, timeout = arguments.timeout, cache = cache)
+    else:
+        summary = run_sweep(scenarios, workers = arguments.workers, timeout = arguments.timeout)
+    summary.to_csv(arguments.output, index = False)
+    print(summary)
+    
+    return summary
+
+if __name__ == "__main__":
+    main()
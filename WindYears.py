@@ -0,0 +1,239 @@
+import pandas as pd
+import numpy as np
+import argparse
+import sys
+import time
+
+from Helpers import interpolate_rows
+from Supply import read_windspeeds_profile, get_wind_power
+from Demand import Households
+from Storage import TrainTrack
+from Ensemble import Ensemble
+
+
+class WindYearGenerator:
+    """
+    Makes synthetic years of hourly wind speeds that are statistically like the measured year in a wind speed file, so the storage can be sized for many plausible years instead of the single measured one. All years are made at once as one array (a row per year).
+    
+    There are two methods:
+        bootstrap: a seasonal block bootstrap. The year is cut into blocks (of a day by default) and each block is replaced by the block of a random day at most window_days earlier or later, at the same time of day. So the daily pattern, the season and the correlation within a block are kept.
+        autoregressive: the square root of the wind speed is made standard normal with a mean and standard deviation per hour of the year (averaged over the same hour of the days within window_days), and the hour to hour correlation of that is modelled as an AR(1) process, from which new years are drawn.
+    """
+    def __init__(self, windspeeds_profile = "wind_speed_ijmuiden.txt", method = "bootstrap", block_length = 24, window_days = 15):
+        """
+        The init function, reads the wind speeds and fits the model.
+        
+        windspeeds_profile is the name of the file with the wind speeds (see Supply.read_windspeeds_profile), it has to be hourly and cover whole days.
+        method is either "bootstrap" or "autoregressive".
+        block_length is the amount of hours in a block of the bootstrap, a multiple of 24 keeps the daily pattern intact.
+        window_days is the amount of days around a day from which a block may be taken (bootstrap) or over which the mean and standard deviation are averaged (autoregressive).
+        """
+        
+        if method not in ["bootstrap", "autoregressive"]:
+            raise ValueError("Unknown method " + repr(method) + ", use bootstrap or autoregressive.")
+        
+        self.wind_speeds = read_windspeeds_profile(windspeeds_profile)["wind speed"].to_numpy(dtype = float)
+        self.hours = len(self.wind_speeds)
+        self.method = method
+        self.block_length = block_length
+        self.window_days = window_days
+        
+        if self.hours % 24 != 0:
+            raise ValueError("The wind speeds need to cover whole days, but there are " + str(self.hours) + " hours.")
+        
+        if method == "autoregressive":
+            self.fit_autoregressive()
+    
+    def get_seasonal_average(self, values):
+        """
+        Averages values (one per hour) over the same hour of the days within window_days of each day, the year is treated as circular.
+        """
+        
+        days = values.reshape(-1, 24)
+        window = 2 * self.window_days + 1
+        padded = np.concatenate([days[-self.window_days:], days, days[:self.window_days]]) if self.window_days > 0 else days
+        sums = np.concatenate([np.zeros((1, 24)), np.cumsum(padded, axis = 0)])
+        
+        return ((sums[window:] - sums[:-window]) / window).reshape(-1)
+    
+    def fit_autoregressive(self):
+        """
+        Fits the autoregressive model: the seasonal mean and standard deviation of the square root of the wind speed and the AR(1) coefficient of the normalised values.
+        """
+        
+        root = np.sqrt(self.wind_speeds)
+        self.mean = self.get_seasonal_average(root)
+        self.standard_deviation = np.sqrt(np.maximum(self.get_seasonal_average((root - self.mean)**2), 10**-6))
+        
+        normalised = (root - self.mean) / self.standard_deviation
+        self.coefficient = np.corrcoef(normalised[:-1], normalised[1:])[0, 1]# The correlation from one hour to the next.
+    
+    def generate(self, amount_of_years, seed = None):
+        """
+        Makes synthetic years of wind speeds. Returns an array with a row of hourly wind speeds (in m/s) per year, as long as the measured year.
+        
+        amount_of_years is the amount of years that is made.
+        seed is the seed (or a numpy Generator) of the random numbers, so the same seed always gives the same years.
+        """
+        
+        random = np.random.default_rng(seed)
+        
+        if self.method == "bootstrap":
+            amount_of_blocks = -(-self.hours // self.block_length)
+            shifts = 24 * random.integers(-self.window_days, self.window_days + 1, (amount_of_years, amount_of_blocks))# Only whole days, so each block keeps its time of day.
+            starts = np.arange(amount_of_blocks) * self.block_length + shifts
+            rows = (starts[..., np.newaxis] + np.arange(self.block_length)) % self.hours
+            
+            return self.wind_speeds[rows.reshape(amount_of_years, -1)[:, :self.hours]]
+        
+        noise = random.standard_normal((amount_of_years, self.hours))
+        normalised = np.empty((amount_of_years, self.hours))
+        normalised[:, 0] = noise[:, 0]
+        scale = np.sqrt(1 - self.coefficient**2)
+        
+        for hour in range(1, self.hours):# Each hour depends on the one before it, but all years are done at once.
+            normalised[:, hour] = self.coefficient * normalised[:, hour - 1] + scale * noise[:, hour]
+        
+        return np.maximum(self.mean + self.standard_deviation * normalised, 0)**2
+
+
+class WindYearsSupply:
+    """
+    The supply of a wind park for many (synthetic) years at once, with the same power curve as WindSupply. The output at a time is an array with the output of each year, so it can be used as the supply of an Ensemble with a configuration per year.
+    """
+    def __init__(self, wind_speeds, amount_of_windmills = 60, air_density = 1.225, power_coefficient = 0.3, swept_area = 5027, rated_power = 2 * 10**6):
+        """
+        The init function.
+        
+        wind_speeds is an array with a row of hourly wind speeds (in m/s) per year, for example from WindYearGenerator.generate. The first hour is at time 0.
+        amount_of_windmills is the amount of windmills in the park.
+        air_density, power_coefficient, swept_area and rated_power are the parameters of the power curve, see Supply.get_wind_power.
+        """
+        
+        wind_speeds = np.atleast_2d(np.asarray(wind_speeds, dtype = float))
+        
+        self.amount_of_windmills = amount_of_windmills
+        self.data = None
+        self.seconds = np.arange(wind_speeds.shape[1]) * 3600.0
+        self.power = np.ascontiguousarray(get_wind_power(wind_speeds, air_density, power_coefficient, swept_area, rated_power).T)# A row per hour and a column per year, so the rows are interpolated like the profile of WindSupply.
+    
+    def output(self, time_seconds, time_days = 0):
+        """
+        Gets the power output of each year, see WindSupply.output. The result has one extra (last) axis for the years.
+        """
+        
+        time_seconds = np.asarray(time_seconds, dtype = float)
+        time_days = np.asarray(time_days, dtype = float)
+        
+        estimated_row_bot = np.floor(time_seconds / (3600) + time_days * 24)
+        wanted_time = time_seconds + time_days * 3600 * 24
+        
+        return self.amount_of_windmills * interpolate_rows(self.seconds, self.power, wanted_time, estimated_row_bot)
+    
+    def compile(self, times):
+        """
+        Gets the power output of each year for an entire array of times (in seconds) at once, as an array with a row per time and a column per year.
+        """
+        
+        return self.output(np.asarray(times, dtype = float))
+    
+    def get_next_breakpoint(self, time_seconds):
+        index = np.searchsorted(self.seconds, time_seconds, side = "right")
+        
+        return self.seconds[index] if index < len(self.seconds) else np.inf
+
+
+def run_monte_carlo(generator, demand, train_track = {}, amount_of_years = 100, batch_size = 500, amount_of_windmills = 60, delta_time = 10, days = 364, warm_up = 3600, percentiles = [5, 25, 50, 75, 95], seed = 0, progress = True):
+    """
+    Simulates the storage for many synthetic wind years and reports the percentiles of the summary (see Ensemble.get_summary). The years are simulated in batches, each batch as one Ensemble with a configuration per year, and the supply and demand are compiled a day at a time so the memory use doesn't depend on the length of the run.
+    
+    generator is a WindYearGenerator.
+    demand is the demand object (for example Households), the same for all years.
+    train_track is a dictionary with the parameters of TrainTrack.
+    amount_of_years is the amount of synthetic years.
+    batch_size is the amount of years simulated at once. The cost of a tick of an ensemble hardly depends on its size, so large batches are a lot faster (as long as they fit in memory).
+    amount_of_windmills is the amount of windmills in the park.
+    delta_time is the time step size.
+    days is the amount of days that are simulated (after the warm up), at most the length of the measured year.
+    warm_up is the amount of seconds that are simulated first to stabilize the system, these are not part of the summary.
+    percentiles are the percentiles that are reported.
+    seed is the seed of the random numbers of the generator.
+    progress is a boolean which decides if the progress is printed.
+    
+    Returns a dictionary with the summary of each year (a dataframe with a row per year) and the percentiles (a dataframe with a row per percentile).
+    """
+    
+    random = np.random.default_rng(seed)
+    end_time = warm_up + days * 24 * 3600
+    start = time.monotonic()
+    summaries = []
+    
+    if end_time > (generator.hours - 1) * 3600:
+        raise ValueError("The synthetic years are only " + str(generator.hours) + " hours long, so at most " + str(((generator.hours - 1) * 3600 - warm_up) / (24 * 3600)) + " days can be simulated.")
+    
+    for first_year in range(0, amount_of_years, batch_size):
+        amount = min(batch_size, amount_of_years - first_year)
+        supply = WindYearsSupply(generator.generate(amount, random), amount_of_windmills)
+        ensemble = Ensemble([TrainTrack(**train_track) for year in range(amount)], supply, demand, delta_time = delta_time)
+        
+        while ensemble.time <= end_time:
+            day_end = min(ensemble.time + 24 * 3600, end_time)
+            
+            if ensemble.time <= warm_up:
+                day_end = min(day_end, warm_up)
+            
+            ensemble.compile_profiles(day_end)# One day at a time, a compiled profile has a column per year.
+            ensemble.simulate(day_end)
+            
+            if day_end == warm_up:
+                ensemble.reset_summary()
+        
+        summaries.append(ensemble.get_summary())
+        
+        if progress:
+            print("[" + str(first_year + amount) + "/" + str(amount_of_years) + "] years after " + str(np.round(time.monotonic() - start, 1)) + " s", file = sys.stderr, flush = True)
+    
+    years = pd.concat(summaries, ignore_index = True)
+    years.index.name = "Year"
+    
+    table = years.quantile(np.asarray(percentiles) / 100)
+    table.index = pd.Index(percentiles, name = "Percentile")
+    
+    return {"Years" : years, "Percentiles" : table}
+
+def main(arguments = None):
+    """
+    The command line interface, runs a Monte Carlo study with synthetic wind years and prints the percentiles.
+    """
+    
+    parser = argparse.ArgumentParser(description = "Monte Carlo study of the storage with synthetic wind years.")
+    parser.add_argument("--years", type = int, default = 100, help = "Amount of synthetic years.")
+    parser.add_argument("--batch-size", type = int, default = 500, help = "Amount of years simulated at once.")
+    parser.add_argument("--method", default = "bootstrap", choices = ["bootstrap", "autoregressive"], help = "The method of the wind year generator.")
+    parser.add_argument("--days", type = float, default = 364, help = "Amount of days to simulate.")
+    parser.add_argument("--carts", type = float, default = 30000, help = "Total amount of carts (half starts at the top and half at the bottom).")
+    parser.add_argument("--windmills", type = int, default = 60, help = "Amount of windmills.")
+    parser.add_argument("--households", type = int, default = 67000, help = "Amount of households (of the first type).")
+    parser.add_argument("--delta-time", type = float, default = 10, help = "The time step size.")
+    parser.add_argument("--wind-profile", default = "wind_speed_ijmuiden.txt", help = "File with the measured wind speeds.")
+    parser.add_argument("--household-profile", default = "profielen Elektriciteit 2019 versie 1.00.csv", help = "File with the household profiles.")
+    parser.add_argument("--seed", type = int, default = 0, help = "Seed of the random numbers.")
+    parser.add_argument("--output", default = None, help = "CSV file in which the summary of each year is saved.")
+    
+    arguments = parser.parse_args(arguments)
+    
+    generator = WindYearGenerator(arguments.wind_profile, arguments.method)
+    demand = Households([arguments.households, 0, 0, 0, 0, 0, 0, 0, 0, 0], profiel = arguments.household_profile)
+    
+    result = run_monte_carlo(generator, demand, {"carts" : arguments.carts / 2}, arguments.years, arguments.batch_size, arguments.windmills, arguments.delta_time, arguments.days, seed = arguments.seed)
+    
+    with pd.option_context("display.width", 200):
+        print(result["Percentiles"])
+    
+    if arguments.output is not None:
+        result["Years"].to_csv(arguments.output)
+    
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+import argparse
+import json
+import sys
+import time
+
+from Storage import TrainTrack
+from Controller import Controller
+from Recorder import Recorder, SummaryRecorder, COMPACT_DTYPES
+from Output import NpySink, ParquetSink, load_output
+from Supply import CompositeSupply
+from Sweep import SUPPLY_CLASSES, DEMAND_CLASSES, get_summary
+
+EXAMPLE_CONFIG = """# Example configuration of a run, see gravity_storage.py.
+[simulation]
+days = 364# Amount of days that are simulated (after the warm up).
+delta_time = 10# Time step size in seconds.
+warm_up = 3600# Seconds that are simulated first to stabilize the system, these are not part of the output.
+compiled = true# Interpolate the supply and demand for the entire run at once.
+
+[train_track]# The parameters of TrainTrack.
+carts = 15000
+
+[supply]# The class and the parameters of the supply.
+class = "WindSupply"
+amount_of_windmills = 60
+windspeeds_profile = "wind_speed_ijmuiden.txt"
+cache_directory = "profile_cache"
+# Several supplies can be combined with class = "CompositeSupply" and a [[supply.sources]] table (with its own class) for each source.
+
+[demand]# The class and the parameters of the demand.
+class = "Households"
+amount_of_households_per_type = [67000, 0, 0, 0, 0, 0, 0, 0, 0, 0]
+profiel = "profielen Elektriciteit 2019 versie 1.00.csv"
+cache_directory = "profile_cache"
+
+[controller]# The settings of the controller.
+max_speed = 10
+max_acceleration = 1
+allow_new_carts = true
+
+[recorder]
+stride = 1# Only every stride-th tick is recorded.
+compact = false# Store the amount of carts as float32.
+summary_only = false# Only keep running statistics instead of the data of each tick (see Recorder.SummaryRecorder), the output section is then ignored.
+
+[output]
+directory = "run_output"# The recorded data is written to this directory as .npy files, use parquet = "run.parquet" instead for a Parquet file. Without either the data is only kept in memory.
+summary = "summary.json"# The summary is also written to this file.
+"""
+
+def load_config(path):
+    """
+    Reads a configuration from a toml file (see EXAMPLE_CONFIG). Needs tomllib (python 3.11 and later) or tomli.
+    """
+    
+    try:
+        import tomllib
+    except ImportError:
+        try:
+            import tomli as tomllib
+        except ImportError:
+            raise ImportError("Reading toml configurations needs python 3.11 or later, or the tomli package.")
+    
+    with open(path, "rb") as file:
+        return tomllib.load(file)
+
+def make_supply(supply, delta_time):
+    """
+    Builds the supply of the supply section of a configuration. A CompositeSupply gets its sources from the sources list (each a table with a class and its parameters) and is precomputed at the time step size of the simulation.
+    """
+    
+    supply = dict(supply)
+    supply_class = supply.pop("class", "WindSupply")
+    
+    if supply_class == "CompositeSupply":
+        sources = [make_supply(source, delta_time) for source in supply.pop("sources", [])]
+        supply.setdefault("resolution", delta_time)
+        return CompositeSupply(sources, **supply)
+    
+    return SUPPLY_CLASSES[supply_class](**supply)
+
+def make_controller(config):
+    """
+    Builds the controller (with its train track, supply, demand and recorder) of a configuration.
+    """
+    
+    simulation = config.get("simulation", {})
+    supply = dict(config.get("supply", {}))
+    demand = dict(config.get("demand", {}))
+    recorder = config.get("recorder", {})
+    
+    train_track = TrainTrack(**config.get("train_track", {}))
+    supply = make_supply(supply, simulation.get("delta_time", 10))
+    demand = DEMAND_CLASSES[demand.pop("class", "Households")](**demand)
+    
+    if recorder.get("summary_only", False):
+        recorder = SummaryRecorder()
+    else:
+        recorder = Recorder(recorder.get("stride", 1), COMPACT_DTYPES if recorder.get("compact", False) else {})
+    
+    controller = Controller(train_track = train_track, supply = supply, demand = demand, delta_time = simulation.get("delta_time", 10), recorder = recorder)
+    
+    for setting, value in config.get("controller", {}).items():
+        if setting not in ["max_speed", "max_acceleration", "allow_new_carts"]:
+            raise ValueError("Unknown controller setting " + repr(setting) + " in the configuration.")
+        setattr(controller, setting, value)
+    
+    return controller
+
+def run(config, progress = True):
+    """
+    Runs the scenario of a configuration (see EXAMPLE_CONFIG) without any plotting and returns its summary (see Sweep.get_summary, or SummaryRecorder.get_summary if only the summary is recorded) with the run time added.
+    """
+    
+    start = time.monotonic()
+    simulation = config.get("simulation", {})
+    output = config.get("output", {})
+    
+    controller = make_controller(config)
+    
+    warm_up = simulation.get("warm_up", 3600)
+    end_time = warm_up + simulation.get("days", 364) * 24 * 3600
+    
+    if simulation.get("compiled", True):
+        controller.compile_profiles(end_time)
+    
+    controller.simulate(warm_up)
+    controller = controller.fork()# Continue with an empty recorder so the warm up is not part of the output.
+    
+    summary_only = isinstance(controller.recorder, SummaryRecorder)
+    
+    if summary_only:
+        sink = None
+    elif "directory" in output:
+        sink = NpySink(output["directory"])
+    elif "parquet" in output:
+        sink = ParquetSink(output["parquet"])
+    else:
+        sink = None
+    
+    if progress:
+        print("Simulating until", end_time, "s", file = sys.stderr, flush = True)
+    
+    if summary_only:
+        controller.simulate(end_time)
+        summary = controller.recorder.get_summary(controller.time)
+    elif sink is None:
+        controller.simulate(end_time)
+        summary = get_summary(controller.data, controller.delta_time, controller.recorder.stride)
+    else:
+        with sink:
+            controller.simulate(end_time, output_sink = sink)
+        summary = get_summary(load_output(output.get("directory", output.get("parquet")), columns = ["Difference", "Satisfaction", "Losses", "Velocity"]), controller.delta_time, controller.recorder.stride)
+    summary["Run time (s)"] = time.monotonic() - start
+    
+    if "summary" in output:
+        with open(output["summary"], "w") as file:
+            json.dump(summary, file, indent = 4, default = float)
+    
+    return summary
+
+def main(arguments = None):
+    """
+    The command line interface, for example python -m gravity_storage run config.toml. Nothing of matplotlib is imported so it also works without a display.
+    """
+    
+    parser = argparse.ArgumentParser(prog = "python -m gravity_storage", description = "Run the gravity storage simulation without plotting.")
+    commands = parser.add_subparsers(dest = "command", required = True)
+    
+    run_parser = commands.add_parser("run", help = "Run the scenario of a toml configuration.")
+    run_parser.add_argument("config", help = "The toml configuration file (see the example command).")
+    run_parser.add_argument("--days", type = float, default = None, help = "Overrides the amount of days in the configuration.")
+    run_parser.add_argument("--quiet", action = "store_true", help = "Don't print the progress.")
+    
+    commands.add_parser("example", help = "Print an example configuration.")
+    
+    arguments = parser.parse_args(arguments)
+    
+    if arguments.command == "example":
+        print(EXAMPLE_CONFIG, end = "")
+        return 0
+    
+    config = load_config(arguments.config)
+    
+    if arguments.days is not None:
+        config.setdefault("simulation", {})["days"] = arguments.days
+    
+    summary = run(config, progress = not arguments.quiet)
+    print(json.dumps(summary, indent = 4, default = float))
+    
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())